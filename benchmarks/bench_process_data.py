@@ -0,0 +1,72 @@
+"""
+Бенчмарк process_data: построчная обработка раздела против колоночной (NumPy).
+
+Запуск из корня репозитория:
+    python benchmarks/bench_process_data.py [--tickers 2000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(ROOT, "src", "api")
+
+# модули проекта рассчитывают на запуск из src/api (BASE_DIR, пути логов);
+# эталонная построчная обработка (rowwise_reference.py) лежит рядом, в benchmarks/
+sys.path[:0] = [os.path.join(ROOT, "src"), API_DIR]
+os.chdir(API_DIR)
+os.makedirs(os.path.join(ROOT, "src", "service", "logs"), exist_ok=True)
+
+import data_processor  # noqa: E402
+from database import Database  # noqa: E402
+from price_window import price_window, now_ms  # noqa: E402
+from rowwise_reference import process_data_rowwise  # noqa: E402
+
+
+def build_section(tickers: int, seed: int = 42):
+    rng = random.Random(seed)
+    names = [f"COIN{i}" for i in range(tickers - 1)] + ["BTC"]
+    now = now_ms()
+    # история с шагом 3 минуты за 8 дней: окно покрывает 1ч/1д/1н для всех тикеров
+    for name in names:
+        base = rng.uniform(0.01, 70000)
+        for minutes in range(8 * 24 * 60, 0, -30):
+            price_window.add(name, "crypto", now - minutes * 60_000, base * rng.uniform(0.9, 1.1))
+    new_data = {name: rng.uniform(0.01, 70000) for name in names}
+    old_data = {name: {"value": rng.uniform(0.01, 70000)} for name in names}
+    return new_data, old_data
+
+
+def measure(func, new_data, old_data, db, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(new_data, old_data, is_crypto=True, db=db)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    db = Database(":memory:")
+    new_data, old_data = build_section(args.tickers)
+
+    rowwise = process_data_rowwise(new_data, old_data, is_crypto=True, db=db)
+    columnar = data_processor.process_data(new_data, old_data, is_crypto=True, db=db)
+    assert rowwise == columnar, "результаты построчной и колоночной обработки расходятся"
+
+    rowwise_ms = measure(process_data_rowwise, new_data, old_data, db, args.repeat)
+    columnar_ms = measure(data_processor.process_data, new_data, old_data, db, args.repeat)
+    print(f"тикеров: {args.tickers}, лучший из {args.repeat} прогонов")
+    print(f"  построчно:  {rowwise_ms:8.2f} мс")
+    print(f"  колоночно:  {columnar_ms:8.2f} мс  (x{rowwise_ms / columnar_ms:.1f})")
+
+
+if __name__ == "__main__":
+    main()
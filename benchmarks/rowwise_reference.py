@@ -0,0 +1,83 @@
+"""
+Построчная обработка раздела — эталон для колоночного data_processor.process_data.
+Используется бенчмарком bench_process_data.py и тестом эквивалентности tests/test_process_data.py.
+"""
+from data_processor import (
+    CHANGE_INTERVALS,
+    THRESHOLDS,
+    _get_source_type,
+    _normalize_old_data,
+    _round_crypto_value,
+    check_threshold,
+    format_change,
+)
+from price_window import price_window, now_ms
+from service.logger import logger
+
+
+def _window_change(current, ticker, data_type, target_ms):
+    past = price_window.value_at(ticker, data_type, target_ms)
+    return round(((current - past) / past) * 100, 2) if past else None
+
+
+def get_changes_for_section(values, is_crypto, db):
+    """Изменения за 1ч/1д/1н построчно: окно цен, непокрытые промахи — пакетным запросом к БД."""
+    by_type = {}
+    for currency, value in values.items():
+        by_type.setdefault(_get_source_type(currency, is_crypto), {})[currency] = value
+
+    changes = {}
+    now = now_ms()
+    for source_type, type_values in by_type.items():
+        misses, db_deltas = {}, {}
+        for currency, value in type_values.items():
+            entry = changes[currency] = {}
+            for label, delta in CHANGE_INTERVALS.items():
+                target = now - int(delta.total_seconds() * 1000)
+                entry[label] = _window_change(value, currency, source_type, target)
+                if entry[label] is None and (
+                    label == "change_1d" or not price_window.covers([currency], source_type, target)[0]
+                ):
+                    misses[currency] = value
+                    db_deltas[label] = delta
+        if not misses:
+            continue
+        db_changes = db.get_changes_batch(misses, source_type, db_deltas)
+        for currency, entry in db_changes.items():
+            for label, change in entry.items():
+                if changes[currency][label] is None:
+                    changes[currency][label] = change
+    return changes
+
+
+def process_data_rowwise(new_data, old_data, is_crypto=False, db=None):
+    processed = {}
+    new_values = {}
+    old_data = _normalize_old_data(old_data)
+
+    for currency, new_val_raw in new_data.items():
+        try:
+            if new_val_raw is None:
+                continue
+            new_value = new_val_raw.get("value") if isinstance(new_val_raw, dict) else new_val_raw
+            if new_value is None:
+                continue
+
+            old_value = None
+            if isinstance(old_data.get(currency), dict):
+                old_value = old_data[currency].get("value")
+
+            processed[currency] = {
+                "value": _round_crypto_value(new_value, currency) if is_crypto else new_value,
+                "change": format_change(new_value, old_value),
+                "threshold_emoji": check_threshold(new_value, *THRESHOLDS.get(currency, (0, ""))),
+            }
+            new_values[currency] = new_value
+        except Exception as e:
+            logger.error(f"Ошибка обработки {currency}: {e}")
+            continue
+
+    interval_changes = get_changes_for_section(new_values, is_crypto, db)
+    for currency, entry in processed.items():
+        entry.update(interval_changes.get(currency, dict.fromkeys(CHANGE_INTERVALS)))
+    return processed
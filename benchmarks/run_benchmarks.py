@@ -0,0 +1,289 @@
+"""
+Набор офлайн-бенчмарков горячих путей: обработка разделов, история в SQLite,
+отрисовка сообщения и отбор рывков криптовалют. Данные синтетические, сеть и токены
+не нужны. Результат — JSON (в stdout или файл), чтобы сравнивать прогоны между коммитами.
+
+Запуск из корня репозитория:
+    python benchmarks/run_benchmarks.py [--output results.json] [--repeat 10]
+        [--only process_data,history,render,crypto_spikes]
+        [--tickers 10,100,1000,5000] [--history-rows 10000,100000,1000000]
+        [--coins 1000,10000,100000]
+
+История на 10^7 строк строится несколько минут и занимает ~1 ГБ на диске,
+поэтому в размеры по умолчанию не входит: --history-rows 10000000.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+# bench_process_data настраивает пути и рабочий каталог (src/api) при импорте
+from bench_process_data import ROOT, build_section
+
+import numpy
+
+import create_telegram_message as telegram_message
+import data_processor
+import get_crypto_data
+from database import Database
+from db_connection import connections
+from http_client import http_clients
+from service.logger import logger
+from service.settings import (
+    ALLOWED_CURRENCY_PAIRS,
+    CRYPTO_ALWAYS_SHOW,
+    CRYPTO_SETTINGS,
+    YAHOO_FINANCIAL_ASSETS,
+)
+
+SNAPSHOT_TICKERS = 1000
+HISTORY_STEP_MS = 3 * 60 * 1000
+
+
+def _parse_sizes(value: str):
+    return [int(size) for size in value.split(",") if size]
+
+
+def _timings(func, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def _result(name: str, params: dict, samples):
+    return {
+        "name": name,
+        "params": params,
+        "repeat": len(samples),
+        "best_ms": round(min(samples), 4),
+        "median_ms": round(statistics.median(samples), 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+    }
+
+
+# --- data_processor.process_data ---
+
+def bench_process_data(args):
+    db = Database(":memory:")
+    results = []
+    for tickers in args.tickers:
+        new_data, old_data = build_section(tickers)
+        samples = _timings(
+            lambda: data_processor.process_data(new_data, old_data, is_crypto=True, db=db), args.repeat
+        )
+        results.append(_result("process_data", {"tickers": tickers}, samples))
+    connections.close_all()
+    return results
+
+
+# --- history_data: get_change и save_history_snapshot ---
+
+def _fill_history(db: Database, rows: int, start_ms: int) -> int:
+    """Заполняет history_data срезами по SNAPSHOT_TICKERS тикеров с шагом 3 минуты."""
+    rng = random.Random(7)
+    tickers = [f"T{i}" for i in range(SNAPSHOT_TICKERS)]
+    snapshots = max(rows // SNAPSHOT_TICKERS, 1)
+    with db.batch():
+        for step in range(snapshots):
+            ts = start_ms + step * HISTORY_STEP_MS
+            db.save_history_snapshot(((ticker, "crypto", rng.uniform(1, 100)) for ticker in tickers), ts)
+    return start_ms + snapshots * HISTORY_STEP_MS
+
+
+def bench_history(args):
+    results = []
+    rng = random.Random(11)
+    for rows in args.history_rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(os.path.join(tmp, "bench.db"))
+            # история заканчивается «сейчас», чтобы запросы за 1ч/1д/1н попадали в данные
+            span_ms = max(rows // SNAPSHOT_TICKERS, 1) * HISTORY_STEP_MS
+            next_ts = _fill_history(db, rows, Database._now_ms() - span_ms)
+            params = {"rows": rows, "tickers": SNAPSHOT_TICKERS}
+
+            for label, delta in (("1h", timedelta(hours=1)), ("1d", timedelta(days=1)), ("1w", timedelta(weeks=1))):
+                samples = _timings(
+                    lambda: db.get_change(f"T{rng.randrange(SNAPSHOT_TICKERS)}", 50.0, "crypto", delta),
+                    args.repeat
+                )
+                results.append(_result(f"get_change_{label}", params, samples))
+
+            snapshot = [(f"T{i}", "crypto", rng.uniform(1, 100)) for i in range(SNAPSHOT_TICKERS)]
+            samples = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                db.save_history_snapshot(snapshot, next_ts)
+                samples.append((time.perf_counter() - started) * 1000)
+                next_ts += HISTORY_STEP_MS
+            results.append(_result("save_history_snapshot", params, samples))
+            # соединения держит ConnectionManager — закрываем до удаления каталога
+            connections.close_all()
+    return results
+
+
+# --- create_telegram_message ---
+
+def _entry(rng: random.Random):
+    return {
+        "value": rng.uniform(0.01, 70000),
+        "change_1h": rng.uniform(-5, 5),
+        "change_1d": rng.uniform(-15, 15),
+        "change_1w": rng.uniform(-40, 40),
+    }
+
+
+def build_message_data(seed: int = 3):
+    rng = random.Random(seed)
+    cbr_rates = {pair: _entry(rng) for pair in sorted(ALLOWED_CURRENCY_PAIRS)}
+    finance_data = {asset["name"]: _entry(rng) for asset in YAHOO_FINANCIAL_ASSETS}
+    crypto_data = {
+        "always": {code: _entry(rng) for code in CRYPTO_ALWAYS_SHOW},
+        "daily_spikes": {f"DAY{i}": _entry(rng) for i in range(5)},
+        "hourly_spikes": {f"HOUR{i}": _entry(rng) for i in range(5)},
+    }
+    return cbr_rates, finance_data, crypto_data
+
+
+def bench_render(args):
+    data = build_message_data()
+
+    def cold():
+        telegram_message._render_line.cache_clear()
+        telegram_message.create_telegram_message(*data)
+
+    cold_samples = _timings(cold, args.repeat)
+    telegram_message.create_telegram_message(*data)
+    warm_samples = _timings(lambda: telegram_message.create_telegram_message(*data), args.repeat)
+    return [
+        _result("create_telegram_message", {"cache": "cold"}, cold_samples),
+        _result("create_telegram_message", {"cache": "warm"}, warm_samples),
+    ]
+
+
+# --- get_crypto_data.get_prices: отбор рывков по страницам выдачи ---
+
+def build_coins(count: int, seed: int = 5):
+    rng = random.Random(seed)
+    coins = [
+        {
+            "code": f"COIN{i}",
+            "rate": rng.uniform(0.0001, 70000),
+            "delta": {"hour": rng.uniform(-10, 10), "day": rng.uniform(-30, 30), "week": rng.uniform(-60, 60)},
+        }
+        for i in range(count)
+    ]
+    for i, code in enumerate(CRYPTO_ALWAYS_SHOW):
+        coins[i]["code"] = code
+    return coins
+
+
+def bench_crypto_spikes(args):
+    """
+    Полный путь боевого провайдера: get_prices с дедлайном и предохранителем,
+    параллельные страницы и отбор. Подменяется только сетевой fetch_page —
+    страницы отдаются из памяти, поэтому меряется разбор выдачи, а не сеть.
+    """
+    results = []
+    original_fetch_page = get_crypto_data.fetch_page
+    original_max_coins = CRYPTO_SETTINGS["max_coins"]
+    for count in args.coins:
+        coins = build_coins(count)
+
+        async def fetch_page(session, offset, limit):
+            return coins[offset:offset + limit]
+
+        async def measure():
+            # сессия клиента привязана к циклу событий, поэтому все прогоны — в одном цикле
+            samples = []
+            try:
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    await get_crypto_data.get_prices()
+                    samples.append((time.perf_counter() - started) * 1000)
+            finally:
+                await http_clients.close()
+            return samples
+
+        get_crypto_data.fetch_page = fetch_page
+        CRYPTO_SETTINGS["max_coins"] = count
+        try:
+            samples = asyncio.run(measure())
+        finally:
+            get_crypto_data.fetch_page = original_fetch_page
+            CRYPTO_SETTINGS["max_coins"] = original_max_coins
+        results.append(_result("crypto_get_prices", {"coins": count}, samples))
+    return results
+
+
+BENCHMARKS = {
+    "process_data": bench_process_data,
+    "history": bench_history,
+    "render": bench_render,
+    "crypto_spikes": bench_crypto_spikes,
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="файл для JSON; по умолчанию — stdout")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help="список наборов через запятую")
+    parser.add_argument("--tickers", type=_parse_sizes, default=[10, 100, 1000, 5000])
+    parser.add_argument("--history-rows", type=_parse_sizes, default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--coins", type=_parse_sizes, default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+
+    unknown = set(args.only.split(",")) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"неизвестные наборы: {', '.join(sorted(unknown))}")
+
+    # запись логов в файл на каждом вызове исказила бы замеры
+    logger.setLevel(logging.WARNING)
+
+    results = []
+    for name in args.only.split(","):
+        print(f"[bench] {name}...", file=sys.stderr)
+        results.extend(BENCHMARKS[name](args))
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": numpy.__version__,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
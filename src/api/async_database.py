@@ -0,0 +1,214 @@
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from database import Database
+from service.logger import logger
+from service.settings import DATABASE_SETTINGS, TELEGRAM_CHANNEL_ID
+
+_STOP = object()
+
+
+@dataclass
+class _WriteOp:
+    method: str
+    args: Tuple[Any, ...]
+    kwargs: Dict[str, Any]
+    # операции с одинаковым ключом в одной пачке схлопываются до последней;
+    # ключ — имя метода и строка, которую он перезаписывает
+    coalesce_key: Optional[Hashable] = None
+    # False — операция сама управляет транзакциями (обслуживание, миграции)
+    batched: bool = True
+    future: Future = field(default_factory=Future)
+
+
+class AsyncDatabase:
+    """
+    Асинхронный фасад над Database.
+    Все записи идут через одну очередь в выделенный поток-писатель, который забирает
+    накопившиеся операции пачкой и выполняет их одной транзакцией на собственном
+    соединении. Чтения выполняются в небольшом пуле потоков со своими соединениями (WAL),
+    поэтому event loop не ждёт ни fsync, ни медленного диска. Другим кодом соединение
+    писателя не используется — к БД ходят только через фасад.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        readers: int = DATABASE_SETTINGS["async"]["readers"],
+        max_batch: int = DATABASE_SETTINGS["async"]["max_batch"]
+    ):
+        self.db = db
+        self._writer_db = Database(db.db_path, dedicated=True)
+        self.max_batch = max_batch
+        self._queue: "queue.Queue" = queue.Queue()
+        self._local = threading.local()
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="db-reader")
+        self._writer = threading.Thread(target=self._writer_loop, name="db-writer", daemon=True)
+        self._writer.start()
+
+    # --- чтение ---
+
+    def _reader_db(self) -> Database:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = Database(self.db.db_path, readonly=True)
+        return db
+
+    async def run_read(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Выполняет func(db, *args, **kwargs) в пуле читателей."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, lambda: func(self._reader_db(), *args, **kwargs))
+
+    async def read(self, method: str, *args, **kwargs) -> Any:
+        return await self.run_read(lambda db: getattr(db, method)(*args, **kwargs))
+
+    async def get_today_message_ids(self) -> Dict[str, int]:
+        return await self.read("get_today_message_ids")
+
+    async def get_last_daily_data(self):
+        return await self.read("get_last_daily_data")
+
+    async def get_history_since(self, since_ms: int):
+        return await self.read("get_history_since", since_ms)
+
+    async def get_last_good(self):
+        return await self.read("get_last_good")
+
+    # --- запись ---
+
+    async def write(
+        self,
+        method: str,
+        *args,
+        coalesce_key: Optional[Hashable] = None,
+        batched: bool = True,
+        **kwargs
+    ) -> Any:
+        op = _WriteOp(method, args, kwargs, coalesce_key, batched)
+        self._queue.put(op)
+        return await asyncio.wrap_future(op.future)
+
+    async def save_history_snapshot(self, rows, ts: Optional[int] = None) -> int:
+        return await self.write("save_history_snapshot", rows, ts)
+
+    async def save_last_good(self, rows) -> int:
+        return await self.write("save_last_good", rows)
+
+    async def save_data(self, message_id: int, data, chat_id: str = TELEGRAM_CHANNEL_ID) -> None:
+        await self.write("save_data", message_id, data, chat_id, coalesce_key=("save_data", str(chat_id)))
+
+    async def save_daily_data(self, data) -> None:
+        await self.write("save_daily_data", data, coalesce_key=("save_daily_data",))
+
+    async def save_last_daily_message(self, message_id: int, data, chat_id: str = TELEGRAM_CHANNEL_ID) -> None:
+        await self.write(
+            "save_last_daily_message", message_id, data, chat_id,
+            coalesce_key=("save_last_daily_message", str(chat_id))
+        )
+
+    async def clear_old_data(self) -> None:
+        await self.write("clear_old_data")
+
+    async def clear_invalid_data(self) -> None:
+        await self.write("clear_invalid_data")
+
+    async def apply_retention(self) -> Dict[str, int]:
+        return await self.write("apply_retention", batched=False)
+
+    # --- поток-писатель ---
+
+    def _writer_loop(self) -> None:
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            ops = [item]
+            while len(ops) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                ops.append(item)
+            try:
+                self._run_ops(ops)
+            except Exception as e:
+                # поток-писатель не должен умирать из-за одной операции: иначе все
+                # следующие записи повиснут навсегда
+                logger.error(f"Ошибка потока-писателя БД: {e}")
+                for op in ops:
+                    self._settle(op, error=e)
+
+    @staticmethod
+    def _settle(op: _WriteOp, result: Any = None, error: Optional[BaseException] = None) -> None:
+        # вызывающий мог отменить ожидание — тогда future уже CANCELLED
+        if op.future.done():
+            return
+        if error is not None:
+            op.future.set_exception(error)
+        else:
+            op.future.set_result(result)
+
+    def _run_ops(self, ops: List[_WriteOp]) -> None:
+        # отменённые до начала выполнения операции просто отбрасываем
+        ops = [op for op in ops if op.future.set_running_or_notify_cancel()]
+        latest = {op.coalesce_key: op for op in ops if op.coalesce_key is not None}
+        pending: List[_WriteOp] = []
+        for op in ops:
+            if op.coalesce_key is not None and latest[op.coalesce_key] is not op:
+                # перекрыта более поздней операцией с тем же ключом
+                self._settle(op)
+                continue
+            if op.batched:
+                pending.append(op)
+                continue
+            self._run_batch(pending)
+            pending = []
+            self._run_single(op)
+        self._run_batch(pending)
+
+    def _run_single(self, op: _WriteOp) -> None:
+        try:
+            result = getattr(self._writer_db, op.method)(*op.args, **op.kwargs)
+        except Exception as e:
+            self._settle(op, error=e)
+        else:
+            self._settle(op, result)
+
+    def _run_batch(self, ops: List[_WriteOp]) -> None:
+        if not ops:
+            return
+        if len(ops) == 1:
+            self._run_single(ops[0])
+            return
+
+        results: List[Tuple[_WriteOp, Any, Optional[Exception]]] = []
+        try:
+            with self._writer_db.batch():
+                for op in ops:
+                    try:
+                        results.append((op, getattr(self._writer_db, op.method)(*op.args, **op.kwargs), None))
+                    except Exception as e:
+                        results.append((op, None, e))
+        except Exception as e:
+            for op in ops:
+                self._settle(op, error=e)
+            return
+
+        logger.debug(f"Пачка записей БД: {len(ops)} операций одной транзакцией")
+        # результаты отдаём только после коммита
+        for op, result, error in results:
+            self._settle(op, result, error)
+
+    async def close(self) -> None:
+        self._queue.put(_STOP)
+        await asyncio.to_thread(self._writer.join)
+        self._readers.shutdown(wait=True)
+        logger.info("Асинхронный фасад БД остановлен")
@@ -1,37 +1,76 @@
 import asyncio
-from datetime import datetime, timedelta, time
+import time
+from datetime import datetime, timedelta, time as dtime
 
 import pytz
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from service.logger import logger
 from telegr.sender import send_telegram_message, edit_telegram_message
 from create_telegram_message import create_telegram_message
-from get_cb_data import get_currency_rates
-from get_yahoo_data import get_prices as get_yahoo_prices
+from get_cb_data import get_currency_rates_async
+from get_yahoo_data import get_prices as get_yahoo_prices, get_failures as get_yahoo_failures
 from get_crypto_data import get_prices as get_crypto_prices
-import json
 from database import Database
+from async_database import AsyncDatabase
+from db_connection import connections
 from data_processor import process_data
-from service.settings import TELEGRAM_CHANNEL_ID, DEBUG, SCHEDULER_SETTINGS
+from fetcher import FetchOrchestrator
+from polling import SnapshotStore, SourcePoller
+from streaming import StreamIngestor, TcpTickProvider
+from edit_guard import EditGuard
+from http_client import http_clients
+from price_window import price_window, now_ms
+from last_good import last_good
+from service.settings import (
+    TELEGRAM_CHANNELS,
+    DEBUG,
+    SCHEDULER_SETTINGS,
+    PRICE_WINDOW_SETTINGS,
+    POLLING_SETTINGS,
+    STREAMING_SETTINGS,
+)
 
 
 class TelegramBot:
     def __init__(self):
         self.scheduler = AsyncIOScheduler()
         self.db = Database()
-        self._init_message_state()
-
-    def _init_message_state(self):
-        today_message = self.db.get_today_message()
-        if today_message:
-            self.message_id, _ = today_message
+        self.adb = AsyncDatabase(self.db)
+        self.fetcher = self._init_fetcher()
+        self.snapshots = SnapshotStore()
+        self.poller = SourcePoller(self.fetcher, self.snapshots)
+        self.ingestor = (
+            StreamIngestor(TcpTickProvider(), on_spikes_changed=self._on_spikes_changed)
+            if STREAMING_SETTINGS["enabled"] else None
+        )
+        self._stream_task = None
+        self._last_spike_edit = 0.0
+        self.edit_guard = EditGuard()
+        self.channels = [str(channel["chat_id"]) for channel in TELEGRAM_CHANNELS if channel.get("enabled", True)]
+        self.message_ids = {}
+        self.daily_spikes = {}
+        self.hourly_spikes = {}
+        self.is_editing_active = False
+        self._setup_maintenance_jobs()
+
+    @staticmethod
+    def _init_fetcher() -> FetchOrchestrator:
+        fetcher = FetchOrchestrator()
+        fetcher.register("cbr", get_currency_rates_async)
+        fetcher.register("finance", get_yahoo_prices, failures=get_yahoo_failures)
+        fetcher.register("crypto", get_crypto_prices)
+        return fetcher
+
+    async def _init_message_state(self):
+        self.message_ids = self._known_channels(await self.adb.get_today_message_ids())
+        if self.message_ids:
             self.is_editing_active = True
-            logger.info(f"Найдено сообщение за сегодня (ID: {self.message_id}).")
+            logger.info(f"Найдены сообщения за сегодня: {self.message_ids}.")
         else:
-            self.message_id = None
             self.is_editing_active = False
-            logger.info("Сообщение за сегодня отсутствует.")
+            logger.info("Сообщений за сегодня нет.")
 
+    def _setup_maintenance_jobs(self):
         self.scheduler.add_job(
             self.clear_old_data,
             trigger="interval",
@@ -45,45 +84,31 @@ class TelegramBot:
         logger.info("Редактирование сообщения остановлено.")
 
     async def fetch_data(self):
-        try:
-            cbr_rates = get_currency_rates()
-            finance_data = await get_yahoo_prices()
-            crypto_data = await get_crypto_prices()
-
-            for name, data in (
-                ("ЦБ РФ", cbr_rates),
-                ("Yahoo Finance", finance_data),
-                ("Криптовалюты", crypto_data)
-            ):
-                for key, value in data.items():
-                    if value == 0:
-                        logger.warning(f"Нулевое значение в {name} для {key}")
-
-            return cbr_rates, finance_data, crypto_data
-        except Exception as e:
-            logger.error(f"Ошибка при получении данных: {e}")
-            return {}, {}, {}
+        """Последние снимки источников: их обновляют задачи опроса, сама отрисовка в сеть не ходит."""
+        return self.snapshots.get("cbr"), self.snapshots.get("finance"), self.snapshots.get("crypto")
 
     async def clear_old_data(self):
         logger.info("Очистка старых данных...")
-        self.db.clear_old_data()
+        await self.adb.clear_old_data()
+        await self.adb.apply_retention()
         logger.info("Очистка завершена.")
+        logger.info(f"Опрос источников: {self.poller.summary()}")
 
-    async def fetch_and_process_data(self):
-        cbr_rates = get_currency_rates()
-        finance_data = await get_yahoo_prices()
-        crypto_data = await get_crypto_prices()
+    async def fetch_and_process_data(self, record_history: bool = True):
+        """
+        :param record_history: записать срез в историю и окно цен. Правки по рывкам из потока
+            идут вне шага редактирования и срез не пишут — иначе окно не покроет неделю.
+        """
+        cbr_rates, finance_data, crypto_data = await self.fetch_data()
 
-        yesterday_data_raw = self.db.get_last_daily_data()
-        yesterday_data = {}
+        # пропавшие тикеры и упавшие источники добираем из кэша последних удачных значений
+        # после неудачного опроса снимок хранит прежние данные — они помечаются как устаревшие
+        cbr_rates, cbr_stale = self._merge_last_good("cbr", cbr_rates)
+        finance_data, finance_stale = self._merge_last_good("finance", finance_data)
+        always, crypto_stale = self._merge_last_good("crypto", (crypto_data or {}).get("always", {}))
+        await self._persist_last_good()
 
-        if isinstance(yesterday_data_raw, str):
-            try:
-                yesterday_data = json.loads(yesterday_data_raw)
-            except json.JSONDecodeError as e:
-                logger.error(f"Ошибка декодирования yesterday_data: {e}")
-        elif isinstance(yesterday_data_raw, dict):
-            yesterday_data = yesterday_data_raw
+        yesterday_data = await self.adb.get_last_daily_data()
 
         if not cbr_rates and 'cbr_rates' in yesterday_data:
             logger.warning("📄 Нет свежих данных ЦБ РФ, используем данные из БД")
@@ -93,98 +118,181 @@ class TelegramBot:
             logger.warning("📄 Нет свежих данных фин. инструментов, используем данные из БД")
             finance_data = {k: v['value'] for k, v in yesterday_data['finance_data'].items()}
 
-        flat_crypto = {}
+        flat_crypto = dict(always)
         if crypto_data:
-            daily_spikes = crypto_data.get("daily_spikes", {})
-            hourly_spikes = crypto_data.get("hourly_spikes", {})
-            always = crypto_data.get("always", {})
-
-            flat_crypto.update(always)
-
-            self.daily_spikes = daily_spikes
-            self.hourly_spikes = hourly_spikes
+            self.daily_spikes = crypto_data.get("daily_spikes", {})
+            self.hourly_spikes = crypto_data.get("hourly_spikes", {})
+
+        if self.ingestor is not None:
+            # пока поток жив, он свежее снимков: рывки из трекера, цены — последние тики;
+            # заглохший поток уступает снимку crypto
+            max_age_ms = POLLING_SETTINGS["crypto"]["interval_seconds"] * 2 * 1000
+            if self.ingestor.is_live(max_age_ms):
+                spikes = self.ingestor.spikes(max_age_ms)
+                self.daily_spikes = spikes["daily_spikes"]
+                self.hourly_spikes = spikes["hourly_spikes"]
+            for code, price in self.ingestor.prices(max_age_ms).items():
+                if code in flat_crypto:
+                    flat_crypto[code] = price
+                    # цена из потока свежая, даже если снимок подставил значение из кэша
+                    crypto_stale.pop(code, None)
 
         logger.debug(f"✅ flat_crypto: {flat_crypto}")
 
-        processed_cbr_rates = process_data(
-            cbr_rates, yesterday_data.get("cbr_rates", {})
-        )
-        processed_finance_data = process_data(
-            finance_data, yesterday_data.get("finance_data", {})
-        )
-        processed_crypto_data = process_data(
-            flat_crypto, yesterday_data.get("crypto_data", {}), is_crypto=True
+        # расчёт изменений читает БД на холодном старте — выполняем в пуле читателей
+        processed_cbr_rates, processed_finance_data, processed_crypto_data = await asyncio.gather(
+            self.adb.run_read(self._process, cbr_rates, yesterday_data.get("cbr_rates", {})),
+            self.adb.run_read(self._process, finance_data, yesterday_data.get("finance_data", {})),
+            self.adb.run_read(self._process, flat_crypto, yesterday_data.get("crypto_data", {}), True),
         )
 
+        for processed, stale in (
+            (processed_cbr_rates, cbr_stale),
+            (processed_finance_data, finance_stale),
+            (processed_crypto_data, crypto_stale),
+        ):
+            for ticker in stale:
+                if ticker in processed:
+                    processed[ticker]["stale"] = True
+
         processed_crypto_data_full = {
             "always": processed_crypto_data,
             "daily_spikes": self.daily_spikes,
             "hourly_spikes": self.hourly_spikes,
         }
 
-        self.save_history_snapshot(processed_cbr_rates, processed_finance_data, processed_crypto_data)
+        if record_history:
+            await self.save_history_snapshot(processed_cbr_rates, processed_finance_data, processed_crypto_data)
 
         return processed_cbr_rates, processed_finance_data, processed_crypto_data_full
 
-    def save_history_snapshot(self, cbr_rates, finance_data, crypto_data):
-        for ticker, item in cbr_rates.items():
-            self.db.save_history_data(ticker, item["value"], "cbr")
-        for ticker, item in finance_data.items():
-            self.db.save_history_data(ticker, item["value"], "finance")
-        for ticker, item in crypto_data.items():
-            self.db.save_history_data(ticker, item["value"], "crypto")
-
-    async def _send_new_message(self, processed_data):
-        telegram_message = create_telegram_message(*processed_data)
-        self.message_id = await send_telegram_message(telegram_message, TELEGRAM_CHANNEL_ID)
+    def _merge_last_good(self, source: str, data):
+        return last_good.merge(
+            source, data,
+            fetched_ms=self.snapshots.fetched_ms(source),
+            retained=self.snapshots.retained_ms(source) is not None
+        )
 
-        if not self.message_id:
-            logger.error("Ошибка отправки сообщения")
+    async def _persist_last_good(self):
+        rows = last_good.pending_rows()
+        if rows:
+            await self.adb.save_last_good(rows)
+
+    @staticmethod
+    def _process(db, new_data, old_data, is_crypto=False):
+        return process_data(new_data, old_data, is_crypto=is_crypto, db=db)
+
+    async def save_history_snapshot(self, cbr_rates, finance_data, crypto_data) -> int:
+        # подставленные из кэша значения не новые наблюдения — в историю их не пишем
+        rows = [
+            (ticker, data_type, item["value"])
+            for data_type, section in (("cbr", cbr_rates), ("finance", finance_data), ("crypto", crypto_data))
+            for ticker, item in section.items()
+            if not item.get("stale")
+        ]
+        ts = now_ms()
+        written = await self.adb.save_history_snapshot(rows, ts)
+        price_window.add_snapshot(rows, ts)
+        return written
+
+    async def warm_up_price_window(self):
+        span = timedelta(days=PRICE_WINDOW_SETTINGS["span_days"], hours=PRICE_WINDOW_SETTINGS["warmup_extra_hours"])
+        since = now_ms() - int(span.total_seconds() * 1000)
+        price_window.warm_up(await self.adb.get_history_since(since))
+
+    def _on_spikes_changed(self):
+        """Состав рывков в потоке изменился — правим сообщение сразу, но не чаще дебаунса."""
+        now = time.monotonic()
+        debounce = STREAMING_SETTINGS["spike_edit_debounce_seconds"]
+        if not self.is_editing_active or now - self._last_spike_edit < debounce:
             return
+        self._last_spike_edit = now
+        self.scheduler.add_job(
+            self.edit_message,
+            trigger="date",
+            id="spike_edit",
+            replace_existing=True,
+            kwargs={"record_history": False}
+        )
 
-        logger.info(f"Сообщение отправлено (ID: {self.message_id})")
-        self.is_editing_active = True
+    def _known_channels(self, message_ids):
+        return {chat_id: message_id for chat_id, message_id in message_ids.items() if chat_id in self.channels}
+
+    async def _send_new_message(self, processed_data, chat_ids):
+        # одна отрисовка на цикл, рассылка во все каналы параллельно (лимиты — на уровне доставки)
+        telegram_message = create_telegram_message(*processed_data)
+        sent_ids = await asyncio.gather(*(send_telegram_message(telegram_message, chat_id) for chat_id in chat_ids))
 
         data_to_save = {
             "cbr_rates": processed_data[0],
             "finance_data": processed_data[1],
             "crypto_data": processed_data[2]
         }
-        self.db.save_data(self.message_id, json.dumps(data_to_save))
-        self.db.save_daily_data(json.dumps(data_to_save))
+        saves = [self.adb.save_daily_data(data_to_save)]
+        for chat_id, message_id in zip(chat_ids, sent_ids):
+            if not message_id:
+                logger.error(f"Ошибка отправки сообщения в {chat_id}")
+                continue
+            logger.info(f"Сообщение отправлено в {chat_id} (ID: {message_id})")
+            self.message_ids[chat_id] = message_id
+            saves.append(self.adb.save_data(message_id, data_to_save, chat_id))
+
+        if self.message_ids:
+            self.is_editing_active = True
+            self.edit_guard.remember(processed_data, telegram_message)
+        await asyncio.gather(*saves)
 
     async def send_daily_message(self):
-        if self.db.get_today_message():
-            logger.info("Редактируем существующее сообщение...")
+        self.message_ids = self._known_channels(await self.adb.get_today_message_ids())
+        missing = [chat_id for chat_id in self.channels if chat_id not in self.message_ids]
+        if not missing:
+            logger.info("Редактируем существующие сообщения...")
             await self.edit_message()
             return
 
-        logger.info("Отправляем новое сообщение...")
-        await self._send_new_message(await self.fetch_and_process_data())
+        logger.info(f"Отправляем новое сообщение в {', '.join(missing)}...")
+        await self._send_new_message(await self.fetch_and_process_data(), missing)
 
-    async def edit_message(self):
-        if not (self.is_editing_active and self.message_id):
+    async def edit_message(self, force: bool = False, record_history: bool = True):
+        if not (self.is_editing_active and self.message_ids):
             return
 
-        processed_data = await self.fetch_and_process_data()
-        updated_message = create_telegram_message(*processed_data)
-
-        if await edit_telegram_message(updated_message, TELEGRAM_CHANNEL_ID, self.message_id):
-            logger.info("Сообщение отредактировано")
-
-            moscow_tz = pytz.timezone('Europe/Moscow')
-            current_time = datetime.now(moscow_tz).time()
-            target_time = time(23, 57)
-
-            if current_time.hour == target_time.hour and target_time.minute - 2 <= current_time.minute <= target_time.minute + 2:
-                data_to_save = {
-                    "cbr_rates": processed_data[0],
-                    "finance_data": processed_data[1],
-                    "crypto_data": processed_data[2]
-                }
-                self.db.save_last_daily_message(self.message_id, data_to_save)
-        else:
-            logger.error("Ошибка редактирования")
+        processed_data = await self.fetch_and_process_data(record_history=record_history)
+
+        # без изменений не тратим запрос к API и лимит правок
+        updated_message = None
+        if force or self.edit_guard.data_changed(processed_data):
+            updated_message = create_telegram_message(*processed_data)
+            if not force and not self.edit_guard.text_changed(updated_message):
+                updated_message = None
+
+        if updated_message is not None:
+            targets = list(self.message_ids.items())
+            results = await asyncio.gather(*(
+                edit_telegram_message(updated_message, chat_id, message_id) for chat_id, message_id in targets
+            ))
+            failed = [chat_id for (chat_id, _), ok in zip(targets, results) if not ok]
+            if failed:
+                # хэш не запоминаем — в следующем цикле правка повторится
+                logger.error(f"Ошибка редактирования в {', '.join(failed)}")
+                return
+            logger.info(f"Сообщение отредактировано в {len(targets)} каналах")
+            self.edit_guard.remember(processed_data, updated_message)
+
+        moscow_tz = pytz.timezone('Europe/Moscow')
+        current_time = datetime.now(moscow_tz).time()
+        target_time = dtime(23, 57)
+
+        if current_time.hour == target_time.hour and target_time.minute - 2 <= current_time.minute <= target_time.minute + 2:
+            data_to_save = {
+                "cbr_rates": processed_data[0],
+                "finance_data": processed_data[1],
+                "crypto_data": processed_data[2]
+            }
+            await asyncio.gather(*(
+                self.adb.save_last_daily_message(message_id, data_to_save, chat_id)
+                for chat_id, message_id in self.message_ids.items()
+            ))
 
     async def send_news_digest(self, when: str):
         """
@@ -194,17 +302,40 @@ class TelegramBot:
         logger.info(f"📄 Новости на {when} не запущены (отключено)")
 
     async def start_scheduler(self):
-        self.db.clear_invalid_data()
+        await http_clients.start()
+        await self._init_message_state()
+        await self.adb.clear_invalid_data()
+        await self.warm_up_price_window()
+        last_good.load(await self.adb.get_last_good())
+        # первый снимок всех источников — до первой публикации, без оглядки на календари
+        await self.poller.poll_all(force=True)
+        self._setup_polling_jobs()
+        if self.ingestor is not None:
+            self._stream_task = asyncio.create_task(self.ingestor.run())
 
         if DEBUG:
             logger.info("\n\nРЕЖИМ ОТЛАДКИ")
             self._setup_debug_jobs()
         else:
-            self._setup_production_jobs()
+            today_ids = self._known_channels(await self.adb.get_today_message_ids())
+            self._setup_production_jobs(has_today_message=len(today_ids) == len(self.channels))
 
         self.scheduler.start()
         logger.info("Планировщик запущен")
 
+    def _setup_polling_jobs(self):
+        for name in self.poller.settings:
+            self.scheduler.add_job(
+                self.poller.poll,
+                trigger="interval",
+                seconds=self.poller.interval(name),
+                args=[name],
+                id=f"poll_{name}",
+                max_instances=1,
+                coalesce=True
+            )
+            logger.info(f"Опрос источника {name} каждые {self.poller.interval(name)} с")
+
     def _setup_debug_jobs(self):
         now = datetime.now()
         self.scheduler.add_job(self.send_daily_message, trigger="date",
@@ -214,8 +345,8 @@ class TelegramBot:
         self.scheduler.add_job(self.stop_editing, trigger="date",
                                run_date=now + timedelta(minutes=SCHEDULER_SETTINGS["debug"]["stop_edit_after_minutes"]))
 
-    def _setup_production_jobs(self):
-        if not self.db.get_today_message():
+    def _setup_production_jobs(self, has_today_message: bool):
+        if not has_today_message:
             delay = timedelta(seconds=SCHEDULER_SETTINGS["first_message_delay_seconds"])
             run_time = datetime.now() + delay
             logger.info(f"Сообщение за сегодня не найдено. Запланирована публикация через {delay.seconds} секунд.")
@@ -244,7 +375,8 @@ class TelegramBot:
             trigger="cron",
             hour=SCHEDULER_SETTINGS["last_edit_time"]["hour"],
             minute=SCHEDULER_SETTINGS["last_edit_time"]["minute"],
-            timezone="Europe/Moscow"
+            timezone="Europe/Moscow",
+            kwargs={"force": True}
         )
 
         self.scheduler.add_job(
@@ -274,8 +406,14 @@ class TelegramBot:
         #     kwargs={"when": "вечер"}
         # )
 
-    def stop_scheduler(self):
+    async def stop_scheduler(self):
         self.scheduler.shutdown()
+        if self._stream_task is not None:
+            self._stream_task.cancel()
+        logger.info(f"Опрос источников: {self.poller.summary()}")
+        await http_clients.close()
+        await self.adb.close()
+        connections.close_all()
         logger.info("Планировщик остановлен")
 
 
@@ -286,7 +424,7 @@ async def main():
         while True:
             await asyncio.sleep(1)
     except (KeyboardInterrupt, SystemExit):
-        bot.stop_scheduler()
+        await bot.stop_scheduler()
 
 
 if __name__ == "__main__":
@@ -1,7 +1,11 @@
+import time
+from functools import lru_cache
 from service.logger import logger
 from datetime import datetime, timezone, timedelta
 from typing import Dict, Any, Tuple, Optional
 
+from legacy_change import parse_legacy_change
+
 from service.settings import (
     ALLOWED_CURRENCY_PAIRS,
     YAHOO_FINANCIAL_ASSETS,
@@ -9,8 +13,38 @@ from service.settings import (
     FINANCE_EMOJIS,
     CRYPTO_EMOJIS,
     DEFAULT_EMOJIS,
+    RENDER_SETTINGS,
+    LAST_GOOD_SETTINGS,
+)
+
+# Таблицы и статичные части сообщения считаются один раз при импорте
+_ALLOWED_FINANCE_NAMES = frozenset(asset["name"] for asset in YAHOO_FINANCIAL_ASSETS)
+_UNIT_SUFFIXES = {"Золото": " USD/унция", "Нефть Brent": " USD/баррель"}
+
+# Реклама: Школа Московской Биржи (реф-ссылка + промокод FINGRAM -20%)
+MOSBIRJA_REF_LINK = (
+    "https://trk.ppdu.ru/click?uid=283460&oid=d126c5b0-9c7d-4902-b446-4a4306945be1&erid=LjN8KWdmY"
+)
+
+# Короткое УТП (одна строка, без перегруза)
+MOEX_TEASER = (
+    '🎓 <b>Школа Московской Биржи</b> — курсы по инвестициям и финграмотности. '
+    'Для подписчиков <b>−20%</b> по промокоду <code>FINGRAM</code>*; есть бесплатные занятия. '
+    f'<a href="{MOSBIRJA_REF_LINK}">Выбрать курс</a>'
+)
+# Примечание в подписи (кратко, чтобы не раздувать пост)
+MOEX_NOTE = (
+    '*Скидка −20% не действует в периоды спецакций (День знаний, Черная пятница, Новогодние распродажи).'
+)
+
+FOOTER = (
+    '🚓 <a href="https://t.me/currency_patrol">ФинПатруль</a> | #USD #BTC #курс_рубля\n'
+    f'{MOEX_TEASER}\n{MOEX_NOTE}'
 )
 
+# Метрика отрисовки: время последней и суммарное, число строк и промахов кэша строк
+render_stats = {"renders": 0, "total_ms": 0.0, "last_ms": 0.0, "lines": 0, "rendered_lines": 0}
+
 
 class EmojiResolver:
     @staticmethod
@@ -35,6 +69,11 @@ class TimeUtils:
 
 
 class Formatter:
+    """
+    Отрисовка блоков сообщения. Готовые строки кэшируются (LRU) по входным данным строки,
+    поэтому в каждом цикле заново рисуются только тикеры, у которых изменились значения.
+    """
+
     @staticmethod
     def _round(value: float, precision: int) -> float:
         try:
@@ -56,11 +95,12 @@ class Formatter:
     def _format_change(label: str, change: Any, is_crypto: bool) -> Optional[str]:
         if change is None:
             return None
-        try:
-            number = float(str(change).replace("%", "").replace(",", ".").replace("−", "-").strip())
-        except Exception as e:
-            logger.warning(f"Не удалось распарсить изменение '{change}': {e}")
-            return None
+        if isinstance(change, str):
+            number = parse_legacy_change(change)
+            if number is None:
+                return None
+        else:
+            number = change
 
         if abs(number) <= 0.01:
             return f"{label}➖0.00%"
@@ -69,29 +109,29 @@ class Formatter:
         formatted_number = f"{abs(number):.2f}%"
         return f"{label}{arrow}{formatted_number}"
 
+    @staticmethod
     def _format_line(
-        self,
         name: str,
         value: Any,
         change_1h: Optional[Any] = None,
         change_1d: Optional[Any] = None,
         change_1w: Optional[Any] = None,
         emoji: str = "",
-        is_crypto: bool = False
+        is_crypto: bool = False,
+        stale: bool = False
     ) -> str:
-        if name == "Золото":
-            value = f"{value} USD/унция"
-        elif name == "Нефть Brent":
-            value = f"{value} USD/баррель"
+        value = f"{value}{_UNIT_SUFFIXES.get(name, '')}"
+        # значение из кэша последних удачных: источник в этом цикле его не отдал
+        stale_mark = f" {LAST_GOOD_SETTINGS['stale_marker']}" if stale else ""
 
         changes = []
         for label, change in [("h", change_1h), ("d", change_1d), ("w", change_1w)]:
-            formatted = self._format_change(label, change, is_crypto)
+            formatted = Formatter._format_change(label, change, is_crypto)
             if formatted:
                 changes.append(formatted)
 
         changes_str = "     " + " ".join(changes) if changes else ""
-        return f"{emoji} <b>{name}</b>: <code>{value}</code>\n{changes_str}\n"
+        return f"{emoji} <b>{name}</b>: <code>{value}</code>{stale_mark}\n{changes_str}\n"
 
     def format_currency_block(self, rates: Dict[str, Dict[str, Any]]) -> str:
         if not rates:
@@ -100,40 +140,21 @@ class Formatter:
         for pair, data in rates.items():
             if pair not in ALLOWED_CURRENCY_PAIRS:
                 continue
-            value = data.get("value")
-            if value is None:
-                continue
-            lines.append(self._format_line(
-                name=pair,
-                value=self._format_number(value),
-                change_1h=data.get("change_1h"),
-                change_1d=data.get("change_1d"),
-                change_1w=data.get("change_1w"),
-                emoji=EmojiResolver.get_currency_flag(pair),
-                is_crypto=False
-            ))
+            line = self._cached_line("currency", pair, data)
+            if line is not None:
+                lines.append(line)
         return "\n".join(lines)
 
     def format_financial_block(self, data: Dict[str, Dict[str, Any]]) -> str:
         if not data:
             return "❌ Нет данных о финансовых инструментах."
-        allowed_names = {asset["name"] for asset in YAHOO_FINANCIAL_ASSETS}
         lines = ["<b><u>📊 Финансовые инструменты:</u></b>"]
         for name, entry in data.items():
-            if name not in allowed_names:
-                continue
-            value = entry.get("value")
-            if value is None:
+            if name not in _ALLOWED_FINANCE_NAMES:
                 continue
-            lines.append(self._format_line(
-                name=name,
-                value=self._format_number(value),
-                change_1h=entry.get("change_1h"),
-                change_1d=entry.get("change_1d"),
-                change_1w=entry.get("change_1w"),
-                emoji=EmojiResolver.get_finance_emoji(name),
-                is_crypto=False
-            ))
+            line = self._cached_line("finance", name, entry)
+            if line is not None:
+                lines.append(line)
         return "\n".join(lines)
 
     def format_crypto_block(self, data: Dict[str, Dict[str, Any]]) -> str:
@@ -166,19 +187,60 @@ class Formatter:
         return "\n\n".join(parts)
 
     def _format_crypto_line(self, code: str, entry: Dict[str, Any]) -> str:
+        return self._cached_line("crypto", code, entry, skip_missing=False)
+
+    def _cached_line(self, kind: str, name: str, entry: Dict[str, Any], skip_missing: bool = True) -> Optional[str]:
         value = entry.get("value")
-        precision = 2 if code == "BTC" else 4
-        rounded = self._round(value, precision)
-        formatted_value = self._format_number(rounded)
-        return self._format_line(
-            name=code,
-            value=formatted_value,
-            change_1h=entry.get("change_1h"),
-            change_1d=entry.get("change_1d"),
-            change_1w=entry.get("change_1w"),
-            emoji=EmojiResolver.get_crypto_emoji(code),
-            is_crypto=True
+        if value is None and skip_missing:
+            return None
+        render_stats["lines"] += 1
+        args = (
+            kind, name, value,
+            entry.get("change_1h"), entry.get("change_1d"), entry.get("change_1w"),
+            bool(entry.get("stale"))
         )
+        try:
+            return _render_line(*args)
+        except TypeError:
+            # нехэшируемые входные данные — рисуем без кэша
+            return _render_line.__wrapped__(*args)
+
+
+@lru_cache(maxsize=RENDER_SETTINGS["line_cache_size"])
+def _render_line(
+    kind: str,
+    name: str,
+    value: Any,
+    change_1h: Any,
+    change_1d: Any,
+    change_1w: Any,
+    stale: bool = False
+) -> str:
+    """Строка тикера по её входным данным; результат кэшируется."""
+    render_stats["rendered_lines"] += 1
+    if kind == "crypto":
+        precision = 2 if name == "BTC" else 4
+        formatted_value = Formatter._format_number(Formatter._round(value, precision))
+        emoji = EmojiResolver.get_crypto_emoji(name)
+    elif kind == "finance":
+        formatted_value = Formatter._format_number(value)
+        emoji = EmojiResolver.get_finance_emoji(name)
+    else:
+        formatted_value = Formatter._format_number(value)
+        emoji = EmojiResolver.get_currency_flag(name)
+    return Formatter._format_line(
+        name=name,
+        value=formatted_value,
+        change_1h=change_1h,
+        change_1d=change_1d,
+        change_1w=change_1w,
+        emoji=emoji,
+        is_crypto=kind == "crypto",
+        stale=stale
+    )
+
+
+_formatter = Formatter()
 
 
 def create_telegram_message(
@@ -187,37 +249,28 @@ def create_telegram_message(
     crypto_data: Dict[str, Dict[str, Any]]
 ) -> str:
     logger.info("Создание Telegram-сообщения")
+    started = time.perf_counter()
     date_str, time_str = TimeUtils.get_moscow_time()
     header = f"<b>🚓 {date_str}</b> 🕒 Upd: <code>{time_str} МСК</code>"
 
-    # Реклама: Школа Московской Биржи (реф-ссылка + промокод FINGRAM -20%)
-    MOSBIRJA_REF_LINK = (
-        "https://trk.ppdu.ru/click?uid=283460&oid=d126c5b0-9c7d-4902-b446-4a4306945be1&erid=LjN8KWdmY"
-    )
-
-    formatter = Formatter()
     blocks = [
-        formatter.format_currency_block(cbr_rates),
-        formatter.format_financial_block(finance_data),
-        formatter.format_crypto_block(crypto_data),
+        _formatter.format_currency_block(cbr_rates),
+        _formatter.format_financial_block(finance_data),
+        _formatter.format_crypto_block(crypto_data),
     ]
 
-    # Короткое УТП (одна строка, без перегруза)
-    moex_teaser = (
-        '🎓 <b>Школа Московской Биржи</b> — курсы по инвестициям и финграмотности. '
-        'Для подписчиков <b>−20%</b> по промокоду <code>FINGRAM</code>*; есть бесплатные занятия. '
-        f'<a href="{MOSBIRJA_REF_LINK}">Выбрать курс</a>'
-    )
-    # Примечание в подписи (кратко, чтобы не раздувать пост)
-    moex_note = (
-        '*Скидка −20% не действует в периоды спецакций (День знаний, Черная пятница, Новогодние распродажи).'
-    )
+    message = "\n\n".join(block.strip() for block in blocks if block.strip())
+    result = f"{header}\n\n{message}\n\n{FOOTER}"
 
-    footer = (
-        '🚓 <a href="https://t.me/currency_patrol">ФинПатруль</a> | #USD #BTC #курс_рубля\n'
-        f'{moex_teaser}\n{moex_note}'
-    )
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    render_stats["renders"] += 1
+    render_stats["total_ms"] += elapsed_ms
+    render_stats["last_ms"] = elapsed_ms
+    logger.debug(f"Сообщение отрисовано за {elapsed_ms:.2f} мс ({render_cache_info()})")
+    return result
 
-    message = "\n\n".join(block.strip() for block in blocks if block.strip())
-    return f"{header}\n\n{message}\n\n{footer}"
+
+def render_cache_info() -> str:
+    info = _render_line.cache_info()
+    return f"кэш строк: попаданий {info.hits}, промахов {info.misses}, размер {info.currsize}"
 
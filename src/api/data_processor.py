@@ -1,8 +1,12 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from service.logger import logger
 import json
 from datetime import timedelta
+
+import numpy as np
+
 from database import Database
+from price_window import price_window, now_ms
 
 from service.settings import THRESHOLDS, CHANGE_EMOJIS
 
@@ -31,12 +35,12 @@ def _get_change_emoji(change: float, is_crypto: bool) -> str:
     return base_emoji
 
 
-def format_change(value_now: float, value_then: float) -> Optional[str]:
+def format_change(value_now: float, value_then: float) -> Optional[float]:
+    """Изменение в процентах числом (округлено до сотых); строкой его делает только отрисовка."""
     try:
         if value_now is None or value_then is None or value_then == 0:
             return None
-        change = ((value_now - value_then) / value_then) * 100
-        return f"{change:.2f}%"
+        return round(((value_now - value_then) / value_then) * 100, 2)
     except Exception as e:
         logger.warning(f"Ошибка при вычислении изменения: {e}")
         return None
@@ -63,64 +67,207 @@ def _round_crypto_value(value: Optional[float], currency: str) -> Optional[float
         return value
 
 
-def get_changes_for_intervals(ticker: str, current_value: float, source_type: str) -> Dict[str, Optional[float]]:
-    db = Database()
-    return {
-        "change_1h": db.get_change(ticker, current_value, source_type, timedelta(hours=1)),
-        "change_1d": db.get_change(ticker, current_value, source_type, timedelta(days=1)),
-        "change_1w": db.get_change(ticker, current_value, source_type, timedelta(weeks=1)),
-    }
+CHANGE_INTERVALS = {
+    "change_1h": timedelta(hours=1),
+    "change_1d": timedelta(days=1),
+    "change_1w": timedelta(weeks=1),
+}
+# суточное изменение БД добирает ещё и из дневных срезов (daily_values), которых нет в окне
+_DAILY_LABEL = "change_1d"
 
+def _default_db() -> Database:
+    # только чтение на соединении текущего потока: общее соединение записи сюда не попадает
+    return Database(readonly=True)
+
+
+def _get_source_type(currency: str, is_crypto: bool) -> str:
+    if currency in ["USD-RUB", "EUR-RUB"]:
+        return "cbr"
+    return "crypto" if is_crypto else "finance"
 
-def process_data(new_data: Dict[str, Any],
-                 old_data: Dict[str, Any],
-                 is_crypto: bool = False) -> Dict[str, Dict[str, Any]]:
-    processed = {}
 
+def _normalize_old_data(old_data: Any) -> Dict[str, Any]:
     if isinstance(old_data, str):
         try:
             old_data = json.loads(old_data)
         except json.JSONDecodeError:
             old_data = {}
+    return old_data if isinstance(old_data, dict) else {}
 
-    if not isinstance(old_data, dict):
-        old_data = {}
 
-    for currency, new_val_raw in new_data.items():
-        try:
-            if new_val_raw is None:
-                continue
-
-            # если в new_val_raw уже словарь — достаём .get("value")
-            if isinstance(new_val_raw, dict):
-                new_value = new_val_raw.get("value")
-            else:
-                new_value = new_val_raw
+def _as_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
 
-            if new_value is None:
-                continue
 
-            old_value = None
-            if isinstance(old_data.get(currency), dict):
-                old_value = old_data[currency].get("value")
+def _extract_section(new_data: Dict[str, Any],
+                     old_data: Dict[str, Any]) -> Tuple[List[str], List[Any], List[float], List[Optional[float]]]:
+    """Раскладывает раздел в выровненные колонки: тикеры, исходные значения, текущие и вчерашние."""
+    tickers, raw_values, values, old_values = [], [], [], []
+    for currency, new_val_raw in new_data.items():
+        new_value = new_val_raw.get("value") if isinstance(new_val_raw, dict) else new_val_raw
+        if new_value is None:
+            continue
+        try:
+            value = float(new_value)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Ошибка обработки {currency}: {e}")
+            continue
+        old_entry = old_data.get(currency)
+        tickers.append(currency)
+        raw_values.append(new_value)
+        values.append(value)
+        old_values.append(_as_float(old_entry.get("value")) if isinstance(old_entry, dict) else None)
+    return tickers, raw_values, values, old_values
+
+
+def _round_half(values: np.ndarray, decimals) -> np.ndarray:
+    """
+    Векторное round(value, decimals) с результатом встроенного round до бита.
+    np.round округляет масштабированное value * 10**decimals, и расходится со встроенным
+    только там, где оно почти на половинке или слишком велико для точной дроби; такие
+    элементы (их единицы) досчитываются встроенным round.
+    """
+    scale = np.power(10.0, decimals)
+    with np.errstate(over="ignore", invalid="ignore"):
+        scaled = values * scale
+        rounded = np.rint(scaled) / scale
+        magnitude = np.abs(scaled)
+        near_half = np.abs(scaled - np.floor(scaled) - 0.5) <= 1e-12 * magnitude + 1e-12
+        fallback = ~np.isnan(values) & (near_half | ~(magnitude < 2.0 ** 50))
+    if fallback.any():
+        digits = np.broadcast_to(decimals, values.shape)
+        for i in np.flatnonzero(fallback).tolist():
+            rounded[i] = round(float(values[i]), int(digits[i]))
+    return rounded
+
+
+def _percent_changes(current: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    """Изменения в % по всему разделу; NaN там, где опорного значения нет или оно нулевое."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        changes = (current - reference) / reference * 100
+    changes[~(reference != 0)] = np.nan
+    return _round_half(changes, 2)
+
+
+def _floor_divide(values: np.ndarray, divisors: np.ndarray) -> np.ndarray:
+    # тот же порядок операций, что у float // в CPython: fmod, поправка знака, floor
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mod = np.fmod(values, divisors)
+        div = (values - mod) / divisors
+    div = np.where((mod != 0) & ((divisors < 0) != (mod < 0)), div - 1.0, div)
+    floordiv = np.floor(div)
+    return np.where(div - floordiv > 0.5, floordiv + 1.0, floordiv)
+
+
+def _threshold_emojis(tickers: List[str], values: np.ndarray) -> List[str]:
+    """check_threshold по всему разделу: тикеры без порога получают пустую строку."""
+    thresholds = np.zeros(len(tickers))
+    marks = np.full(len(tickers), "", dtype=object)
+    position = dict(zip(tickers, range(len(tickers))))
+    for ticker, (threshold, emoji) in THRESHOLDS.items():
+        i = position.get(ticker)
+        if i is not None:
+            thresholds[i], marks[i] = threshold, emoji
+
+    lower = _floor_divide(values, thresholds) * thresholds
+    upper = lower + thresholds
+    inside = (lower < values) & (values < upper)
+    return np.select([(thresholds != 0) & ~inside], [marks], default="").tolist()
+
+
+def _interval_changes(tickers: List[str],
+                      current: np.ndarray,
+                      is_crypto: bool,
+                      db: Database) -> Dict[str, np.ndarray]:
+    """
+    Колонки изменений за 1ч/1д/1н по окну цен. В БД (одним пакетным запросом на тип) идут
+    только промахи, за которые окно не отвечает (PriceWindow.covers): до прогрева и у колец,
+    вытеснивших нужную точку. Промах тикера с короткой историей БД каждый цикл не спрашивает;
+    исключение — суточное изменение, у которого есть запасной источник daily_values.
+    """
+    changes = {label: np.full(len(tickers), np.nan) for label in CHANGE_INTERVALS}
+
+    by_type: Dict[str, List[int]] = {}
+    for i, currency in enumerate(tickers):
+        by_type.setdefault(_get_source_type(currency, is_crypto), []).append(i)
+
+    now = now_ms()
+    for source_type, indices in by_type.items():
+        idx = np.array(indices)
+        type_tickers = [tickers[i] for i in indices]
+        missing = np.zeros(len(indices), dtype=bool)
+        db_deltas = {}
+        for label, delta in CHANGE_INTERVALS.items():
+            target = now - int(delta.total_seconds() * 1000)
+            reference = np.array(price_window.values_at(type_tickers, source_type, target), dtype=float)
+            changes[label][idx] = _percent_changes(current[idx], reference)
+            lookup = np.isnan(changes[label][idx])
+            if label != _DAILY_LABEL and lookup.any():
+                lookup &= ~np.array(price_window.covers(type_tickers, source_type, target), dtype=bool)
+            if lookup.any():
+                missing |= lookup
+                db_deltas[label] = delta
+        if not missing.any():
+            continue
+        misses = {tickers[i]: float(current[i]) for i in idx[missing].tolist()}
+        try:
+            db_changes = db.get_changes_batch(misses, source_type, db_deltas)
+        except Exception as e:
+            logger.error(f"Ошибка расчёта изменений ({source_type}): {e}")
+            continue
+        position = {currency: i for currency, i in zip(type_tickers, indices)}
+        for currency, entry in db_changes.items():
+            i = position[currency]
+            for label, change in entry.items():
+                if change is not None and np.isnan(changes[label][i]):
+                    changes[label][i] = change
+    return changes
 
-            change = calculate_percentage_change(old_value, new_value)
 
-            source_type = "crypto" if is_crypto else "finance"
-            if currency in ["USD-RUB", "EUR-RUB"]:
-                source_type = "cbr"
+def _to_optional(values: np.ndarray) -> List[Optional[float]]:
+    return [None if value != value else value for value in values.tolist()]
 
-            processed[currency] = {
-                "value": _round_crypto_value(new_value, currency) if is_crypto else new_value,
-                "change": format_change(new_value, old_value),
-                "threshold_emoji": check_threshold(new_value, *THRESHOLDS.get(currency, (0, ""))),
-            }
 
-            interval_changes = get_changes_for_intervals(currency, new_value, source_type)
-            processed[currency].update(interval_changes)
+def process_data(new_data: Dict[str, Any],
+                 old_data: Dict[str, Any],
+                 is_crypto: bool = False,
+                 db: Optional[Database] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Обработка раздела целиком: значения держатся выровненными колонками NumPy,
+    изменения, округление и пороги считаются векторно за один проход. Результат
+    совпадает с построчным расчётом до бита (см. _round_half и _floor_divide).
+    """
+    tickers, raw_values, values, old_values = _extract_section(new_data, _normalize_old_data(old_data))
+    if not tickers:
+        return {}
+
+    current = np.array(values, dtype=float)
+    change = _to_optional(_percent_changes(current, np.array(old_values, dtype=float)))
+    emojis = _threshold_emojis(tickers, current)
+    intervals = {
+        label: _to_optional(column)
+        for label, column in _interval_changes(tickers, current, is_crypto, db or _default_db()).items()
+    }
 
-        except Exception as e:
-            logger.error(f"Ошибка обработки {currency}: {e}")
-            continue
+    if is_crypto:
+        decimals = np.full(len(tickers), 4)
+        if "BTC" in tickers:
+            decimals[tickers.index("BTC")] = 2
+        shown = _round_half(current, decimals).tolist()
+    else:
+        shown = raw_values
 
+    processed = {}
+    for i, currency in enumerate(tickers):
+        entry = {
+            "value": shown[i],
+            "change": change[i],
+            "threshold_emoji": emojis[i],
+        }
+        for label, column in intervals.items():
+            entry[label] = column[i]
+        processed[currency] = entry
     return processed
@@ -1,116 +1,449 @@
 import sqlite3
+import time
 from datetime import datetime, timedelta
 import json
-from typing import Optional, Tuple, Any, Dict
+from typing import Optional, Tuple, Any, Dict, Iterable, List
 from contextlib import contextmanager
 import pytz
 
+from db_connection import connections
+from legacy_change import parse_legacy_change
 from service.logger import logger
-from service.settings import DATABASE_SETTINGS
+from service.settings import DATABASE_SETTINGS, TELEGRAM_CHANNEL_ID
+
+
+HOUR_MS = 60 * 60 * 1000
+DAY_MS = 24 * HOUR_MS
+# дневные бары выравниваются по московским суткам (UTC+3 без перехода на летнее время)
+MOSCOW_OFFSET_MS = 3 * HOUR_MS
 
 
 class Database:
-    def __init__(self, db_path: str = DATABASE_SETTINGS["db_path"]) -> None:
+    # строк (тикер × интервал) в одном пакетном запросе: 4 параметра на строку,
+    # с запасом до лимита SQLITE_MAX_VARIABLE_NUMBER = 999 в старых сборках
+    _BATCH_TARGETS = 200
+
+    # версия схемы -> метод миграции; применяются по порядку при старте
+    _MIGRATIONS = (
+        (1, "_migrate_history_to_epoch"),
+        (2, "_migrate_daily_blobs"),
+        (3, "_migrate_messages_per_chat"),
+    )
+
+    # разделы дневного среза в порядке приоритета при поиске тикера
+    _DAILY_SECTIONS = ("cbr_rates", "finance_data", "crypto_data")
+
+    def __init__(
+        self,
+        db_path: str = DATABASE_SETTINGS["db_path"],
+        readonly: bool = False,
+        dedicated: bool = False
+    ) -> None:
+        """
+        :param readonly: использовать отдельное соединение текущего потока только для чтения
+            (для пула читателей AsyncDatabase); схема при этом не создаётся.
+        :param dedicated: собственное соединение вместо общего на процесс (для потока-писателя).
+        """
         self.db_path = db_path
+        self.readonly = readonly
+        self.dedicated = dedicated
+        self._in_batch = False
         self._init_db()
 
     def _init_db(self) -> None:
-        self.conn = sqlite3.connect(self.db_path)
-        self.conn.row_factory = sqlite3.Row
-        self._create_tables()
-        logger.debug("Инициализация базы данных завершена")
+        if self.readonly:
+            self.conn = connections.reader(self.db_path)
+            return
+        # соединение общее на процесс; схема и миграции — только при первом открытии
+        self.conn = connections.dedicated(self.db_path) if self.dedicated else connections.connection(self.db_path)
+        if connections.mark_initialized(self.db_path):
+            self._create_tables()
+            self._apply_migrations()
+            logger.debug("Инициализация базы данных завершена")
 
     def _create_tables(self) -> None:
         with self._transaction() as cursor:
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS history_data (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER NOT NULL
+                )
+            """)
+            cursor.execute(self._HISTORY_DATA_SCHEMA.format(table="history_data"))
+            cursor.execute(self._HISTORY_BARS_SCHEMA)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS daily_values (
+                    date TEXT NOT NULL,
+                    section TEXT NOT NULL,
                     ticker TEXT NOT NULL,
-                    timestamp TEXT NOT NULL,
                     value REAL NOT NULL,
-                    type TEXT NOT NULL,
-                    UNIQUE(ticker, timestamp, type)
-                )
+                    change_1h REAL,
+                    change_1d REAL,
+                    change_1w REAL,
+                    PRIMARY KEY (date, section, ticker)
+                ) WITHOUT ROWID
             """)
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS daily_data (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    date TEXT NOT NULL UNIQUE,
-                    data TEXT NOT NULL
-                )
+                CREATE INDEX IF NOT EXISTS idx_daily_values_date_ticker ON daily_values (date, ticker)
             """)
+            cursor.execute(self._MESSAGES_SCHEMA.format(table="messages"))
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS messages (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    date TEXT NOT NULL UNIQUE,
-                    message_id INTEGER NOT NULL,
-                    data TEXT NOT NULL
-                )
+                CREATE TABLE IF NOT EXISTS last_good (
+                    source TEXT NOT NULL,
+                    ticker TEXT NOT NULL,
+                    value REAL NOT NULL,
+                    fetched_ts INTEGER NOT NULL,
+                    PRIMARY KEY (source, ticker)
+                ) WITHOUT ROWID
             """)
         logger.debug("Таблицы успешно созданы или уже существуют")
 
+    # Одно сообщение на дату в каждом канале; chat_id хранится строкой ("@name" или числовой id).
+    _MESSAGES_SCHEMA = """
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            chat_id TEXT NOT NULL,
+            message_id INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            UNIQUE (date, chat_id)
+        )
+    """
+
+    # ts — epoch в миллисекундах. Первичный ключ (ticker, type, ts DESC) в таблице
+    # WITHOUT ROWID служит покрывающим индексом: «последнее значение не позже T»
+    # — это один поиск по B-дереву без обращения к строкам таблицы.
+    _HISTORY_DATA_SCHEMA = """
+        CREATE TABLE IF NOT EXISTS {table} (
+            ticker TEXT NOT NULL,
+            type TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            value REAL NOT NULL,
+            PRIMARY KEY (ticker, type, ts DESC)
+        ) WITHOUT ROWID
+    """
+
+    # Бары прореженной истории: resolution — длина бара в мс, bucket — его начало,
+    # ts — метка последней точки бара (close), open_ts — первой (open).
+    _HISTORY_BARS_SCHEMA = """
+        CREATE TABLE IF NOT EXISTS history_bars (
+            ticker TEXT NOT NULL,
+            type TEXT NOT NULL,
+            resolution INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            open_ts INTEGER NOT NULL,
+            ts INTEGER NOT NULL,
+            open REAL NOT NULL,
+            high REAL NOT NULL,
+            low REAL NOT NULL,
+            close REAL NOT NULL,
+            samples INTEGER NOT NULL,
+            PRIMARY KEY (ticker, type, resolution, bucket DESC)
+        ) WITHOUT ROWID
+    """
+
+    # «Последнее значение не позже target» по всем уровням хранения: сырые точки
+    # всегда новее часовых баров, а те — дневных, поэтому берём первый найденный.
+    _VALUE_AT_SQL = f"""COALESCE(
+        (SELECT h.value FROM history_data h
+         WHERE h.ticker = t.ticker AND h.type = t.type AND h.ts <= t.target
+         ORDER BY h.ts DESC LIMIT 1),
+        (SELECT b.close FROM history_bars b
+         WHERE b.ticker = t.ticker AND b.type = t.type AND b.resolution = {HOUR_MS}
+           AND b.bucket <= t.target AND b.ts <= t.target
+         ORDER BY b.bucket DESC LIMIT 1),
+        (SELECT b.close FROM history_bars b
+         WHERE b.ticker = t.ticker AND b.type = t.type AND b.resolution = {DAY_MS}
+           AND b.bucket <= t.target AND b.ts <= t.target
+         ORDER BY b.bucket DESC LIMIT 1)
+    )"""
+
+    def _schema_version(self) -> int:
+        row = self.conn.execute("SELECT MAX(version) AS version FROM schema_version").fetchone()
+        return row["version"] or 0
+
+    def _apply_migrations(self) -> None:
+        version = self._schema_version()
+        for target, migration in self._MIGRATIONS:
+            if version >= target:
+                continue
+            logger.info(f"Миграция схемы БД до версии {target} ({migration})")
+            getattr(self, migration)()
+            with self._transaction() as cursor:
+                cursor.execute("DELETE FROM schema_version")
+                cursor.execute("INSERT INTO schema_version (version) VALUES (?)", (target,))
+            version = target
+
+    def _migrate_history_to_epoch(
+        self,
+        batch_size: int = DATABASE_SETTINGS["migration_batch_size"]
+    ) -> None:
+        """
+        Переносит history_data со строковых ISO-меток на epoch-миллисекунды.
+        Копирование идёт пачками в отдельных транзакциях, поэтому блокировка
+        записи держится недолго; повторный запуск после сбоя безопасен, в том числе
+        если сбой пришёлся на замену таблиц — перенос продолжается с history_data_v1.
+        """
+        leftover = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'history_data_v1'"
+        ).fetchone()
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(history_data)")}
+        if "ts" in columns:
+            if leftover:
+                # старая таблица уже удалена, а history_data пересоздана пустой при старте
+                logger.warning("Найдена недоделанная миграция history_data: завершаем замену таблиц")
+                self._swap_history_tables(merge_current=True)
+            return
+
+        with self._transaction() as cursor:
+            cursor.execute(self._HISTORY_DATA_SCHEMA.format(table="history_data_v1"))
+
+        last_id, copied, skipped = 0, 0, 0
+        while True:
+            rows = self.conn.execute("""
+                SELECT id, ticker, timestamp, value, type FROM history_data
+                WHERE id > ? ORDER BY id LIMIT ?
+            """, (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            params = []
+            for r in rows:
+                try:
+                    params.append((r["ticker"], r["type"], self._iso_to_ms(r["timestamp"]), r["value"]))
+                except (TypeError, ValueError) as e:
+                    logger.warning(f"history_data id={r['id']}: метка {r['timestamp']!r} не разобрана, строка пропущена ({e})")
+                    skipped += 1
+            with self._transaction() as cursor:
+                cursor.executemany("""
+                    INSERT OR IGNORE INTO history_data_v1 (ticker, type, ts, value)
+                    VALUES (?, ?, ?, ?)
+                """, params)
+            last_id = rows[-1]["id"]
+            copied += len(params)
+
+        self._swap_history_tables()
+        logger.info(f"history_data переведена на epoch-метки: перенесено {copied} строк, пропущено {skipped}")
+
+    def _swap_history_tables(self, merge_current: bool = False) -> None:
+        """
+        Заменяет history_data на history_data_v1 одной транзакцией. В режиме изоляции
+        по умолчанию sqlite3 не открывает транзакцию перед DDL сам, и DROP с RENAME
+        зафиксировались бы по отдельности, поэтому BEGIN — явный.
+        :param merge_current: перед заменой перелить строки текущей history_data (новой схемы).
+        """
+        with self._transaction() as cursor:
+            cursor.execute("BEGIN IMMEDIATE")
+            if merge_current:
+                cursor.execute("""
+                    INSERT OR IGNORE INTO history_data_v1 (ticker, type, ts, value)
+                    SELECT ticker, type, ts, value FROM history_data
+                """)
+            cursor.execute("DROP TABLE history_data")
+            cursor.execute("ALTER TABLE history_data_v1 RENAME TO history_data")
+
+    def _migrate_daily_blobs(
+        self,
+        batch_size: int = DATABASE_SETTINGS["migration_batch_size"]
+    ) -> None:
+        """Раскладывает JSON-срезы из daily_data по строкам daily_values и удаляет daily_data."""
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_data'"
+        ).fetchone()
+        if not exists:
+            return
+
+        last_id, migrated = 0, 0
+        while True:
+            rows = self.conn.execute("""
+                SELECT id, date, data FROM daily_data WHERE id > ? ORDER BY id LIMIT ?
+            """, (last_id, max(1, batch_size // 100))).fetchall()
+            if not rows:
+                break
+            with self._transaction() as cursor:
+                for row in rows:
+                    try:
+                        data = self._decode_json(row["data"])
+                    except Exception as e:
+                        logger.warning(f"daily_data за {row['date']} не разобрана и пропущена: {e}")
+                        continue
+                    self._write_daily_values(cursor, row["date"], data)
+                    migrated += 1
+            last_id = rows[-1]["id"]
+
+        with self._transaction() as cursor:
+            cursor.execute("DROP TABLE daily_data")
+        logger.info(f"daily_data перенесена в daily_values: {migrated} дней")
+
+    def _migrate_messages_per_chat(self, default_chat_id: str = TELEGRAM_CHANNEL_ID) -> None:
+        """Добавляет в messages chat_id: существующие сообщения относятся к основному каналу."""
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(messages)")}
+        if "chat_id" in columns:
+            return
+        with self._transaction() as cursor:
+            cursor.execute(self._MESSAGES_SCHEMA.format(table="messages_v3"))
+            cursor.execute("""
+                INSERT INTO messages_v3 (id, date, chat_id, message_id, data)
+                SELECT id, date, ?, message_id, data FROM messages
+            """, (str(default_chat_id),))
+            cursor.execute("DROP TABLE messages")
+            cursor.execute("ALTER TABLE messages_v3 RENAME TO messages")
+        logger.info(f"messages переведена на ключ (date, chat_id), канал по умолчанию {default_chat_id}")
+
+    @staticmethod
+    def _decode_json(text: str) -> Any:
+        # старые записи закодированы дважды: json.dumps от уже готовой JSON-строки
+        data = json.loads(text)
+        if isinstance(data, str):
+            data = json.loads(data)
+        return data
+
+    @classmethod
+    def _daily_rows(cls, date_str: str, data: Dict[str, Any]) -> List[Tuple]:
+        """Строки daily_values из среза {раздел: {тикер: {...}}}; крипто-подразделы сливаются в один."""
+        rows, seen = [], set()
+        for section in cls._DAILY_SECTIONS:
+            entries = data.get(section) or {}
+            if section == "crypto_data" and isinstance(entries.get("always"), dict):
+                groups = [entries.get(key) or {} for key in ("always", "daily_spikes", "hourly_spikes")]
+            else:
+                groups = [entries]
+            for group in groups:
+                for ticker, entry in group.items():
+                    if not isinstance(entry, dict) or (section, ticker) in seen:
+                        continue
+                    value = parse_legacy_change(entry.get("value"))
+                    if value is None:
+                        continue
+                    seen.add((section, ticker))
+                    rows.append((
+                        date_str, section, ticker, value,
+                        parse_legacy_change(entry.get("change_1h")),
+                        parse_legacy_change(entry.get("change_1d")),
+                        parse_legacy_change(entry.get("change_1w")),
+                    ))
+        return rows
+
+    @classmethod
+    def _write_daily_values(cls, cursor: sqlite3.Cursor, date_str: str, data: Dict[str, Any]) -> int:
+        rows = cls._daily_rows(date_str, data)
+        cursor.execute("DELETE FROM daily_values WHERE date = ?", (date_str,))
+        cursor.executemany("""
+            INSERT INTO daily_values (date, section, ticker, value, change_1h, change_1d, change_1w)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        return len(rows)
+
+    @staticmethod
+    def _iso_to_ms(value: str) -> int:
+        moment = datetime.fromisoformat(value)
+        if moment.tzinfo is None:
+            moment = pytz.timezone('Europe/Moscow').localize(moment)
+        return int(moment.timestamp() * 1000)
+
+    @staticmethod
+    def _now_ms() -> int:
+        return int(time.time() * 1000)
+
+    @contextmanager
+    def batch(self):
+        """
+        Объединяет несколько операций в одну транзакцию с одним коммитом.
+        Каждая операция внутри выполняется под своим SAVEPOINT и при ошибке
+        откатывается отдельно, не затрагивая остальные.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        self._in_batch = True
+        try:
+            yield self
+            started = time.perf_counter()
+            self.conn.commit()
+            connections.record_commit((time.perf_counter() - started) * 1000)
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Ошибка в пакетной транзакции: {e}")
+            raise
+        finally:
+            self._in_batch = False
+
     @contextmanager
     def _transaction(self):
         cursor = self.conn.cursor()
+        if self._in_batch:
+            cursor.execute("SAVEPOINT operation")
+            try:
+                yield cursor
+            except Exception as e:
+                cursor.execute("ROLLBACK TO operation")
+                cursor.execute("RELEASE operation")
+                logger.error(f"Ошибка в транзакции: {e}")
+                raise
+            cursor.execute("RELEASE operation")
+            return
         try:
             yield cursor
+            started = time.perf_counter()
             self.conn.commit()
+            connections.record_commit((time.perf_counter() - started) * 1000)
         except Exception as e:
             self.conn.rollback()
             logger.error(f"Ошибка в транзакции: {e}")
             raise
 
-    def save_data(self, message_id: int, data: Dict[str, Any]) -> None:
+    def save_data(self, message_id: int, data: Dict[str, Any], chat_id: str = TELEGRAM_CHANNEL_ID) -> None:
         current_date = self._current_date()
         with self._transaction() as cursor:
             cursor.execute("""
-                INSERT OR REPLACE INTO messages (date, message_id, data)
-                VALUES (?, ?, ?)
-            """, (current_date, message_id, json.dumps(data, ensure_ascii=False)))
-        logger.info(f"Сообщение за {current_date} сохранено (ID: {message_id})")
+                INSERT OR REPLACE INTO messages (date, chat_id, message_id, data)
+                VALUES (?, ?, ?, ?)
+            """, (current_date, str(chat_id), message_id, json.dumps(data, ensure_ascii=False)))
+        logger.info(f"Сообщение за {current_date} в {chat_id} сохранено (ID: {message_id})")
 
     def save_daily_data(self, data: Dict[str, Any]) -> None:
         today = self._current_date()
+        if isinstance(data, str):
+            data = self._decode_json(data)
         with self._transaction() as cursor:
-            cursor.execute("""
-                INSERT OR REPLACE INTO daily_data (date, data)
-                VALUES (?, ?)
-            """, (today, json.dumps(data, ensure_ascii=False)))
-        logger.info(f"Дневные данные за {today} успешно сохранены")
+            written = self._write_daily_values(cursor, today, data)
+        logger.info(f"Дневные данные за {today} успешно сохранены ({written} значений)")
 
-    def save_last_daily_message(self, message_id: int, data: Dict[str, Any]) -> None:
+    def save_last_daily_message(self, message_id: int, data: Dict[str, Any], chat_id: str = TELEGRAM_CHANNEL_ID) -> None:
         current_date = self._current_date()
         with self._transaction() as cursor:
-            cursor.execute("DELETE FROM messages WHERE date = ?", (current_date,))
+            cursor.execute("DELETE FROM messages WHERE date = ? AND chat_id = ?", (current_date, str(chat_id)))
             cursor.execute("""
-                INSERT INTO messages (date, message_id, data)
-                VALUES (?, ?, ?)
-            """, (current_date, message_id, json.dumps(data, ensure_ascii=False)))
-        logger.info(f"Последнее сообщение дня за {current_date} сохранено (ID: {message_id})")
+                INSERT INTO messages (date, chat_id, message_id, data)
+                VALUES (?, ?, ?, ?)
+            """, (current_date, str(chat_id), message_id, json.dumps(data, ensure_ascii=False)))
+        logger.info(f"Последнее сообщение дня за {current_date} в {chat_id} сохранено (ID: {message_id})")
 
-    def get_today_message(self) -> Optional[Tuple[int, Dict[str, Any]]]:
+    def get_today_message(self, chat_id: str = TELEGRAM_CHANNEL_ID) -> Optional[Tuple[int, Dict[str, Any]]]:
         today = self._current_date()
         with self._transaction() as cursor:
             cursor.execute("""
                 SELECT message_id, data FROM messages 
-                WHERE date = ? ORDER BY id DESC LIMIT 1
-            """, (today,))
+                WHERE date = ? AND chat_id = ?
+            """, (today, str(chat_id)))
             if result := cursor.fetchone():
-                logger.debug(f"Найдено сообщение за сегодня ({today})")
-                return result["message_id"], json.loads(result["data"])
-        logger.debug("Сообщение за сегодня не найдено")
+                logger.debug(f"Найдено сообщение за сегодня ({today}) в {chat_id}")
+                return result["message_id"], self._decode_json(result["data"])
+        logger.debug(f"Сообщение за сегодня в {chat_id} не найдено")
         return None
 
-    def get_previous_day_message(self) -> Optional[Tuple[int, Dict[str, Any]]]:
+    def get_today_message_ids(self) -> Dict[str, int]:
+        """message_id сегодняшних сообщений по всем каналам: chat_id -> message_id."""
+        with self._transaction() as cursor:
+            cursor.execute("SELECT chat_id, message_id FROM messages WHERE date = ?", (self._current_date(),))
+            return {row["chat_id"]: row["message_id"] for row in cursor.fetchall()}
+
+    def get_previous_day_message(self, chat_id: str = TELEGRAM_CHANNEL_ID) -> Optional[Tuple[int, Dict[str, Any]]]:
         previous_day = self._current_date(days_ago=1)
         with self._transaction() as cursor:
             cursor.execute("""
                 SELECT message_id, data FROM messages 
-                WHERE date = ? ORDER BY id DESC LIMIT 1
-            """, (previous_day,))
+                WHERE date = ? AND chat_id = ?
+            """, (previous_day, str(chat_id)))
             if result := cursor.fetchone():
                 logger.debug(f"Сообщение за предыдущий день ({previous_day}) получено")
-                return result["message_id"], json.loads(result["data"])
+                return result["message_id"], self._decode_json(result["data"])
         logger.debug("Сообщение за предыдущий день не найдено")
         return None
 
@@ -119,70 +452,176 @@ class Database:
 
     def get_last_daily_data(self) -> Dict[str, Any]:
         yesterday = self._current_date(days_ago=1)
-        with self._transaction() as cursor:
-            cursor.execute("SELECT data FROM daily_data WHERE date = ?", (yesterday,))
-            if result := cursor.fetchone():
-                logger.debug(f"Дневные данные за {yesterday} получены")
-                try:
-                    return json.loads(result["data"])
-                except Exception as e:
-                    logger.error(f"Ошибка при декодировании daily_data: {e}")
-        logger.debug(f"Дневные данные за {yesterday} отсутствуют")
-        return {}
-
-    def save_history_data(self, ticker: str, value: Optional[float], data_type: str) -> None:
-        if value is None:
-            logger.warning(f"Попытка сохранить None для {ticker} ({data_type}) — пропущено")
-            return
-        timestamp = datetime.now(pytz.timezone('Europe/Moscow')).isoformat()
         with self._transaction() as cursor:
             cursor.execute("""
-                INSERT OR IGNORE INTO history_data (ticker, timestamp, value, type)
+                SELECT section, ticker, value, change_1h, change_1d, change_1w
+                FROM daily_values WHERE date = ?
+            """, (yesterday,))
+            rows = cursor.fetchall()
+        if not rows:
+            logger.debug(f"Дневные данные за {yesterday} отсутствуют")
+            return {}
+
+        data: Dict[str, Any] = {}
+        for row in rows:
+            data.setdefault(row["section"], {})[row["ticker"]] = {
+                "value": row["value"],
+                "change_1h": row["change_1h"],
+                "change_1d": row["change_1d"],
+                "change_1w": row["change_1w"],
+            }
+        logger.debug(f"Дневные данные за {yesterday} получены")
+        return data
+
+    def save_history_snapshot(
+        self,
+        rows: Iterable[Tuple[str, str, Optional[float]]],
+        ts: Optional[int] = None
+    ) -> int:
+        """
+        Сохраняет срез значений за цикл одной транзакцией с общей меткой времени.
+        :param rows: кортежи (тикер, тип данных, значение); None пропускаются.
+        :param ts: метка времени в epoch-мс (по умолчанию — текущее время).
+        :return: количество записанных строк.
+        """
+        ts = self._now_ms() if ts is None else ts
+        params = []
+        for ticker, data_type, value in rows:
+            if value is None:
+                logger.warning(f"Попытка сохранить None для {ticker} ({data_type}) — пропущено")
+                continue
+            params.append((ticker, data_type, ts, value))
+
+        if not params:
+            return 0
+        with self._transaction() as cursor:
+            cursor.executemany("""
+                INSERT OR IGNORE INTO history_data (ticker, type, ts, value)
                 VALUES (?, ?, ?, ?)
-            """, (ticker, timestamp, value, data_type))
-        logger.debug(f"Исторические данные сохранены: {ticker} ({data_type}) = {value} @ {timestamp}")
+            """, params)
+            written = cursor.rowcount
+        logger.debug(f"Исторические данные сохранены: {written} из {len(params)} строк @ {ts}")
+        return written
 
-    def get_change(self, ticker: str, current_value: float, data_type: str, delta: timedelta) -> Optional[float]:
-        tz = pytz.timezone('Europe/Moscow')
-        target_time = datetime.now(tz) - delta
-        target_iso = target_time.isoformat()
+    def save_last_good(self, rows: Iterable[Tuple[str, str, float, int]]) -> int:
+        """Сохраняет последние удачные значения: кортежи (источник, тикер, значение, fetched_ms)."""
+        rows = list(rows)
+        if not rows:
+            return 0
+        with self._transaction() as cursor:
+            cursor.executemany("""
+                INSERT INTO last_good (source, ticker, value, fetched_ts)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (source, ticker) DO UPDATE SET
+                    value = excluded.value,
+                    fetched_ts = excluded.fetched_ts
+                WHERE excluded.fetched_ts > last_good.fetched_ts
+            """, rows)
+        return len(rows)
+
+    def get_last_good(self) -> List[Tuple[str, str, float, int]]:
+        with self._transaction() as cursor:
+            cursor.execute("SELECT source, ticker, value, fetched_ts FROM last_good")
+            return [tuple(row) for row in cursor.fetchall()]
 
+    def get_history_since(self, since_ms: int) -> List[Tuple[str, str, int, float]]:
+        """
+        История с момента since_ms: кортежи (тикер, тип, ts, значение) по возрастанию ts.
+        Для каждого ряда добавляется последняя точка до since_ms, чтобы окно
+        могло ответить на запрос ровно на границе интервала.
+        """
         with self._transaction() as cursor:
+            # MAX(ts) с «голым» value — SQLite берёт value из строки с максимальным ts
             cursor.execute("""
-                SELECT value FROM history_data 
-                WHERE ticker = ? AND type = ? AND timestamp <= ?
-                ORDER BY timestamp DESC LIMIT 1
-            """, (ticker, data_type, target_iso))
-            row = cursor.fetchone()
-
-            if row:
-                past_value = row["value"]
-                if past_value:
-                    change = round(((current_value - past_value) / past_value) * 100, 2)
-                    logger.debug(f"Изменение {ticker} ({data_type}) за {delta}: {change}% (по history_data)")
-                    return change
-
-            if delta == timedelta(days=1):
-                date_str = self._current_date(days_ago=1)
-                cursor.execute("SELECT data FROM daily_data WHERE date = ?", (date_str,))
-                row = cursor.fetchone()
-                if row:
-                    try:
-                        data = json.loads(row["data"])  # 🪄 добавили json.loads
-                        # ищем в одном из разделов
-                        for section in ("cbr_rates", "finance_data", "crypto_data"):
-                            if ticker in data.get(section, {}):
-                                past_value = data[section][ticker].get("value")
-                                if past_value:
-                                    change = round(((current_value - past_value) / past_value) * 100, 2)
-                                    logger.debug(
-                                        f"Изменение {ticker} ({data_type}) за {delta}: {change}% (по daily_data)")
-                                    return change
-                    except Exception as e:
-                        logger.warning(f"Ошибка при обработке daily_data fallback для {ticker}: {e}")
+                WITH points AS (
+                    SELECT ticker, type, ts, value FROM history_data
+                    UNION ALL
+                    SELECT ticker, type, ts, close FROM history_bars
+                )
+                SELECT ticker, type, ts, value FROM points WHERE ts >= ?
+                UNION ALL
+                SELECT ticker, type, MAX(ts), value FROM points WHERE ts < ?
+                GROUP BY ticker, type
+                ORDER BY ticker, type, ts
+            """, (since_ms, since_ms))
+            return [tuple(row) for row in cursor.fetchall()]
 
-        logger.debug(f"Недостаточно данных для расчета изменения {ticker} ({data_type}) за {delta}")
-        return None
+    def get_change(self, ticker: str, current_value: float, data_type: str, delta: timedelta) -> Optional[float]:
+        change = self.get_changes_batch({ticker: current_value}, data_type, {"change": delta})[ticker]["change"]
+        if change is None:
+            logger.debug(f"Недостаточно данных для расчета изменения {ticker} ({data_type}) за {delta}")
+        return change
+
+    def get_changes_batch(
+        self,
+        values: Dict[str, float],
+        data_type: str,
+        deltas: Dict[str, timedelta]
+    ) -> Dict[str, Dict[str, Optional[float]]]:
+        """
+        Изменения сразу для всех тикеров и интервалов одним запросом.
+        :param values: текущие значения по тикерам.
+        :param deltas: метка результата -> интервал (например, "change_1h": 1 час).
+        :return: тикер -> {метка: изменение в % или None}.
+        """
+        now_ms = self._now_ms()
+        targets = [
+            (ticker, data_type, label, now_ms - int(delta.total_seconds() * 1000))
+            for ticker in values
+            for label, delta in deltas.items()
+        ]
+        result = {ticker: dict.fromkeys(deltas) for ticker in values}
+
+        with self._transaction() as cursor:
+            for start in range(0, len(targets), self._BATCH_TARGETS):
+                chunk = targets[start:start + self._BATCH_TARGETS]
+                placeholders = ", ".join("(?, ?, ?, ?)" for _ in chunk)
+                cursor.execute(f"""
+                    WITH targets(ticker, type, label, target) AS (VALUES {placeholders})
+                    SELECT t.ticker, t.label, {self._VALUE_AT_SQL} AS value
+                    FROM targets t
+                """, [param for target in chunk for param in target])
+                for row in cursor.fetchall():
+                    result[row["ticker"]][row["label"]] = self._percent_change(
+                        values[row["ticker"]], row["value"]
+                    )
+
+            daily_label = next((label for label, delta in deltas.items() if delta == timedelta(days=1)), None)
+            missing = [t for t, changes in result.items() if daily_label and changes[daily_label] is None]
+            if missing:
+                daily_values = self._daily_values(cursor, self._current_date(days_ago=1), missing)
+                for ticker in missing:
+                    result[ticker][daily_label] = self._percent_change(values[ticker], daily_values.get(ticker))
+
+        logger.debug(f"Изменения ({data_type}) рассчитаны для {len(values)} тикеров")
+        return result
+
+    @staticmethod
+    def _percent_change(current_value: float, past_value: Optional[float]) -> Optional[float]:
+        if not past_value:
+            return None
+        return round(((current_value - past_value) / past_value) * 100, 2)
+
+    @classmethod
+    def _daily_values(cls, cursor: sqlite3.Cursor, date_str: str, tickers: List[str]) -> Dict[str, float]:
+        """Значения тикеров из дневного среза за дату — поиск по индексу (date, ticker)."""
+        found: Dict[str, Dict[str, float]] = {}
+        for start in range(0, len(tickers), cls._BATCH_TARGETS):
+            chunk = tickers[start:start + cls._BATCH_TARGETS]
+            cursor.execute(f"""
+                SELECT section, ticker, value FROM daily_values
+                WHERE date = ? AND ticker IN ({", ".join("?" for _ in chunk)})
+            """, (date_str, *chunk))
+            for row in cursor.fetchall():
+                found.setdefault(row["ticker"], {})[row["section"]] = row["value"]
+
+        values = {}
+        for ticker, by_section in found.items():
+            for section in cls._DAILY_SECTIONS:
+                if by_section.get(section):
+                    values[ticker] = by_section[section]
+                    break
+        return values
 
     def clear_old_data(self, days_threshold: int = DATABASE_SETTINGS["cleanup_days_threshold"]) -> None:
         cutoff_date = self._current_date(days_ago=days_threshold)
@@ -190,14 +629,144 @@ class Database:
             cursor.execute("DELETE FROM messages WHERE date < ?", (cutoff_date,))
         logger.info(f"Старые данные до {cutoff_date} удалены")
 
+    def apply_retention(self, settings: Dict[str, Any] = DATABASE_SETTINGS["retention"]) -> Dict[str, int]:
+        """
+        Прореживание истории: сырые точки старше raw_days сворачиваются в часовые бары,
+        часовые бары старше hourly_days — в дневные, дневные старше daily_days удаляются.
+        Работает пачками по batch_size строк, каждая пачка — отдельная короткая транзакция.
+        """
+        now = self._now_ms()
+        batch_size = settings["batch_size"]
+        raw_cutoff = self._bucket(now - settings["raw_days"] * DAY_MS, HOUR_MS)
+        hourly_cutoff = self._bucket(now - settings["hourly_days"] * DAY_MS, DAY_MS)
+        daily_cutoff = self._bucket(now - settings["daily_days"] * DAY_MS, DAY_MS)
+
+        stats = {"raw_to_hourly": 0, "hourly_to_daily": 0, "expired_daily": 0}
+        for series in self._list_series("history_data"):
+            stats["raw_to_hourly"] += self._roll_up(series, None, HOUR_MS, raw_cutoff, batch_size)
+        for series in self._list_series("history_bars"):
+            stats["hourly_to_daily"] += self._roll_up(series, HOUR_MS, DAY_MS, hourly_cutoff, batch_size)
+
+        while True:
+            with self._transaction() as cursor:
+                cursor.execute("""
+                    DELETE FROM history_bars WHERE (ticker, type, resolution, bucket) IN (
+                        SELECT ticker, type, resolution, bucket FROM history_bars
+                        WHERE resolution = ? AND bucket < ? LIMIT ?
+                    )
+                """, (DAY_MS, daily_cutoff, batch_size))
+                deleted = cursor.rowcount
+            stats["expired_daily"] += deleted
+            if deleted < batch_size:
+                break
+
+        logger.info(f"Прореживание истории завершено: {stats}")
+        return stats
+
+    def _list_series(self, table: str) -> List[Tuple[str, str]]:
+        """Все пары (тикер, тип) таблицы — прыжками по первичному ключу, без полного сканирования."""
+        series, last = [], ("", "")
+        while row := self.conn.execute(f"""
+            SELECT ticker, type FROM {table} WHERE (ticker, type) > (?, ?)
+            ORDER BY ticker, type LIMIT 1
+        """, last).fetchone():
+            last = (row["ticker"], row["type"])
+            series.append(last)
+        return series
+
+    def _roll_up(
+        self,
+        series: Tuple[str, str],
+        source_resolution: Optional[int],
+        target_resolution: int,
+        cutoff: int,
+        batch_size: int
+    ) -> int:
+        """
+        Сворачивает точки ряда старше cutoff в бары target_resolution.
+        :param source_resolution: None — сырые точки history_data, иначе длина исходных баров.
+        :return: сколько исходных строк свёрнуто и удалено.
+        """
+        ticker, data_type = series
+        moved = 0
+        while True:
+            if source_resolution is None:
+                rows = self.conn.execute("""
+                    SELECT ts AS key, ts AS open_ts, ts, value AS open, value AS high,
+                           value AS low, value AS close, 1 AS samples
+                    FROM history_data WHERE ticker = ? AND type = ? AND ts < ?
+                    ORDER BY ts LIMIT ?
+                """, (ticker, data_type, cutoff, batch_size)).fetchall()
+            else:
+                rows = self.conn.execute("""
+                    SELECT bucket AS key, open_ts, ts, open, high, low, close, samples
+                    FROM history_bars WHERE ticker = ? AND type = ? AND resolution = ? AND bucket < ?
+                    ORDER BY bucket LIMIT ?
+                """, (ticker, data_type, source_resolution, cutoff, batch_size)).fetchall()
+            if not rows:
+                break
+
+            bars: Dict[int, Dict[str, Any]] = {}
+            for row in rows:
+                bucket = self._bucket(row["open_ts"], target_resolution)
+                bar = bars.get(bucket)
+                if bar is None:
+                    bars[bucket] = dict(row)
+                    continue
+                if row["open_ts"] < bar["open_ts"]:
+                    bar["open_ts"], bar["open"] = row["open_ts"], row["open"]
+                if row["ts"] > bar["ts"]:
+                    bar["ts"], bar["close"] = row["ts"], row["close"]
+                bar["high"] = max(bar["high"], row["high"])
+                bar["low"] = min(bar["low"], row["low"])
+                bar["samples"] += row["samples"]
+
+            with self._transaction() as cursor:
+                cursor.executemany("""
+                    INSERT INTO history_bars
+                        (ticker, type, resolution, bucket, open_ts, ts, open, high, low, close, samples)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (ticker, type, resolution, bucket) DO UPDATE SET
+                        open = CASE WHEN excluded.open_ts < open_ts THEN excluded.open ELSE open END,
+                        open_ts = MIN(open_ts, excluded.open_ts),
+                        close = CASE WHEN excluded.ts > ts THEN excluded.close ELSE close END,
+                        ts = MAX(ts, excluded.ts),
+                        high = MAX(high, excluded.high),
+                        low = MIN(low, excluded.low),
+                        samples = samples + excluded.samples
+                """, [
+                    (ticker, data_type, target_resolution, bucket, bar["open_ts"], bar["ts"],
+                     bar["open"], bar["high"], bar["low"], bar["close"], bar["samples"])
+                    for bucket, bar in bars.items()
+                ])
+                first_key, last_key = rows[0]["key"], rows[-1]["key"]
+                if source_resolution is None:
+                    cursor.execute("""
+                        DELETE FROM history_data WHERE ticker = ? AND type = ? AND ts BETWEEN ? AND ?
+                    """, (ticker, data_type, first_key, last_key))
+                else:
+                    cursor.execute("""
+                        DELETE FROM history_bars
+                        WHERE ticker = ? AND type = ? AND resolution = ? AND bucket BETWEEN ? AND ?
+                    """, (ticker, data_type, source_resolution, first_key, last_key))
+
+            moved += len(rows)
+            if len(rows) < batch_size:
+                break
+        return moved
+
+    @staticmethod
+    def _bucket(ts: int, resolution: int) -> int:
+        return (ts + MOSCOW_OFFSET_MS) // resolution * resolution - MOSCOW_OFFSET_MS
+
     def clear_invalid_data(self, min_length: int = DATABASE_SETTINGS["min_valid_length"]) -> None:
         with self._transaction() as cursor:
             cursor.execute("DELETE FROM messages WHERE LENGTH(data) < ?", (min_length,))
         logger.info(f"Удалены некорректные записи (длина данных < {min_length})")
 
     def close(self) -> None:
-        self.conn.close()
-        logger.debug("Соединение с базой данных закрыто")
+        # соединение принадлежит ConnectionManager и закрывается через connections.close_all()
+        logger.debug("Экземпляр Database освобождён")
 
     def _current_date(self, days_ago: int = 0) -> str:
         moscow_time = datetime.now(pytz.timezone('Europe/Moscow')) - timedelta(days=days_ago)
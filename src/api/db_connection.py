@@ -0,0 +1,127 @@
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List
+
+from service.logger import logger
+from service.settings import DATABASE_SETTINGS
+
+
+class ConnectionManager:
+    """
+    Владеет одним долгоживущим соединением SQLite на файл БД в пределах процесса.
+    Соединение настраивается один раз (WAL, synchronous=NORMAL, mmap, кэш страниц)
+    и переиспользуется всеми экземплярами Database вместе с кэшем подготовленных запросов.
+    """
+
+    def __init__(self, settings: Dict[str, Any] = DATABASE_SETTINGS["sqlite"]):
+        self.settings = settings
+        self._connections: Dict[str, sqlite3.Connection] = {}
+        self._readers: List[sqlite3.Connection] = []
+        self._dedicated: List[sqlite3.Connection] = []
+        self._local = threading.local()
+        self._initialized = set()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.commit_stats = {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+
+    def connection(self, db_path: str) -> sqlite3.Connection:
+        with self._lock:
+            self._reset_after_fork()
+            conn = self._connections.get(db_path)
+            if conn is None:
+                conn = self._connections[db_path] = self._connect(db_path)
+            return conn
+
+    def reader(self, db_path: str) -> sqlite3.Connection:
+        """
+        Соединение только для чтения, своё у каждого потока: в режиме WAL читатели
+        не ждут писателя. Для :memory: отдельного соединения быть не может —
+        возвращается общее.
+        """
+        if db_path == ":memory:":
+            return self.connection(db_path)
+        readers = self._local.__dict__.setdefault("connections", {})
+        conn = readers.get(db_path)
+        if conn is None:
+            conn = readers[db_path] = self._connect(db_path)
+            conn.execute("PRAGMA query_only = ON")
+            with self._lock:
+                self._readers.append(conn)
+        return conn
+
+    def dedicated(self, db_path: str) -> sqlite3.Connection:
+        """
+        Отдельное соединение для одного потока-владельца (писатель AsyncDatabase):
+        его транзакции и SAVEPOINT не перемежаются с чужими на общем соединении.
+        Для :memory: отдельного соединения быть не может — возвращается общее.
+        """
+        if db_path == ":memory:":
+            return self.connection(db_path)
+        conn = self._connect(db_path)
+        with self._lock:
+            self._dedicated.append(conn)
+        return conn
+
+    def _connect(self, db_path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            db_path,
+            check_same_thread=False,
+            cached_statements=self.settings["cached_statements"],
+        )
+        conn.row_factory = sqlite3.Row
+        journal_mode = conn.execute(f"PRAGMA journal_mode = {self.settings['journal_mode']}").fetchone()[0]
+        conn.execute(f"PRAGMA synchronous = {self.settings['synchronous']}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.settings['mmap_size'])}")
+        # отрицательное значение cache_size — размер в КиБ, а не в страницах
+        conn.execute(f"PRAGMA cache_size = -{int(self.settings['cache_size_kib'])}")
+        conn.execute(f"PRAGMA temp_store = {self.settings['temp_store']}")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.settings['busy_timeout_ms'])}")
+        logger.info(f"Открыто соединение SQLite {db_path} (journal_mode={journal_mode})")
+        return conn
+
+    def _reset_after_fork(self) -> None:
+        # соединения SQLite нельзя использовать в дочернем процессе
+        if os.getpid() != self._pid:
+            self._connections.clear()
+            self._readers.clear()
+            self._dedicated.clear()
+            self._local = threading.local()
+            self._initialized.clear()
+            self._pid = os.getpid()
+
+    def mark_initialized(self, db_path: str) -> bool:
+        """True, если схему для db_path ещё не создавали в этом процессе (и отмечает её)."""
+        with self._lock:
+            if db_path in self._initialized:
+                return False
+            self._initialized.add(db_path)
+            return True
+
+    def record_commit(self, elapsed_ms: float) -> None:
+        stats = self.commit_stats
+        stats["count"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    def commit_summary(self) -> str:
+        stats = self.commit_stats
+        avg = stats["total_ms"] / stats["count"] if stats["count"] else 0.0
+        return f"коммитов {stats['count']}, среднее {avg:.2f} мс, максимум {stats['max_ms']:.2f} мс"
+
+    def close_all(self) -> None:
+        with self._lock:
+            for db_path, conn in self._connections.items():
+                conn.close()
+                logger.debug(f"Соединение с {db_path} закрыто")
+            for conn in self._readers + self._dedicated:
+                conn.close()
+            self._connections.clear()
+            self._readers.clear()
+            self._dedicated.clear()
+            self._local = threading.local()
+            self._initialized.clear()
+        logger.info(f"Соединения SQLite закрыты ({self.commit_summary()})")
+
+
+connections = ConnectionManager()
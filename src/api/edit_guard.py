@@ -0,0 +1,60 @@
+import hashlib
+import json
+import time
+from typing import Any, Optional
+
+from service.logger import logger
+from service.settings import EDIT_SETTINGS
+
+
+class EditGuard:
+    """
+    Решает, стоит ли редактировать сообщение: хранит хэш данных последней правки
+    и хэш отрисованного текста без строки «Upd». Если ни то ни другое не изменилось,
+    правка пропускается — кроме случаев, когда с последнего обновления прошло
+    больше force_refresh_minutes.
+    """
+
+    def __init__(self, force_refresh_minutes: float = EDIT_SETTINGS["force_refresh_minutes"]):
+        self.force_refresh_seconds = force_refresh_minutes * 60
+        self.skipped = 0
+        self._data_hash: Optional[str] = None
+        self._text_hash: Optional[str] = None
+        self._last_edit: float = 0.0
+
+    @staticmethod
+    def data_hash(data: Any) -> str:
+        payload = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        # первая строка — заголовок с датой и временем «Upd», в сравнении не участвует
+        _, _, body = text.partition("\n")
+        return hashlib.blake2b(body.encode(), digest_size=16).hexdigest()
+
+    def _refresh_due(self) -> bool:
+        return time.monotonic() - self._last_edit >= self.force_refresh_seconds
+
+    def data_changed(self, data: Any) -> bool:
+        """False — данные те же, что при последней правке, и принудительное обновление не требуется."""
+        if self.data_hash(data) != self._data_hash or self._refresh_due():
+            return True
+        self._skip("данные не изменились")
+        return False
+
+    def text_changed(self, text: str) -> bool:
+        if self.text_hash(text) != self._text_hash or self._refresh_due():
+            return True
+        self._skip("текст не изменился")
+        return False
+
+    def remember(self, data: Any, text: str) -> None:
+        """Фиксирует успешную правку."""
+        self._data_hash = self.data_hash(data)
+        self._text_hash = self.text_hash(text)
+        self._last_edit = time.monotonic()
+
+    def _skip(self, reason: str) -> None:
+        self.skipped += 1
+        logger.info(f"Правка сообщения пропущена: {reason} (пропущено всего: {self.skipped})")
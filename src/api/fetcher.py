@@ -0,0 +1,94 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from resilience import CircuitBreaker, CircuitOpenError
+from service.logger import logger
+from service.settings import FETCH_SETTINGS
+
+# запас к дедлайну обёрнутого провайдера: он должен успеть сам зафиксировать сбой
+_RESILIENT_GRACE_SECONDS = 1.0
+
+
+@dataclass
+class FetchResult:
+    source: str
+    data: Any
+    ok: bool
+    elapsed: float
+    error: Optional[str] = None
+    # частичные сбои удачного опроса: тикер -> причина
+    failures: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class DataSource:
+    name: str
+    fetch: Callable[[], Awaitable[Any]]
+    timeout: float
+    failures: Optional[Callable[[], Dict[str, str]]] = None
+
+
+class FetchOrchestrator:
+    """Реестр источников данных: опрашивает каждый с дедлайном и учётом предохранителя."""
+
+    def __init__(self, default_timeout: float = FETCH_SETTINGS["default_timeout_seconds"]):
+        self.default_timeout = default_timeout
+        self._sources: Dict[str, DataSource] = {}
+
+    def register(
+        self,
+        name: str,
+        fetch: Callable[[], Awaitable[Any]],
+        timeout: Optional[float] = None,
+        failures: Optional[Callable[[], Dict[str, str]]] = None
+    ) -> None:
+        """
+        Регистрирует асинхронный источник.
+        :param timeout: дедлайн источника в секундах (по умолчанию из FETCH_SETTINGS).
+        :param failures: тикеры без данных в последнем опросе (тикер -> причина), если источник их ведёт.
+        """
+        if timeout is None and hasattr(fetch, "deadline"):
+            timeout = fetch.deadline + _RESILIENT_GRACE_SECONDS
+        if timeout is None:
+            timeout = FETCH_SETTINGS["source_timeouts"].get(name, self.default_timeout)
+        self._sources[name] = DataSource(name, fetch, timeout, failures)
+
+    async def fetch(self, name: str) -> FetchResult:
+        """Опрашивает один источник."""
+        result = await self._fetch_one(self._sources[name])
+        logger.debug(f"Источник {name}: {'ok' if result.ok else result.error or 'fail'} ({result.elapsed:.2f} с)")
+        return result
+
+    @staticmethod
+    def _breaker(source: DataSource) -> Optional[CircuitBreaker]:
+        return getattr(source.fetch, "breaker", None)
+
+    def breaker_states(self) -> Dict[str, str]:
+        """Состояние предохранителей зарегистрированных источников (у кого они есть)."""
+        return {
+            name: breaker.state
+            for name, source in self._sources.items()
+            if (breaker := self._breaker(source)) is not None
+        }
+
+    async def _fetch_one(self, source: DataSource) -> FetchResult:
+        started = time.monotonic()
+        breaker = self._breaker(source)
+        if breaker is not None and not breaker.can_request():
+            # источник отключён или уже идёт пробный запрос — не тратим на него бюджет цикла
+            return FetchResult(source.name, {}, False, 0.0, "circuit open")
+        try:
+            data = await asyncio.wait_for(source.fetch(), timeout=source.timeout)
+            failures = source.failures() if source.failures is not None and data else {}
+            return FetchResult(source.name, data or {}, bool(data), time.monotonic() - started, failures=failures)
+        except CircuitOpenError:
+            # предохранитель разомкнулся между проверкой и вызовом
+            return FetchResult(source.name, {}, False, time.monotonic() - started, "circuit open")
+        except asyncio.TimeoutError:
+            logger.error(f"Источник {source.name} не ответил за {source.timeout} с")
+            return FetchResult(source.name, {}, False, time.monotonic() - started, "timeout")
+        except Exception as e:
+            logger.error(f"Ошибка источника {source.name}: {e}")
+            return FetchResult(source.name, {}, False, time.monotonic() - started, str(e))
@@ -1,9 +1,19 @@
-import requests
+import asyncio
+import aiohttp
+from datetime import datetime, timedelta
 from typing import Dict, Optional, Any
 from dataclasses import dataclass
 
+from http_client import http_clients
+from resilience import resilient
 from service.logger import logger
-from service.settings import CBR_API_URL, REQUIRED_CURRENCIES, SPECIAL_NOMINALS
+from service.settings import (
+    CBR_API_URL,
+    CBR_SETTINGS,
+    REQUIRED_CURRENCIES,
+    SPECIAL_NOMINALS,
+    moscow_tz,
+)
 
 
 @dataclass
@@ -14,27 +24,70 @@ class CurrencyRate:
     nominal: int
 
 
-class CBRService:
-    """Сервис для работы с API Центробанка России."""
+class AsyncCBRService:
+    """
+    Асинхронный клиент ЦБ РФ с условными запросами (ETag / If-Modified-Since).
+    Разобранная таблица курсов живёт в памяти до следующей публикации ЦБ:
+    до неё запросы не отправляются вовсе, после — раз в recheck_minutes
+    уходит условный запрос, на который сервер отвечает 304 без тела.
+    """
 
-    def __init__(self, base_url: str = CBR_API_URL):
+    def __init__(
+        self,
+        base_url: str = CBR_API_URL,
+        recheck_interval: timedelta = timedelta(minutes=CBR_SETTINGS["recheck_minutes"])
+    ):
         self.base_url = base_url
-        self.session = requests.Session()
-        self.session.headers.update({
-            "User-Agent": "CurrencyBot/1.0",
-            "Accept": "application/json"
-        })
-
-    def fetch_currency_data(self) -> Optional[Dict[str, Any]]:
-        """Получает актуальные курсы валют."""
+        self.recheck_interval = recheck_interval
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self._rates: Dict[str, CurrencyRate] = {}
+        self._rates_date: Optional[datetime] = None
+        self._next_check: Optional[datetime] = None
+
+    async def get_rates(self) -> Dict[str, CurrencyRate]:
+        """Возвращает курсы из кэша или обновляет их, если ожидается новая публикация."""
+        now = datetime.now(moscow_tz)
+        if self._rates and self._next_check and now < self._next_check:
+            logger.debug(f"Курсы ЦБ РФ из кэша (следующая проверка {self._next_check:%d.%m %H:%M})")
+            return self._rates
+
         try:
-            with self.session.get(self.base_url, timeout=10) as response:
-                response.raise_for_status()
-                logger.info("Данные ЦБ РФ успешно получены")
-                return response.json()
-        except requests.RequestException as e:
-            logger.error(f"Ошибка запроса к ЦБ РФ: {str(e)}")
-            return None
+            data = await self._fetch_conditional()
+        except (aiohttp.ClientError, TimeoutError) as e:
+            # ошибка уходит наверх: её должны увидеть повторы и предохранитель,
+            # а прежние значения подставят снимок источника и кэш last_good
+            logger.error(f"Ошибка запроса к ЦБ РФ: {e}")
+            raise
+
+        if data is None:
+            logger.debug("ЦБ РФ: курсы не изменились (304)")
+        elif rates := self.process_currency_data(data):
+            self._rates = rates
+            self._rates_date = self._parse_date(data.get("Date"))
+            logger.info(f"Курсы ЦБ РФ обновлены (дата курса: {data.get('Date')})")
+
+        self._next_check = self._schedule_next_check(data, now)
+        return self._rates
+
+    async def _fetch_conditional(self) -> Optional[Dict[str, Any]]:
+        """Условный GET: None — данные не изменились, иначе разобранный JSON."""
+        headers = {}
+        if self._rates:
+            if self._etag:
+                headers["If-None-Match"] = self._etag
+            if self._last_modified:
+                headers["If-Modified-Since"] = self._last_modified
+
+        session = http_clients.session("cbr", headers={"Accept": "application/json"})
+        async with session.get(self.base_url, headers=headers) as response:
+            if response.status == 304:
+                return None
+            response.raise_for_status()
+            self._etag = response.headers.get("ETag")
+            self._last_modified = response.headers.get("Last-Modified")
+            # сервер отдаёт application/javascript
+            return await response.json(content_type=None)
 
     @staticmethod
     def process_currency_data(data: Dict[str, Any]) -> Dict[str, CurrencyRate]:
@@ -61,18 +114,41 @@ class CBRService:
 
         return result
 
+    def _schedule_next_check(self, data: Optional[Dict[str, Any]], now: datetime) -> datetime:
+        # NextDate — ожидаемая дата следующей публикации; если её нет,
+        # раньше даты действия текущего курса новых данных не будет.
+        if data is not None:
+            due = self._parse_date(data.get("NextDate")) or self._rates_date
+            if due and due > now:
+                return due
+        return now + self.recheck_interval
+
+    @staticmethod
+    def _parse_date(value: Optional[str]) -> Optional[datetime]:
+        if not value:
+            return None
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            logger.warning(f"Не удалось разобрать дату ЦБ РФ: {value}")
+            return None
+        return parsed if parsed.tzinfo else moscow_tz.localize(parsed)
+
+
+cbr_service = AsyncCBRService()
+
 
-def get_currency_rates() -> Dict[str, float]:
-    """Получает и возвращает актуальные курсы валют."""
-    service = CBRService()
-    if raw_data := service.fetch_currency_data():
-        processed = service.process_currency_data(raw_data)
-        return {pair: rate.value for pair, rate in processed.items()}
-    return {}
+@resilient("cbr")
+async def get_currency_rates_async() -> Dict[str, float]:
+    """Асинхронно возвращает актуальные курсы валют (с дневным кэшем)."""
+    rates = await cbr_service.get_rates()
+    return {pair: rate.value for pair, rate in rates.items()}
 
 
 if __name__ == "__main__":
     from pprint import pprint
 
-    rates = get_currency_rates()
-    pprint(rates)
+    async def main():
+        pprint(await get_currency_rates_async())
+        await http_clients.close()
+    asyncio.run(main())
@@ -1,88 +1,92 @@
-import aiohttp
 import asyncio
 from typing import Dict, Optional, List
+
+import aiohttp
+from http_client import http_clients
+from resilience import resilient
+from spike_selector import SpikeSelector
 from service.logger import logger
 from service.settings import (
     LIVECOINWATCH_API,
     API_ENDPOINTS,
     CRYPTO_SETTINGS,
-    CRYPTO_ALWAYS_SHOW,
 )
 
 
-async def fetch_all_coins() -> List[dict]:
-    """Запрашивает все монеты с LiveCoinWatch"""
-    url = API_ENDPOINTS['livecoinwatch']['coins_list']
-    async with aiohttp.ClientSession(headers={
+async def fetch_page(session, offset: int, limit: int) -> Optional[List[dict]]:
+    """Одна страница выдачи LiveCoinWatch; None — страница не получена."""
+    payload = {
+        "currency": CRYPTO_SETTINGS['default_currency'],
+        "sort": "rank",
+        "order": "ascending",
+        "offset": offset,
+        "limit": limit
+    }
+    try:
+        async with session.post(API_ENDPOINTS['livecoinwatch']['coins_list'], json=payload) as resp:
+            if resp.status != 200:
+                logger.error(f"Ошибка запроса страницы offset={offset}: {resp.status}")
+                return None
+            return await resp.json()
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        logger.error(f"Ошибка запроса страницы offset={offset}: {e!r}")
+        return None
+
+
+async def fetch_coin_pages(
+    selector: SpikeSelector,
+    max_coins: Optional[int] = None,
+    page_size: Optional[int] = None,
+    concurrency: Optional[int] = None
+) -> int:
+    """
+    Запрашивает монеты страницами по page_size параллельно (не больше concurrency сразу)
+    и передаёт каждую страницу в selector по мере прихода. Возвращает число полученных страниц;
+    потеря отдельной страницы не срывает весь цикл.
+    Не заданные параметры читаются из CRYPTO_SETTINGS при вызове, а не при импорте.
+    """
+    max_coins = CRYPTO_SETTINGS['max_coins'] if max_coins is None else max_coins
+    page_size = CRYPTO_SETTINGS['page_size'] if page_size is None else page_size
+    concurrency = CRYPTO_SETTINGS['page_concurrency'] if concurrency is None else concurrency
+    session = http_clients.session("livecoinwatch", headers={
         "x-api-key": LIVECOINWATCH_API,
         "content-type": "application/json"
-    }) as session:
-        payload = {
-            "currency": CRYPTO_SETTINGS['default_currency'],
-            "sort": "rank",
-            "order": "ascending",
-            "offset": 0,
-            "limit": CRYPTO_SETTINGS['max_coins']
-        }
-        async with session.post(url, json=payload) as resp:
-            if resp.status != 200:
-                logger.error(f"Ошибка запроса: {resp.status}")
-                return []
-            data = await resp.json()
-            return data
-
-
+    })
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def load(offset: int):
+        async with semaphore:
+            return offset, await fetch_page(session, offset, min(page_size, max_coins - offset))
+
+    pages = [asyncio.create_task(load(offset)) for offset in range(0, max_coins, page_size)]
+    received = 0
+    try:
+        for next_page in asyncio.as_completed(pages):
+            offset, coins = await next_page
+            if not coins:
+                continue
+            selector.feed(coins, offset)
+            received += 1
+    finally:
+        # отмена вызывающим (дедлайн опроса) не должна оставлять страницы качаться в фоне
+        pending = [page for page in pages if not page.done()]
+        for page in pending:
+            page.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    if received < len(pages):
+        logger.warning(f"Получено страниц монет: {received} из {len(pages)}")
+    return received
+
+
+@resilient("crypto")
 async def get_prices() -> Dict[str, Dict[str, Optional[float]]]:
     logger.debug("Запрашиваем список криптовалют")
-    coins = await fetch_all_coins()
-    if not coins:
+    selector = SpikeSelector.from_settings()
+    if not await fetch_coin_pages(selector):
         return {}
 
-    result = {
-        "always": {},
-        "daily_spikes": {},
-        "hourly_spikes": {}
-    }
-
-    threshold_daily = CRYPTO_SETTINGS['threshold_daily']
-    threshold_hourly = CRYPTO_SETTINGS['threshold_hourly']
-
-    daily_candidates = []
-    hourly_candidates = []
-
-    for c in coins:
-        code = c.get("code")
-        rate = c.get("rate", 0)
-        delta = c.get("delta", {})
-        change_1h = delta.get("hour")
-        change_1d = delta.get("day")
-        change_1w = delta.get("week")
-
-        entry = {
-            "value": round(rate, 6),
-            "change_1h": change_1h,
-            "change_1d": change_1d,
-            "change_1w": change_1w,
-        }
-
-        if code in CRYPTO_ALWAYS_SHOW:
-            result["always"][code] = entry
-
-        if change_1d is not None and abs(change_1d) >= threshold_daily:
-            daily_candidates.append((abs(change_1d), code, entry))
-
-        if change_1h is not None and abs(change_1h) >= threshold_hourly:
-            hourly_candidates.append((abs(change_1h), code, entry))
-
-    # оставить только топ-5 по величине
-    daily_candidates.sort(reverse=True)
-    hourly_candidates.sort(reverse=True)
-
-    for _, code, entry in daily_candidates[:5]:
-        result["daily_spikes"][code] = entry
-
-    for _, code, entry in hourly_candidates[:5]:
-        result["hourly_spikes"][code] = entry
+    result = selector.result()
 
     logger.info(
         f"Готовы данные: always={len(result['always'])}, daily_spikes={len(result['daily_spikes'])}, hourly_spikes={len(result['hourly_spikes'])}"
@@ -97,4 +101,5 @@ if __name__ == "__main__":
             print(f"--- {section} ---")
             for code, entry in coins.items():
                 print(f"{code}: {entry}")
+        await http_clients.close()
     asyncio.run(main())
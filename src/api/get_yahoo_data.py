@@ -1,16 +1,34 @@
+"""
+Цены фьючерсов и валютных пар с Yahoo Finance.
+Пакетной загрузки одним запросом нет: Yahoo отдаёт историю одного тикера за запрос
+(yf.download внутри тоже зовёт Ticker.history по тикеру), поэтому цель «один запрос
+на цикл» отброшена. Каждый опрос — по запросу на актив, параллельно и в общем бюджете
+времени; число запросов растёт с числом активов.
+"""
 import asyncio
+import math
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Dict, Optional, List
 from dataclasses import dataclass
 import yfinance as yf
 
+from resilience import resilient
 from service.logger import logger
-from service.settings import YAHOO_FINANCIAL_ASSETS
+from service.settings import YAHOO_FINANCIAL_ASSETS, YAHOO_SETTINGS, HTTP_SETTINGS
 
 # Константы по умолчанию
-DEFAULT_DELAY = 0.5
 DEFAULT_PERIOD = "1d"
 DEFAULT_INTERVAL = "5m"
 
+# yfinance синхронный: пакеты загрузок идут через один выделенный поток,
+# чтобы не блокировать event loop и не плодить параллельные пакеты.
+# Отменить уже начатую загрузку нельзя, поэтому новая не ставится в очередь за ней
+# (см. AssetFetcher.get_all_prices)
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="yahoo")
+# Yahoo отдаёт историю одного тикера за запрос: запросы пакета идут параллельно,
+# не больше max_threads одновременно
+_ticker_executor = ThreadPoolExecutor(max_workers=YAHOO_SETTINGS["max_threads"], thread_name_prefix="yahoo-ticker")
+
 
 @dataclass(frozen=True)
 class Asset:
@@ -23,66 +41,98 @@ class AssetFetcher:
         self,
         assets: Optional[List[Asset]] = None,
         period: str = DEFAULT_PERIOD,
-        interval: str = DEFAULT_INTERVAL,
-        delay: float = DEFAULT_DELAY
+        interval: str = DEFAULT_INTERVAL
     ):
         self.assets = assets or self._load_assets_from_settings()
         self.period = period
         self.interval = interval
-        self.delay = delay
+        # ошибки последней загрузки: название актива -> причина
+        self.failures: Dict[str, str] = {}
+        # загрузка, которая ещё идёт в потоке (в том числе брошенная по таймауту вызывающим)
+        self._inflight: Optional[asyncio.Future] = None
 
     def _load_assets_from_settings(self) -> List[Asset]:
         return [Asset(a["ticker"], a["name"]) for a in YAHOO_FINANCIAL_ASSETS]
 
     async def get_all_prices(self) -> Dict[str, Optional[float]]:
-        logger.info("Запуск получения данных с Yahoo Finance")
-        tasks = [self._fetch_price(asset) for asset in self.assets]
-        results = await asyncio.gather(*tasks)
+        if self._inflight is not None and not self._inflight.done():
+            # прошлая загрузка пережила таймаут и ещё занимает поток — ждём её результат,
+            # а не встаём в очередь за ней
+            logger.warning("Yahoo Finance: предыдущая загрузка ещё идёт, ждём её результат")
+        else:
+            logger.info("Запуск получения данных с Yahoo Finance")
+            loop = asyncio.get_running_loop()
+            self._inflight = loop.run_in_executor(_executor, self._download_batch)
+        # shield: таймаут вызывающего отменяет только ожидание, а не общий future
+        prices, failures = await asyncio.shield(self._inflight)
+
+        self.failures = failures
+        for name, reason in failures.items():
+            logger.warning(f"Yahoo Finance: нет цены для {name} — {reason}")
+
+        return prices
+
+    def _download_batch(self) -> tuple[Dict[str, Optional[float]], Dict[str, str]]:
+        """
+        Запрашивает все тикеры параллельно в пределах общего бюджета
+        HTTP_SETTINGS["timeouts"]["yahoo"]["total"]: таймаут одного запроса —
+        бюджет, делённый на число «волн» пула.
+        """
+        budget = HTTP_SETTINGS["timeouts"]["yahoo"]["total"]
+        threads = max(1, min(len(self.assets), YAHOO_SETTINGS["max_threads"]))
+        timeout = budget / math.ceil(len(self.assets) / threads)
+        futures = {
+            asset: _ticker_executor.submit(self._download_one, asset.ticker, timeout)
+            for asset in self.assets
+        }
+        done, _ = wait(futures.values(), timeout=budget)
+
+        prices: Dict[str, Optional[float]] = {}
+        failures: Dict[str, str] = {}
+        for asset, future in futures.items():
+            price = None
+            if future not in done:
+                future.cancel()
+                failures[asset.name] = f"нет ответа за {budget} с ({asset.ticker})"
+            elif future.exception() is not None:
+                failures[asset.name] = f"{future.exception()} ({asset.ticker})"
+            else:
+                price = future.result()
+                if price is None:
+                    failures[asset.name] = f"нет данных ({asset.ticker})"
+            prices[asset.name] = price
+        return prices, failures
 
-        await asyncio.sleep(self.delay)
+    def _download_one(self, ticker: str, timeout: float) -> Optional[float]:
+        frame = yf.Ticker(ticker).history(period=self.period, interval=self.interval, timeout=timeout)
+        if frame is None or frame.empty:
+            return None
+        return self._last_close(frame["Close"])
 
-        return {
-            asset.name: price
-            for asset, price in results
-        }
+    @staticmethod
+    def _last_close(closes) -> Optional[float]:
+        series = closes.dropna()
+        if series.empty:
+            return None
+        return round(float(series.iloc[-1]), 2)
 
-    async def _fetch_price(self, asset: Asset) -> tuple[Asset, Optional[float]]:
-        try:
-            ticker_data = yf.Ticker(asset.ticker)
-            history = ticker_data.history(period=self.period, interval=self.interval)
 
-            if not history.empty and not history['Close'].empty:
-                price = round(float(history['Close'].iloc[-1]), 2)
-                return asset, price
+_fetcher = AssetFetcher()
 
-            logger.warning(f"Нет данных для {asset.name}")
-            return asset, None
 
-        except Exception as e:
-            logger.error(f"Ошибка получения {asset.name} ({asset.ticker}): {e}")
-            return asset, None
+def _no_prices(prices: Dict[str, Optional[float]]) -> bool:
+    return not prices or all(price is None for price in prices.values())
 
 
 # Публичный интерфейс модуля
+@resilient("finance", is_failure=_no_prices)
 async def get_prices() -> Dict[str, Optional[float]]:
-    result = {}
-    for asset in YAHOO_FINANCIAL_ASSETS:
-        ticker = asset['ticker']
-        name = asset['name']
-        try:
-            data = yf.Ticker(ticker).history(period="1d")
-            if data.empty:
-                logger.warning(f"{ticker}: нет данных от Yahoo")
-                result[name] = None
-                continue
-
-            last_price = round(data['Close'].iloc[-1], 2)
-            result[name] = last_price
-
-        except Exception as e:
-            logger.error(f"{ticker}: ошибка запроса — {e}")
-            result[name] = None
-    return result
+    return await _fetcher.get_all_prices()
+
+
+def get_failures() -> Dict[str, str]:
+    """Активы без цены в последней загрузке: название -> причина."""
+    return dict(_fetcher.failures)
 
 
 # Тестовый запуск
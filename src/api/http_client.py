@@ -0,0 +1,65 @@
+from typing import Dict, Optional
+
+import aiohttp
+
+from service.logger import logger
+from service.settings import HTTP_SETTINGS
+
+
+class HttpClientRegistry:
+    """
+    Общий на весь процесс пул HTTP-соединений.
+    Все провайдеры получают сессии поверх одного TCPConnector, поэтому
+    keep-alive соединения, DNS-кэш и лимиты на хост переиспользуются между циклами.
+    """
+
+    def __init__(self, settings: Dict = HTTP_SETTINGS):
+        self.settings = settings
+        self._connector: Optional[aiohttp.TCPConnector] = None
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+
+    async def start(self) -> None:
+        self._get_connector()
+        logger.info("HTTP-пул соединений запущен")
+
+    def session(self, name: str, headers: Optional[Dict[str, str]] = None) -> aiohttp.ClientSession:
+        """
+        Возвращает долгоживущую сессию провайдера.
+        :param name: ключ провайдера в HTTP_SETTINGS["timeouts"].
+        :param headers: заголовки по умолчанию (учитываются при создании сессии).
+        """
+        session = self._sessions.get(name)
+        if session is None or session.closed:
+            timeouts = self.settings["timeouts"]
+            timeout = timeouts.get(name, timeouts["default"])
+            session = aiohttp.ClientSession(
+                connector=self._get_connector(),
+                connector_owner=False,
+                timeout=aiohttp.ClientTimeout(**timeout),
+                headers={"User-Agent": self.settings["user_agent"], **(headers or {})},
+            )
+            self._sessions[name] = session
+        return session
+
+    def _get_connector(self) -> aiohttp.TCPConnector:
+        if self._connector is None or self._connector.closed:
+            self._connector = aiohttp.TCPConnector(
+                limit=self.settings["limit"],
+                limit_per_host=self.settings["limit_per_host"],
+                ttl_dns_cache=self.settings["dns_cache_seconds"],
+                keepalive_timeout=self.settings["keepalive_seconds"],
+            )
+        return self._connector
+
+    async def close(self) -> None:
+        for session in self._sessions.values():
+            if not session.closed:
+                await session.close()
+        self._sessions.clear()
+        if self._connector is not None and not self._connector.closed:
+            await self._connector.close()
+        self._connector = None
+        logger.info("HTTP-пул соединений закрыт")
+
+
+http_clients = HttpClientRegistry()
@@ -0,0 +1,127 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from price_window import now_ms
+from service.logger import logger
+from service.settings import LAST_GOOD_SETTINGS
+
+
+class LastGoodCache:
+    """
+    Последние удачно полученные значения по каждому источнику и тикеру с меткой времени.
+    Если источник не ответил или вернул None по тикеру, значение берётся отсюда,
+    пока не истёк TTL источника, и помечается как устаревшее. Изменённые записи
+    копятся до сохранения в БД (таблица last_good), при старте кэш загружается из неё.
+    Метка в памяти обновляется при каждом удачном получении; неизменное значение
+    пересохраняется, только когда метка ушла вперёд на persist_refresh_fraction TTL.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: Dict[str, float] = LAST_GOOD_SETTINGS["ttl_seconds"],
+        default_ttl_seconds: float = LAST_GOOD_SETTINGS["default_ttl_seconds"],
+        persist_refresh_fraction: float = LAST_GOOD_SETTINGS["persist_refresh_fraction"]
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.default_ttl_seconds = default_ttl_seconds
+        self.persist_refresh_fraction = persist_refresh_fraction
+        self._entries: Dict[str, Dict[str, Tuple[float, int]]] = {}
+        self._dirty: Dict[Tuple[str, str], Tuple[float, int]] = {}
+        # метка, с которой запись последний раз ушла в БД (или пришла из неё)
+        self._persisted_ms: Dict[Tuple[str, str], int] = {}
+
+    def _ttl_ms(self, source: str) -> int:
+        return int(self.ttl_seconds.get(source, self.default_ttl_seconds) * 1000)
+
+    def load(self, rows: Iterable[Tuple[str, str, float, int]]) -> int:
+        """Загружает записи (источник, тикер, значение, fetched_ms) из БД."""
+        count = 0
+        now = now_ms()
+        for source, ticker, value, fetched_ms in rows:
+            if now - fetched_ms <= self._ttl_ms(source):
+                self._entries.setdefault(source, {})[ticker] = (value, fetched_ms)
+                self._persisted_ms[(source, ticker)] = fetched_ms
+                count += 1
+        logger.info(f"Кэш последних значений загружен: {count} записей")
+        return count
+
+    def merge(
+        self,
+        source: str,
+        fresh: Dict[str, Any],
+        now: Optional[int] = None,
+        fetched_ms: Optional[int] = None,
+        retained: bool = False
+    ) -> Tuple[Dict[str, Any], Dict[str, int]]:
+        """
+        Дополняет свежие данные источника закэшированными.
+        :param fetched_ms: когда снимок получен от источника (по умолчанию — сейчас); с этой меткой
+            значения попадают в кэш, а снимок старше TTL отбрасывается целиком.
+        :param retained: снимок остался от прошлого удачного опроса после сбоя — его значения
+            помечаются как устаревшие.
+        :return: (данные в прежнем порядке тикеров, {тикер: возраст значения в мс} для подставленных).
+        """
+        now = now_ms() if now is None else now
+        entries = self._entries.setdefault(source, {})
+        ttl_ms = self._ttl_ms(source)
+        merged: Dict[str, Any] = {}
+        stale: Dict[str, int] = {}
+
+        def from_cache(ticker: str) -> None:
+            cached = entries.get(ticker)
+            if cached is None:
+                return
+            value, fetched_ms = cached
+            if now - fetched_ms > ttl_ms:
+                del entries[ticker]
+                return
+            merged[ticker] = value
+            stale[ticker] = now - fetched_ms
+
+        stamp = now if fetched_ms is None else fetched_ms
+        for ticker, raw in fresh.items():
+            value = raw.get("value") if isinstance(raw, dict) else raw
+            if value is None or now - stamp > ttl_ms:
+                from_cache(ticker)
+                continue
+            merged[ticker] = raw
+            if retained:
+                stale[ticker] = now - stamp
+            self._remember(source, entries, ticker, float(value), stamp, ttl_ms)
+
+        for ticker in list(entries):
+            if ticker not in merged:
+                from_cache(ticker)
+
+        if stale:
+            logger.warning(f"{source}: подставлены последние удачные значения для {', '.join(stale)}")
+        return merged, stale
+
+    def _remember(
+        self,
+        source: str,
+        entries: Dict[str, Tuple[float, int]],
+        ticker: str,
+        value: float,
+        stamp: int,
+        ttl_ms: int
+    ) -> None:
+        cached = entries.get(ticker)
+        if cached is not None and cached[1] > stamp:
+            return
+        entries[ticker] = (value, stamp)
+        key = (source, ticker)
+        persisted = self._persisted_ms.get(key)
+        # в БД — при новом значении или когда метка заметно ушла вперёд, а не каждый опрос
+        if (cached is None or cached[0] != value or persisted is None
+                or stamp - persisted >= ttl_ms * self.persist_refresh_fraction):
+            self._dirty[key] = (value, stamp)
+            self._persisted_ms[key] = stamp
+
+    def pending_rows(self) -> List[Tuple[str, str, float, int]]:
+        """Изменённые с прошлого сохранения записи (источник, тикер, значение, fetched_ms)."""
+        rows = [(source, ticker, value, fetched_ms) for (source, ticker), (value, fetched_ms) in self._dirty.items()]
+        self._dirty.clear()
+        return rows
+
+
+last_good = LastGoodCache()
@@ -0,0 +1,20 @@
+from typing import Any, Optional
+
+from service.logger import logger
+
+
+def parse_legacy_change(value: Any) -> Optional[float]:
+    """
+    Число из старых сохранённых срезов, где изменения записаны строками вида "−1,23%"
+    (юникодный минус, десятичная запятая). Числа возвращаются как есть, пустое — None.
+    Общий разбор для миграции в daily_values и для отрисовки сообщения.
+    """
+    if isinstance(value, str):
+        value = value.replace("%", "").replace(",", ".").replace("−", "-").strip() or None
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Не удалось распарсить изменение '{value}': {e}")
+        return None
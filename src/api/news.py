@@ -1,5 +1,4 @@
 import asyncio
-import aiohttp
 from datetime import datetime
 from deep_translator import YandexTranslator
 from service.settings import (
@@ -8,6 +7,7 @@ from service.settings import (
     YANDEX_FOLDER_ID,
 )
 from telegr.sender import send_telegram_message
+from http_client import http_clients
 from service.logger import logger
 
 CRYPTOPANIC_API_URL = "https://cryptopanic.com/api/v1/posts/"
@@ -46,16 +46,16 @@ async def get_news_digest(when: str) -> str:
         "public": "true",
     }
 
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(CRYPTOPANIC_API_URL, params=params) as resp:
-                if resp.status != 200:
-                    logger.error(f"CryptoPanic API вернул статус {resp.status}")
-                    return ""
-                data = await resp.json()
-        except Exception as e:
-            logger.error(f"Ошибка при запросе к CryptoPanic API: {e}")
-            return ""
+    session = http_clients.session("cryptopanic")
+    try:
+        async with session.get(CRYPTOPANIC_API_URL, params=params) as resp:
+            if resp.status != 200:
+                logger.error(f"CryptoPanic API вернул статус {resp.status}")
+                return ""
+            data = await resp.json()
+    except Exception as e:
+        logger.error(f"Ошибка при запросе к CryptoPanic API: {e}")
+        return ""
 
     posts = data.get("results", [])[:3]
     if not posts:
@@ -91,6 +91,7 @@ async def get_news_digest(when: str) -> str:
 
 async def main():
     news_text = await get_news_digest("утру")  # или "вечер"
+    await http_clients.close()
     if not news_text:
         print("⚠️ Нет новостей")
         return
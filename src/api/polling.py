@@ -0,0 +1,147 @@
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, time as dtime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pytz
+
+from fetcher import FetchOrchestrator, FetchResult
+from price_window import now_ms
+from service.logger import logger
+from service.settings import MARKET_CALENDARS, POLLING_SETTINGS
+
+
+def _parse_time(value: str) -> dtime:
+    # "24:00" — конец суток
+    return dtime.max if value == "24:00" else dtime.fromisoformat(value)
+
+
+class TradingCalendar:
+    """Недельное расписание сессий в часовом поясе площадки."""
+
+    def __init__(self, timezone: str, sessions: Iterable[Tuple[int, str, str]]):
+        self.tz = pytz.timezone(timezone)
+        self.sessions: Dict[int, List[Tuple[dtime, dtime]]] = {}
+        for weekday, start, end in sessions:
+            self.sessions.setdefault(weekday, []).append((_parse_time(start), _parse_time(end)))
+
+    @classmethod
+    def from_settings(cls, name: str) -> "TradingCalendar":
+        calendar = MARKET_CALENDARS[name]
+        return cls(calendar["timezone"], calendar["sessions"])
+
+    def is_open(self, moment: Optional[datetime] = None) -> bool:
+        local = (moment or datetime.now(pytz.utc)).astimezone(self.tz)
+        now = local.time()
+        return any(start <= now < end for start, end in self.sessions.get(local.weekday(), ()))
+
+
+@dataclass
+class Snapshot:
+    data: Any
+    ok: bool
+    # fetched_ms — время последних удачных данных; failed_ms и error — последнего сбоя после них
+    fetched_ms: Optional[int]
+    failed_ms: Optional[int] = None
+    error: Optional[str] = None
+
+
+class SnapshotStore:
+    """
+    Последний удачный снимок каждого источника; задача редактирования читает только отсюда.
+    Неудачный опрос данные не затирает — отмечается лишь сбой и его время.
+    """
+
+    def __init__(self):
+        self._snapshots: Dict[str, Snapshot] = {}
+
+    def update(self, source: str, result: FetchResult) -> None:
+        now = now_ms()
+        if result.ok:
+            self._snapshots[source] = Snapshot(result.data, True, now)
+            return
+        previous = self._snapshots.get(source)
+        if previous is None:
+            self._snapshots[source] = Snapshot({}, False, None, now, result.error)
+            return
+        previous.ok, previous.failed_ms, previous.error = False, now, result.error
+
+    def fetched_ms(self, source: str) -> Optional[int]:
+        """Время последнего удачного опроса источника (None — удачных ещё не было)."""
+        snapshot = self._snapshots.get(source)
+        return snapshot.fetched_ms if snapshot else None
+
+    def retained_ms(self, source: str) -> Optional[int]:
+        """Время удачного опроса, если последний опрос источника провалился и данные в снимке — прежние."""
+        snapshot = self._snapshots.get(source)
+        if snapshot is None or snapshot.ok:
+            return None
+        return snapshot.fetched_ms
+
+    def get(self, source: str) -> Any:
+        snapshot = self._snapshots.get(source)
+        return snapshot.data if snapshot else {}
+
+
+class SourcePoller:
+    """
+    Опрашивает источники независимо, каждый со своим интервалом из POLLING_SETTINGS.
+    Источник с календарём вне рабочих часов пропускается; пока у него нет ни одного
+    удачного опроса, он опрашивается и в нерабочие часы.
+    """
+
+    def __init__(
+        self,
+        orchestrator: FetchOrchestrator,
+        store: SnapshotStore,
+        settings: Dict[str, Dict[str, Any]] = POLLING_SETTINGS
+    ):
+        self.orchestrator = orchestrator
+        self.store = store
+        self.settings = settings
+        self.calendars = {
+            name: TradingCalendar.from_settings(source["calendar"])
+            for name, source in settings.items()
+            if source.get("calendar")
+        }
+        # счётчики обращений к источникам, пропусков вне календаря и неполных ответов
+        self.stats = {name: {"polls": 0, "skipped": 0, "partial": 0} for name in settings}
+        # тикеры без данных в последнем опросе: источник -> {тикер: причина}
+        self.failures: Dict[str, Dict[str, str]] = {name: {} for name in settings}
+
+    def interval(self, name: str) -> float:
+        return self.settings[name]["interval_seconds"]
+
+    async def poll(self, name: str, force: bool = False) -> Optional[FetchResult]:
+        calendar = self.calendars.get(name)
+        # вне календаря пропускаем, только если уже есть удачный снимок: иначе источник,
+        # упавший на старте в выходные, не переспрашивался бы до открытия рынка
+        if (not force and calendar is not None and self.store.fetched_ms(name) is not None
+                and not calendar.is_open()):
+            self.stats[name]["skipped"] += 1
+            logger.debug(f"Источник {name} вне рабочих часов — опрос пропущен")
+            return None
+
+        result = await self.orchestrator.fetch(name)
+        self.stats[name]["polls"] += 1
+        self.failures[name] = result.failures
+        if result.failures:
+            self.stats[name]["partial"] += 1
+        self.store.update(name, result)
+        for key, value in (result.data or {}).items():
+            if value == 0:
+                logger.warning(f"Нулевое значение в {name} для {key}")
+        return result
+
+    def summary(self) -> str:
+        """Счётчики опросов и состояние предохранителей по источникам — для журнала."""
+        breakers = self.orchestrator.breaker_states()
+        return "; ".join(
+            f"{name}: опросов {stats['polls']}, пропусков {stats['skipped']}, неполных {stats['partial']}"
+            + (f", предохранитель {breakers[name]}" if name in breakers else "")
+            + (f", без данных: {', '.join(self.failures[name])}" if self.failures[name] else "")
+            for name, stats in self.stats.items()
+        )
+
+    async def poll_all(self, force: bool = False) -> None:
+        await asyncio.gather(*(self.poll(name, force=force) for name in self.settings))
@@ -0,0 +1,146 @@
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from service.logger import logger
+from service.settings import PRICE_WINDOW_SETTINGS, SCHEDULER_SETTINGS
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _default_capacity() -> int:
+    span_minutes = PRICE_WINDOW_SETTINGS["span_days"] * 24 * 60
+    return int(span_minutes / SCHEDULER_SETTINGS["edit_interval_minutes"] * PRICE_WINDOW_SETTINGS["headroom"]) + 1
+
+
+class PriceRing:
+    """
+    Кольцевой буфер (метка epoch-мс, значение) одного тикера.
+    Метки хранятся по возрастанию, поиск «последнее значение не позже T» — бинарный.
+    """
+
+    __slots__ = ("capacity", "ts", "values", "start", "truncated")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.ts = array("q")
+        self.values = array("d")
+        self.start = 0
+        # буфер вытеснял старые точки: раньше первой метки данные могут быть в БД
+        self.truncated = False
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def _index(self, i: int) -> int:
+        return (self.start + i) % len(self.ts)
+
+    def first_ts(self) -> Optional[int]:
+        return self.ts[self.start] if self.ts else None
+
+    def last_ts(self) -> Optional[int]:
+        return self.ts[self._index(len(self.ts) - 1)] if self.ts else None
+
+    def append(self, ts: int, value: float) -> bool:
+        last = self.last_ts()
+        if last is not None and ts <= last:
+            return False
+        if len(self.ts) < self.capacity:
+            # пока буфер не заполнен, start всегда 0 — просто дописываем
+            self.ts.append(ts)
+            self.values.append(value)
+        else:
+            self.ts[self.start] = ts
+            self.values[self.start] = value
+            self.start = (self.start + 1) % self.capacity
+            self.truncated = True
+        return True
+
+    def at_or_before(self, target: int) -> Optional[float]:
+        lo, hi = 0, len(self.ts)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.ts[self._index(mid)] <= target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return self.values[self._index(lo - 1)] if lo else None
+
+
+class PriceWindow:
+    """
+    Скользящее окно цен в памяти процесса для расчёта изменений за 1ч/1д/1н.
+    Пополняется при каждом сохранении среза, при старте прогревается из history_data.
+    После прогрева промах по окну окончателен, пока кольцо тикера ничего не вытесняло:
+    всё, что есть в БД за span_days, есть и в нём (см. covers).
+    """
+
+    def __init__(self, capacity: Optional[int] = None):
+        self.capacity = capacity or _default_capacity()
+        self._rings: Dict[Tuple[str, str], PriceRing] = {}
+        self._lock = threading.Lock()
+        self.authoritative = False
+
+    def add(self, ticker: str, data_type: str, ts: int, value: Optional[float]) -> None:
+        if value is None:
+            return
+        with self._lock:
+            ring = self._rings.get((data_type, ticker))
+            if ring is None:
+                ring = self._rings[(data_type, ticker)] = PriceRing(self.capacity)
+            ring.append(ts, float(value))
+
+    def add_snapshot(self, rows: Iterable[Tuple[str, str, Optional[float]]], ts: int) -> None:
+        """Записывает срез цикла: кортежи (тикер, тип данных, значение)."""
+        for ticker, data_type, value in rows:
+            self.add(ticker, data_type, ts, value)
+
+    def warm_up(self, rows: Iterable[Tuple[str, str, int, float]]) -> int:
+        """Заполняет окно историей из БД: кортежи (тикер, тип, ts, значение) по возрастанию ts."""
+        count = 0
+        for ticker, data_type, ts, value in rows:
+            self.add(ticker, data_type, ts, value)
+            count += 1
+        self.authoritative = True
+        logger.info(f"Окно цен прогрето: {count} точек, {len(self._rings)} тикеров")
+        return count
+
+    def last_ts(self, ticker: str, data_type: str) -> Optional[int]:
+        with self._lock:
+            ring = self._rings.get((data_type, ticker))
+            return ring.last_ts() if ring else None
+
+    def covers(self, tickers: List[str], data_type: str, target_ms: int) -> List[bool]:
+        """
+        Отвечает ли окно за значение на target_ms: прогрето и кольцо тикера либо начинается
+        не позже target_ms, либо ничего не вытесняло. Иначе промах нужно проверить в БД.
+        """
+        if not self.authoritative:
+            return [False] * len(tickers)
+        with self._lock:
+            rings = self._rings
+            return [
+                ring is None or not ring.truncated or ring.first_ts() <= target_ms
+                for ring in (rings.get((data_type, ticker)) for ticker in tickers)
+            ]
+
+    def value_at(self, ticker: str, data_type: str, target_ms: int) -> Optional[float]:
+        """Последнее значение не позже target_ms или None, если окно его не покрывает."""
+        with self._lock:
+            ring = self._rings.get((data_type, ticker))
+            return ring.at_or_before(target_ms) if ring else None
+
+    def values_at(self, tickers: List[str], data_type: str, target_ms: int) -> List[Optional[float]]:
+        """value_at для целого раздела под одной блокировкой."""
+        with self._lock:
+            rings = self._rings
+            return [
+                ring.at_or_before(target_ms) if (ring := rings.get((data_type, ticker))) else None
+                for ticker in tickers
+            ]
+
+
+price_window = PriceWindow()
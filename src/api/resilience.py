@@ -0,0 +1,169 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+from service.logger import logger
+from service.settings import FETCH_SETTINGS, RESILIENCE_SETTINGS
+
+
+class CircuitOpenError(Exception):
+    """Источник отключён предохранителем — запрос не выполнялся."""
+
+
+class EmptyResultError(Exception):
+    """Источник ответил, но без данных — для предохранителя это сбой."""
+
+
+class CircuitBreaker:
+    """
+    Предохранитель источника: после failure_threshold сбоев подряд размыкается,
+    через reset_timeout секунд пропускает один пробный запрос (half-open).
+    Удачная проба замыкает его, неудачная — снова размыкает.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def can_request(self) -> bool:
+        """Пропустил бы предохранитель запрос сейчас (пробный слот при этом не занимается)."""
+        state = self.state
+        return state == self.CLOSED or (state == self.HALF_OPEN and not self._probing)
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            logger.info(f"Предохранитель {self.name}: пробный запрос")
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logger.info(f"Предохранитель {self.name} замкнут: источник снова отвечает")
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            if self._opened_at is None or self._probing:
+                logger.warning(
+                    f"Предохранитель {self.name} разомкнут после {self.failures} сбоев "
+                    f"на {self.reset_timeout:.0f} с"
+                )
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+    def release_probe(self) -> None:
+        # проба прервана без исхода (отмена) — следующий вызов сможет пробовать снова
+        self._probing = False
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    attempts: int
+    base_delay: float
+    max_delay: float
+
+    def delay(self, attempt: int) -> float:
+        # «полный джиттер»: случайная пауза до экспоненциальной границы
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class ResilientProvider:
+    """
+    Обёртка провайдера данных: общий дедлайн на вызов, повторы с джиттером,
+    пока они укладываются в дедлайн, и предохранитель. Пустой результат считается сбоем.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fetch: Callable[[], Awaitable[Any]],
+        deadline: float,
+        policy: RetryPolicy,
+        breaker: CircuitBreaker,
+        is_failure: Callable[[Any], bool] = lambda result: not result
+    ):
+        self.name = name
+        self.fetch = fetch
+        self.deadline = deadline
+        self.policy = policy
+        self.breaker = breaker
+        self.is_failure = is_failure
+        self.__name__ = getattr(fetch, "__name__", name)
+        self.__doc__ = fetch.__doc__
+
+    async def __call__(self) -> Any:
+        probe = self.breaker.state == CircuitBreaker.HALF_OPEN
+        if not self.breaker.allow_request():
+            raise CircuitOpenError(f"{self.name}: предохранитель разомкнут")
+
+        try:
+            return await self._call_with_retries()
+        finally:
+            # отмена (например, внешним wait_for) не должна оставить предохранитель в вечной пробе
+            if probe:
+                self.breaker.release_probe()
+
+    async def _call_with_retries(self) -> Any:
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            try:
+                result = await asyncio.wait_for(self.fetch(), max(0.0, deadline - time.monotonic()))
+                if self.is_failure(result):
+                    raise EmptyResultError(f"{self.name}: пустой ответ")
+                self.breaker.record_success()
+                return result
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = e
+
+            attempt += 1
+            pause = self.policy.delay(attempt - 1)
+            if attempt >= self.policy.attempts or time.monotonic() + pause >= deadline:
+                self.breaker.record_failure()
+                raise error
+            logger.warning(f"{self.name}: попытка {attempt} не удалась ({error!r}), повтор через {pause:.2f} с")
+            await asyncio.sleep(pause)
+
+
+def resilient(name: str, is_failure: Callable[[Any], bool] = lambda result: not result):
+    """Декоратор провайдера: параметры берутся из RESILIENCE_SETTINGS и FETCH_SETTINGS."""
+    settings = {**RESILIENCE_SETTINGS["default"], **RESILIENCE_SETTINGS["providers"].get(name, {})}
+
+    def decorate(fetch: Callable[[], Awaitable[Any]]) -> ResilientProvider:
+        return ResilientProvider(
+            name,
+            fetch,
+            deadline=FETCH_SETTINGS["source_timeouts"].get(name, FETCH_SETTINGS["default_timeout_seconds"]),
+            policy=RetryPolicy(settings["attempts"], settings["base_delay_seconds"], settings["max_delay_seconds"]),
+            breaker=CircuitBreaker(name, settings["failure_threshold"], settings["reset_timeout_seconds"]),
+            is_failure=is_failure,
+        )
+
+    return decorate
@@ -0,0 +1,125 @@
+import heapq
+from itertools import count
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from service.settings import CRYPTO_SETTINGS, CRYPTO_ALWAYS_SHOW
+
+
+class SpikeSelector:
+    """
+    Отбор монет для блоков «Рывок за день/час» за один проход по выдаче API.
+    Для каждого блока держится куча на top_n элементов: память O(top_n),
+    время O(N log top_n) вместо полной сортировки всех кандидатов.
+    """
+
+    def __init__(
+        self,
+        top_n: int = CRYPTO_SETTINGS["top_n"],
+        threshold_daily: float = CRYPTO_SETTINGS["threshold_daily"],
+        threshold_hourly: float = CRYPTO_SETTINGS["threshold_hourly"],
+        always_show: Iterable[str] = CRYPTO_ALWAYS_SHOW,
+        exclude: Iterable[str] = (),
+        exclude_always: bool = CRYPTO_SETTINGS["exclude_always_from_spikes"]
+    ):
+        self.top_n = top_n
+        self.threshold_daily = threshold_daily
+        self.threshold_hourly = threshold_hourly
+        self.always_show = frozenset(always_show)
+        self.excluded = frozenset(exclude) | (self.always_show if exclude_always else frozenset())
+        self.always: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        self._daily: List[Tuple[float, str, int, Dict[str, Any]]] = []
+        self._hourly: List[Tuple[float, str, int, Dict[str, Any]]] = []
+        # код -> величина для монет в куче: одна монета занимает не больше одного места
+        self._daily_codes: Dict[str, float] = {}
+        self._hourly_codes: Dict[str, float] = {}
+        self._seq = count()
+        self.seen = 0
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any] = CRYPTO_SETTINGS) -> "SpikeSelector":
+        exclude = settings["stablecoins"] if settings["exclude_stablecoins"] else ()
+        return cls(
+            top_n=settings["top_n"],
+            threshold_daily=settings["threshold_daily"],
+            threshold_hourly=settings["threshold_hourly"],
+            exclude=exclude,
+            exclude_always=settings["exclude_always_from_spikes"]
+        )
+
+    @staticmethod
+    def _entry(coin: Dict[str, Any]) -> Dict[str, Optional[float]]:
+        delta = coin.get("delta") or {}
+        return {
+            "value": round(coin.get("rate") or 0, 6),
+            "change_1h": delta.get("hour"),
+            "change_1d": delta.get("day"),
+            "change_1w": delta.get("week"),
+        }
+
+    def _push(
+        self,
+        heap: list,
+        codes: Dict[str, float],
+        magnitude: float,
+        code: str,
+        coin: Dict[str, Any],
+        entry: Optional[Dict]
+    ) -> Optional[Dict]:
+        held = codes.get(code)
+        if held is not None:
+            # повтор монеты в выдаче: остаётся бóльшая величина, место в куче одно
+            if magnitude <= held:
+                return entry
+            heap[:] = [item for item in heap if item[1] != code]
+            heapq.heapify(heap)
+            del codes[code]
+        # при равной величине выигрывает больший код — как при прежней сортировке по убыванию
+        if len(heap) >= self.top_n and (magnitude, code) <= heap[0][:2]:
+            return entry
+        entry = entry or self._entry(coin)
+        item = (magnitude, code, next(self._seq), entry)
+        if len(heap) < self.top_n:
+            heapq.heappush(heap, item)
+        else:
+            del codes[heapq.heapreplace(heap, item)[1]]
+        codes[code] = magnitude
+        return entry
+
+    def add(self, coin: Dict[str, Any], position: Optional[int] = None) -> None:
+        """position — место монеты в общей выдаче; нужно, если страницы приходят не по порядку."""
+        position = self.seen if position is None else position
+        self.seen += 1
+        code = coin.get("code")
+        entry = None
+        if code in self.always_show:
+            entry = self._entry(coin)
+            self.always[code] = (position, entry)
+        if code in self.excluded or self.top_n <= 0:
+            return
+
+        delta = coin.get("delta") or {}
+        change_1d, change_1h = delta.get("day"), delta.get("hour")
+        # словарь записи создаётся только для монет, прошедших в кучу
+        if change_1d is not None and abs(change_1d) >= self.threshold_daily:
+            entry = self._push(self._daily, self._daily_codes, abs(change_1d), code, coin, entry)
+        if change_1h is not None and abs(change_1h) >= self.threshold_hourly:
+            self._push(self._hourly, self._hourly_codes, abs(change_1h), code, coin, entry)
+
+    def feed(self, coins: Iterable[Dict[str, Any]], offset: Optional[int] = None) -> "SpikeSelector":
+        """Добавляет страницу выдачи; offset — её смещение в общей выдаче."""
+        start = self.seen if offset is None else offset
+        for i, coin in enumerate(coins):
+            self.add(coin, start + i)
+        return self
+
+    @staticmethod
+    def _ranked(heap: list) -> Dict[str, Dict[str, Any]]:
+        return {code: entry for _, code, _, entry in sorted(heap, reverse=True)}
+
+    def result(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        return {
+            # порядок обязательных монет — как в выдаче API (по рангу), независимо от порядка страниц
+            "always": {code: entry for code, (_, entry) in sorted(self.always.items(), key=lambda item: item[1][0])},
+            "daily_spikes": self._ranked(self._daily),
+            "hourly_spikes": self._ranked(self._hourly),
+        }
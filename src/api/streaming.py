@@ -0,0 +1,229 @@
+import asyncio
+import heapq
+import json
+from dataclasses import dataclass, asdict
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional, Protocol
+
+from price_window import price_window, now_ms
+from service.logger import logger
+from service.settings import (
+    CRYPTO_SETTINGS,
+    CRYPTO_ALWAYS_SHOW,
+    SCHEDULER_SETTINGS,
+    STREAMING_SETTINGS,
+)
+
+HOUR_MS = 60 * 60 * 1000
+DAY_MS = 24 * HOUR_MS
+
+
+@dataclass
+class Tick:
+    """Одно обновление цены монеты. Изменения в % — как в LiveCoinWatch, если провайдер их знает."""
+    code: str
+    price: float
+    ts: int
+    change_1h: Optional[float] = None
+    change_1d: Optional[float] = None
+    change_1w: Optional[float] = None
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, line: str) -> "Tick":
+        return cls(**json.loads(line))
+
+
+class TickProvider(Protocol):
+    """Провайдер потоковых тиков: асинхронный итератор, который отдаёт тики по мере прихода."""
+
+    def ticks(self) -> AsyncIterator[Tick]:
+        ...
+
+
+class TcpTickProvider:
+    """Тики построчным JSON по TCP — клиент для tools/feed_server.py и совместимых фидов."""
+
+    def __init__(self, host: str = STREAMING_SETTINGS["host"], port: int = STREAMING_SETTINGS["port"]):
+        self.host = host
+        self.port = port
+
+    async def ticks(self) -> AsyncIterator[Tick]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            while line := await reader.readline():
+                try:
+                    yield Tick.from_json(line.decode())
+                except (ValueError, TypeError) as e:
+                    logger.warning(f"Некорректный тик пропущен: {e}")
+        finally:
+            writer.close()
+
+
+class SpikeTracker:
+    """
+    Инкрементальный отбор «рывков» по потоку тиков. Хранит последнее изменение каждой монеты;
+    топ пересчитывается только если тик может его изменить: монета уже в топе
+    или её изменение больше минимального в топе. Остальные тики обходятся в O(1).
+    Монеты, по которым тики перестали приходить, убираются через expire.
+    """
+
+    def __init__(
+        self,
+        top_n: int = CRYPTO_SETTINGS["top_n"],
+        threshold_daily: float = CRYPTO_SETTINGS["threshold_daily"],
+        threshold_hourly: float = CRYPTO_SETTINGS["threshold_hourly"],
+        exclude: Iterable[str] = ()
+    ):
+        self.top_n = top_n
+        self.thresholds = {"daily_spikes": threshold_daily, "hourly_spikes": threshold_hourly}
+        self.excluded = frozenset(exclude)
+        self.entries: Dict[str, Dict[str, Optional[float]]] = {}
+        # метка последнего тика каждой монеты
+        self._seen: Dict[str, int] = {}
+        self._magnitudes: Dict[str, Dict[str, float]] = {section: {} for section in self.thresholds}
+        self._top: Dict[str, Dict[str, float]] = {section: {} for section in self.thresholds}
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any] = CRYPTO_SETTINGS) -> "SpikeTracker":
+        exclude = set(settings["stablecoins"]) if settings["exclude_stablecoins"] else set()
+        if settings["exclude_always_from_spikes"]:
+            exclude |= set(CRYPTO_ALWAYS_SHOW)
+        return cls(
+            top_n=settings["top_n"],
+            threshold_daily=settings["threshold_daily"],
+            threshold_hourly=settings["threshold_hourly"],
+            exclude=exclude
+        )
+
+    def update(self, code: str, entry: Dict[str, Optional[float]], ts: Optional[int] = None) -> bool:
+        """Учитывает новое состояние монеты; True — состав топа изменился."""
+        self.entries[code] = entry
+        self._seen[code] = ts if ts is not None else now_ms()
+        if code in self.excluded:
+            return False
+        changed = False
+        for section, label in (("daily_spikes", "change_1d"), ("hourly_spikes", "change_1h")):
+            change = entry.get(label)
+            magnitude = abs(change) if change is not None and abs(change) >= self.thresholds[section] else None
+            changed |= self._update_section(section, code, magnitude)
+        return changed
+
+    def expire(self, cutoff_ms: int) -> bool:
+        """Забывает монеты без тиков с cutoff_ms; True — состав топа изменился."""
+        changed = False
+        for code in [code for code, ts in self._seen.items() if ts < cutoff_ms]:
+            del self._seen[code]
+            del self.entries[code]
+            if code in self.excluded:
+                continue
+            for section in self.thresholds:
+                changed |= self._update_section(section, code, None)
+        return changed
+
+    def _update_section(self, section: str, code: str, magnitude: Optional[float]) -> bool:
+        magnitudes, top = self._magnitudes[section], self._top[section]
+        if magnitude is None:
+            magnitudes.pop(code, None)
+        else:
+            magnitudes[code] = magnitude
+
+        if code in top:
+            if magnitude is not None and (len(magnitudes) <= self.top_n or magnitude >= min(top.values())):
+                top[code] = magnitude
+                return False
+        elif magnitude is None or (len(top) >= self.top_n and (magnitude, code) <= min((m, c) for c, m in top.items())):
+            return False
+
+        before = set(top)
+        self._top[section] = dict(heapq.nlargest(self.top_n, magnitudes.items(), key=lambda item: (item[1], item[0])))
+        return set(self._top[section]) != before
+
+    def result(self) -> Dict[str, Dict[str, Dict[str, Optional[float]]]]:
+        return {
+            section: {
+                code: self.entries[code]
+                for code, _ in sorted(top.items(), key=lambda item: (item[1], item[0]), reverse=True)
+            }
+            for section, top in self._top.items()
+        }
+
+
+class StreamIngestor:
+    """
+    Читает тики провайдера и раскладывает их: последняя цена каждой монеты, окно цен
+    и трекер рывков. В окно тик попадает, только если за интервал редактирования в нём
+    не появилось ни одной точки (ни из потока, ни из цикла правки), — ёмкость окна
+    рассчитана ровно на такой шаг. При обрыве потока переподключается.
+    """
+
+    def __init__(
+        self,
+        provider: TickProvider,
+        tracker: Optional[SpikeTracker] = None,
+        on_spikes_changed: Optional[Callable[[], Any]] = None,
+        reconnect_seconds: float = STREAMING_SETTINGS["reconnect_seconds"]
+    ):
+        self.provider = provider
+        self.tracker = tracker or SpikeTracker.from_settings()
+        self.on_spikes_changed = on_spikes_changed
+        self.reconnect_seconds = reconnect_seconds
+        self.latest: Dict[str, Tick] = {}
+        self.received = 0
+        self.last_tick_ms: Optional[int] = None
+        self._window_step_ms = SCHEDULER_SETTINGS["edit_interval_minutes"] * 60 * 1000
+
+    def ingest(self, tick: Tick) -> bool:
+        self.received += 1
+        self.latest[tick.code] = tick
+        self.last_tick_ms = max(self.last_tick_ms or tick.ts, tick.ts)
+        last_ts = price_window.last_ts(tick.code, "crypto")
+        if last_ts is None or tick.ts - last_ts >= self._window_step_ms:
+            price_window.add(tick.code, "crypto", tick.ts, tick.price)
+
+        entry = {
+            "value": round(tick.price, 6),
+            "change_1h": tick.change_1h if tick.change_1h is not None else self._window_change(tick, HOUR_MS),
+            "change_1d": tick.change_1d if tick.change_1d is not None else self._window_change(tick, DAY_MS),
+            "change_1w": tick.change_1w,
+        }
+        return self.tracker.update(tick.code, entry, tick.ts)
+
+    @staticmethod
+    def _window_change(tick: Tick, delta_ms: int) -> Optional[float]:
+        past = price_window.value_at(tick.code, "crypto", tick.ts - delta_ms)
+        return round((tick.price - past) / past * 100, 2) if past else None
+
+    async def run(self) -> None:
+        while True:
+            try:
+                async for tick in self.provider.ticks():
+                    if self.ingest(tick) and self.on_spikes_changed is not None:
+                        result = self.on_spikes_changed()
+                        if asyncio.iscoroutine(result):
+                            await result
+                logger.warning("Поток тиков закрыт провайдером")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка потока тиков: {e!r}")
+            await asyncio.sleep(self.reconnect_seconds)
+
+    def is_live(self, max_age_ms: int) -> bool:
+        """Последний тик не старше max_age_ms: поток жив и его данные свежее снимков."""
+        return self.last_tick_ms is not None and now_ms() - self.last_tick_ms <= max_age_ms
+
+    def spikes(self, max_age_ms: int) -> Dict[str, Dict[str, Dict[str, Optional[float]]]]:
+        """Рывки трекера без монет, тики которых старше max_age_ms."""
+        self.tracker.expire(now_ms() - max_age_ms)
+        return self.tracker.result()
+
+    def prices(self, max_age_ms: Optional[int] = None) -> Dict[str, float]:
+        """Последние цены из потока (не старше max_age_ms, если задано)."""
+        now = now_ms()
+        return {
+            code: tick.price
+            for code, tick in self.latest.items()
+            if max_age_ms is None or now - tick.ts <= max_age_ms
+        }
@@ -25,6 +25,11 @@ YANDEX_FOLDER_ID = os.getenv('YANDEX_FOLDER_ID')
 
 TELEGRAM_CHANNEL_ID = "@currency_patrol" if not DEBUG else "@test_mix38"
 
+# 📡 Каналы публикации: один сбор данных и одна отрисовка за цикл рассылаются во все включённые
+TELEGRAM_CHANNELS = [
+    {"chat_id": TELEGRAM_CHANNEL_ID, "name": "main", "enabled": True},
+]
+
 moscow_tz = pytz.timezone('Europe/Moscow')
 DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
 
@@ -37,6 +42,13 @@ YAHOO_FINANCIAL_ASSETS = [
 
 ALLOWED_FINANCIAL_TICKERS = {asset["ticker"] for asset in YAHOO_FINANCIAL_ASSETS}
 
+# Пакетной загрузки нет: Yahoo отдаёт историю одного тикера за запрос, так что опрос —
+# это по запросу на актив (от числа активов не избавиться). Запросы идут параллельно,
+# и весь опрос укладывается в HTTP_SETTINGS["timeouts"]["yahoo"]["total"]
+YAHOO_SETTINGS = {
+    "max_threads": 4   # одновременных запросов к Yahoo в одном пакете
+}
+
 # 💎 Криптовалюты
 CRYPTO_DISPLAY = {
     'always_show': ['BTC', 'ETH', 'TONCOIN', 'BNB', 'SOL'],
@@ -54,10 +66,15 @@ CRYPTO_API = {
 CRYPTO_SETTINGS = {
     "default_currency": "USD",
     "max_coins": 200,
+    "page_size": 200,         # монет в одном запросе к LiveCoinWatch (страницы по offset)
+    "page_concurrency": 4,    # одновременно запрашиваемых страниц
     "top_n": 5,
     "always_show": ["BTC", "ETH", "USDT", "BNB", "TONCOIN", "SOL"],
     "threshold_daily": 1.0,   # % — порог изменения за день для попадания в "🔥 Рывок за день"
-    "threshold_hourly": 1.0   # % — порог изменения за час для попадания в "🚀 Рывок за час"
+    "threshold_hourly": 1.0,  # % — порог изменения за час для попадания в "🚀 Рывок за час"
+    "exclude_stablecoins": True,          # стейблкоины не попадают в рывки
+    "exclude_always_from_spikes": False,  # монеты из CRYPTO_ALWAYS_SHOW не дублируются в рывках
+    "stablecoins": ["USDT", "USDC", "DAI", "FDUSD", "TUSD", "USDE", "PYUSD", "USDD", "BUSD"]
 }
 
 # Обязательные монеты для публикации (всегда)
@@ -83,10 +100,163 @@ SCHEDULER_SETTINGS = {
     }
 }
 
+# 🖼 Отрисовка сообщения
+RENDER_SETTINGS = {
+    "line_cache_size": 1024   # готовых строк тикеров в LRU-кэше
+}
+
+# ✏️ Редактирование сообщения: пропуск правок без изменений
+EDIT_SETTINGS = {
+    "force_refresh_minutes": 30   # даже без изменений обновляем «Upd» не реже этого интервала
+}
+
+# 🔄 Опрос источников: у каждого свой интервал и, при необходимости, календарь работы.
+# Вне календаря источник не опрашивается — в сообщении остаётся последний снимок.
+# HTTP-запросов в сутки (в среднем за неделю): крипта 960 (раз в 90 с, одна страница на
+# max_coins), Yahoo ~990 (по запросу на каждый из 3 активов раз в 3 мин, 115 ч CME Globex
+# в неделю), ЦБ не больше ~20 — около 1970. До разделения опроса и правок каждые 3 мин
+# уходило 5 запросов (ЦБ, 3 актива Yahoo, крипта): 480 × 5 = 2400.
+POLLING_SETTINGS = {
+    "crypto": {"interval_seconds": 90},
+    "finance": {"interval_seconds": 180, "calendar": "cme_globex"},
+    "cbr": {"interval_seconds": 900, "calendar": "cbr_publication"}
+}
+
+# 📶 Потоковые тики криптовалют (push вместо снимков); выключено, пока нет провайдера
+STREAMING_SETTINGS = {
+    "enabled": False,
+    "host": "127.0.0.1",          # локальный фид: tools/feed_server.py
+    "port": 8765,
+    "reconnect_seconds": 5,
+    "spike_edit_debounce_seconds": 30   # новая монета в рывках — правка не чаще этого интервала
+}
+
+# 🗓 Календари: сессии (день недели 0=пн, начало, конец) в часовом поясе календаря
+MARKET_CALENDARS = {
+    # фьючерсы CME Globex и форекс: вс 18:00 — пт 17:00 по Нью-Йорку с перерывом 17:00–18:00
+    "cme_globex": {
+        "timezone": "America/New_York",
+        "sessions": [(6, "18:00", "24:00")]
+                    + [(day, "00:00", "17:00") for day in range(5)]
+                    + [(day, "18:00", "24:00") for day in range(4)]
+    },
+    # ЦБ публикует курсы на следующий день по будням после обеда по Москве
+    "cbr_publication": {
+        "timezone": "Europe/Moscow",
+        "sessions": [(day, "11:00", "18:00") for day in range(5)]
+    }
+}
+
+# ⏱ Параллельный сбор данных (дедлайны в секундах)
+FETCH_SETTINGS = {
+    "default_timeout_seconds": 20,
+    "source_timeouts": {
+        "cbr": 10,
+        "finance": 30,
+        "crypto": 20
+    }
+}
+
+# 🛡 Устойчивость провайдеров: повторы с джиттером в пределах дедлайна (FETCH_SETTINGS)
+# и автомат-предохранитель, отключающий источник после failure_threshold сбоев подряд
+RESILIENCE_SETTINGS = {
+    "default": {
+        "attempts": 3,
+        "base_delay_seconds": 0.5,
+        "max_delay_seconds": 4.0,
+        "failure_threshold": 3,
+        "reset_timeout_seconds": 120   # через сколько открытый предохранитель пропустит пробный запрос
+    },
+    "providers": {
+        "cbr": {"attempts": 2},
+        "finance": {"attempts": 2, "reset_timeout_seconds": 300},
+        "crypto": {}
+    }
+}
+
+# 🌐 Общий HTTP-пул (таймауты в секундах)
+HTTP_SETTINGS = {
+    "user_agent": "CurrencyBot/1.0",
+    "limit": 50,
+    "limit_per_host": 8,
+    "dns_cache_seconds": 300,
+    "keepalive_seconds": 60,
+    "timeouts": {
+        "default": {"total": 15, "connect": 5},
+        "cbr": {"total": 10, "connect": 5},
+        "yahoo": {"total": 10, "connect": 5},
+        "livecoinwatch": {"total": 15, "connect": 5},
+        "cryptopanic": {"total": 15, "connect": 5}
+    }
+}
+
+# 📨 Доставка в Telegram: лимиты, повторы и пул соединений Bot API
+TELEGRAM_DELIVERY_SETTINGS = {
+    "global_per_second": 25,      # Telegram допускает ~30 сообщений в секунду на бота
+    "global_burst": 30,
+    "chat_per_minute": 20,        # ~20 сообщений в минуту в один канал/группу
+    "chat_burst": 3,
+    "max_retries": 5,
+    "backoff_base_seconds": 1.0,
+    "backoff_max_seconds": 30.0,
+    "pool": {
+        "connection_pool_size": 16,
+        "max_keepalive_connections": 8,
+        "keepalive_expiry": 60,
+        "connect_timeout": 5,
+        "read_timeout": 15,
+        "write_timeout": 15,
+        "pool_timeout": 5
+    }
+}
+
 DATABASE_SETTINGS = {
     "db_path": "data.db",
     "cleanup_days_threshold": 8,
-    "min_valid_length": 50
+    "min_valid_length": 50,
+    "migration_batch_size": 5000,  # строк за одну транзакцию при миграциях схемы
+    # Настройки долгоживущего соединения SQLite (db_connection.ConnectionManager)
+    "sqlite": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size_kib": 16 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout_ms": 5000,
+        "cached_statements": 256
+    },
+    # Асинхронный фасад: потоки-читатели и максимальный размер пачки записей
+    "async": {
+        "readers": 2,
+        "max_batch": 64
+    },
+    # Прореживание history_data: сырые точки -> часовые бары -> дневные бары
+    "retention": {
+        "raw_days": 8,
+        "hourly_days": 90,
+        "daily_days": 1825,
+        "batch_size": 2000
+    }
+}
+
+# 🧮 Окно цен в памяти для изменений за 1ч/1д/1н
+PRICE_WINDOW_SETTINGS = {
+    "span_days": 7,
+    "headroom": 1.25,  # запас ёмкости буфера сверх span_days при штатном интервале редактирования
+    "warmup_extra_hours": 1
+}
+
+# 🗄 Последние удачные значения по источникам: при сбое источника подставляются с пометкой устаревших
+LAST_GOOD_SETTINGS = {
+    "ttl_seconds": {
+        "cbr": 3 * 24 * 3600,       # ЦБ не публикует курсы в выходные
+        "finance": 3 * 24 * 3600,   # биржи закрыты в выходные
+        "crypto": 30 * 60
+    },
+    "default_ttl_seconds": 3600,
+    # неизменное значение пересохраняется в БД, когда его метка ушла вперёд на эту долю TTL
+    "persist_refresh_fraction": 0.1,
+    "stale_marker": "⏳"
 }
 
 # 📈 Пороговые значения
@@ -112,6 +282,10 @@ CHANGE_EMOJIS = {
 # 🌐 Центробанк РФ
 CBR_API_URL = "https://www.cbr-xml-daily.ru/daily_json.js"
 
+CBR_SETTINGS = {
+    "recheck_minutes": 15  # как часто проверять новую публикацию после наступления даты курса
+}
+
 # 💲 Фиатные валюты
 FIAT_CURRENCIES = [
     "USD", "EUR", "CNY", "BYN", "CHF", "AED", "THB", "KZT"
@@ -0,0 +1,155 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, Hashable, Set, Tuple
+
+import telegram
+from service.logger import logger
+from service.settings import TELEGRAM_DELIVERY_SETTINGS
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity в запасе."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Блокирует выдачу токенов на seconds секунд (после RetryAfter)."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+@dataclass
+class _PendingEdit:
+    text: str
+    request: Callable[[str], Awaitable[Any]]
+    future: asyncio.Future
+
+
+class TelegramDelivery:
+    """
+    Слой доставки запросов к Bot API: общий лимит на бота и лимит на каждый чат,
+    повторы с ожиданием при RetryAfter и TimedOut, схлопывание правок одного сообщения.
+    Если правка ещё ждёт своей очереди, новая правка того же message_id лишь подменяет
+    текст — в Telegram уходит только последний вариант.
+    """
+
+    def __init__(self, settings: Dict[str, Any] = TELEGRAM_DELIVERY_SETTINGS):
+        self.settings = settings
+        self._global = TokenBucket(settings["global_per_second"], settings["global_burst"])
+        self._chats: Dict[Hashable, TokenBucket] = {}
+        self._pending_edits: Dict[Tuple[Hashable, int], _PendingEdit] = {}
+        self._edit_tasks: Set[asyncio.Task] = set()
+        self.stats = {"sent": 0, "retried": 0, "coalesced": 0}
+
+    def _chat_bucket(self, chat_id: Hashable) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(
+                self.settings["chat_per_minute"] / 60, self.settings["chat_burst"]
+            )
+        return bucket
+
+    async def _acquire(self, chat_id: Hashable) -> None:
+        await self._chat_bucket(chat_id).acquire()
+        await self._global.acquire()
+
+    async def submit(self, chat_id: Hashable, request: Callable[[], Awaitable[Any]]) -> Any:
+        """Выполняет запрос к чату в пределах лимитов, повторяя его при RetryAfter/TimedOut."""
+        await self._acquire(chat_id)
+        return await self._call(chat_id, request)
+
+    async def edit(
+        self,
+        chat_id: Hashable,
+        message_id: int,
+        text: str,
+        request: Callable[[str], Awaitable[Any]]
+    ) -> Any:
+        """Правка сообщения; правки одного message_id, ждущие очереди, схлопываются до последней."""
+        key = (chat_id, message_id)
+        pending = self._pending_edits.get(key)
+        if pending is not None:
+            pending.text, pending.request = text, request
+            self.stats["coalesced"] += 1
+        else:
+            pending = self._pending_edits[key] = _PendingEdit(text, request, asyncio.get_running_loop().create_future())
+            # правку выполняет отдельная задача: отмена одного из ждущих не бросает остальных
+            task = asyncio.create_task(self._run_edit(key, pending))
+            self._edit_tasks.add(task)
+            task.add_done_callback(self._edit_tasks.discard)
+        return await asyncio.shield(pending.future)
+
+    async def _run_edit(self, key: Tuple[Hashable, int], pending: _PendingEdit) -> None:
+        chat_id = key[0]
+        try:
+            try:
+                await self._acquire(chat_id)
+            finally:
+                # дальше текст зафиксирован: следующие правки встанут в новую очередь
+                self._pending_edits.pop(key, None)
+            pending.future.set_result(await self._call(chat_id, lambda: pending.request(pending.text)))
+        except asyncio.CancelledError:
+            pending.future.cancel()
+            raise
+        except Exception as e:
+            pending.future.set_exception(e)
+
+    async def _call(self, chat_id: Hashable, request: Callable[[], Awaitable[Any]]) -> Any:
+        attempt = 0
+        while True:
+            try:
+                result = await request()
+                self.stats["sent"] += 1
+                return result
+            except telegram.error.RetryAfter as error:
+                if attempt >= self.settings["max_retries"]:
+                    raise
+                delay = self._retry_after_seconds(error)
+                # лимит превышен для всего чата — притормаживаем и остальные запросы к нему
+                self._chat_bucket(chat_id).pause(delay)
+                logger.warning(f"Telegram просит подождать {delay:.0f} с (чат {chat_id})")
+            except telegram.error.TimedOut:
+                if attempt >= self.settings["max_retries"]:
+                    raise
+                delay = min(
+                    self.settings["backoff_max_seconds"],
+                    self.settings["backoff_base_seconds"] * 2 ** attempt
+                ) * random.uniform(0.5, 1.0)
+                logger.warning(f"Таймаут запроса к Telegram, повтор через {delay:.1f} с (чат {chat_id})")
+                await asyncio.sleep(delay)
+
+            attempt += 1
+            self.stats["retried"] += 1
+            await self._acquire(chat_id)
+
+    @staticmethod
+    def _retry_after_seconds(error: telegram.error.RetryAfter) -> float:
+        delay = error.retry_after
+        if isinstance(delay, timedelta):
+            delay = delay.total_seconds()
+        return float(delay) + 1
+
+
+delivery = TelegramDelivery()
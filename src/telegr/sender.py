@@ -1,10 +1,33 @@
+import httpx
 import telegram
 from telegram.constants import ParseMode
+from telegram.request import HTTPXRequest
 from service.logger import logger
-from service.settings import TELEGRAM_TOKEN
+from service.settings import TELEGRAM_TOKEN, TELEGRAM_DELIVERY_SETTINGS
+from telegr.delivery import delivery
+
+
+def _build_request() -> HTTPXRequest:
+    """Пул keep-alive соединений к Bot API вместо настроек HTTPXRequest по умолчанию."""
+    pool = TELEGRAM_DELIVERY_SETTINGS["pool"]
+    return HTTPXRequest(
+        connection_pool_size=pool["connection_pool_size"],
+        connect_timeout=pool["connect_timeout"],
+        read_timeout=pool["read_timeout"],
+        write_timeout=pool["write_timeout"],
+        pool_timeout=pool["pool_timeout"],
+        httpx_kwargs={
+            "limits": httpx.Limits(
+                max_connections=pool["connection_pool_size"],
+                max_keepalive_connections=pool["max_keepalive_connections"],
+                keepalive_expiry=pool["keepalive_expiry"],
+            )
+        },
+    )
+
 
 # Инициализация бота
-bot = telegram.Bot(token=TELEGRAM_TOKEN)
+bot = telegram.Bot(token=TELEGRAM_TOKEN, request=_build_request())
 
 
 async def send_telegram_message(message, chat_id):
@@ -13,12 +36,12 @@ async def send_telegram_message(message, chat_id):
     :return: message_id отправленного сообщения.
     """
     try:
-        result = await bot.send_message(
+        result = await delivery.submit(chat_id, lambda: bot.send_message(
             chat_id=chat_id,
             text=message,
             parse_mode=ParseMode.HTML,
             disable_web_page_preview=True  # 🔇 Отключаем превью ссылок
-        )
+        ))
         return result.message_id
     except telegram.error.TelegramError as error:
         logger.error(f"Ошибка при отправке сообщения: {error}")
@@ -28,16 +51,24 @@ async def send_telegram_message(message, chat_id):
 async def edit_telegram_message(message, chat_id, message_id):
     """
     Редактирует текстовое сообщение в Telegram чате.
+    Правки одного сообщения, ожидающие лимита, схлопываются до последнего текста.
     """
     try:
-        result = await bot.edit_message_text(
+        result = await delivery.edit(chat_id, message_id, message, lambda text: bot.edit_message_text(
             chat_id=chat_id,
             message_id=message_id,
-            text=message,
+            text=text,
             parse_mode=ParseMode.HTML,
             disable_web_page_preview=True  # 🔇 Отключаем превью ссылок
-        )
+        ))
         return result
+    except telegram.error.BadRequest as error:
+        # текст совпадает с опубликованным — правка не нужна, это не ошибка
+        if "message is not modified" in str(error).lower():
+            logger.debug("Сообщение не изменилось, правка не требуется")
+            return True
+        logger.error(f"Ошибка при редактировании сообщения: {error}")
+        return None
     except telegram.error.TelegramError as error:
         logger.error(f"Ошибка при редактировании сообщения: {error}")
         return None
@@ -49,13 +80,15 @@ async def send_image(chat_id, image_path, caption=None):
     :return: message_id отправленного сообщения.
     """
     try:
-        with open(image_path, 'rb') as photo:
-            result = await bot.send_photo(
-                chat_id=chat_id,
-                photo=photo,
-                caption=caption,
-                parse_mode=ParseMode.HTML
-            )
+        # читаем файл целиком, чтобы повтор запроса не отправил уже прочитанный поток
+        with open(image_path, 'rb') as file:
+            photo = file.read()
+        result = await delivery.submit(chat_id, lambda: bot.send_photo(
+            chat_id=chat_id,
+            photo=photo,
+            caption=caption,
+            parse_mode=ParseMode.HTML
+        ))
         return result.message_id
     except telegram.error.TelegramError as error:
         logger.error(f"Ошибка при отправке изображения: {error}")
@@ -67,7 +100,7 @@ async def delete_message(chat_id, message_id):
     Удаляет сообщение из Telegram чата.
     """
     try:
-        await bot.delete_message(chat_id=chat_id, message_id=message_id)
+        await delivery.submit(chat_id, lambda: bot.delete_message(chat_id=chat_id, message_id=message_id))
         logger.info(f"Сообщение с ID {message_id} успешно удалено.")
     except telegram.error.TelegramError as error:
         logger.error(f"Ошибка при удалении сообщения: {error}")
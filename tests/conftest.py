@@ -0,0 +1,11 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(ROOT, "src", "api")
+
+# модули проекта рассчитывают на запуск из src/api (BASE_DIR, пути логов);
+# эталонная построчная обработка для тестов эквивалентности — в benchmarks/, имитатор фида — в tools/
+sys.path[:0] = [os.path.join(ROOT, "src"), API_DIR, os.path.join(ROOT, "benchmarks"), os.path.join(ROOT, "tools")]
+os.chdir(API_DIR)
+os.makedirs(os.path.join(ROOT, "src", "service", "logs"), exist_ok=True)
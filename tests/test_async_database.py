@@ -0,0 +1,47 @@
+import asyncio
+import threading
+
+import pytest
+
+from async_database import AsyncDatabase
+from database import Database
+from db_connection import connections
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    yield str(tmp_path / "async.db")
+    connections.close_all()
+
+
+def test_cancelled_write_does_not_kill_writer(db_path):
+    async def scenario():
+        adb = AsyncDatabase(Database(db_path))
+        gate = threading.Event()
+        started = threading.Event()
+
+        def block():
+            started.set()
+            gate.wait(timeout=5)
+            return "blocked"
+
+        adb._writer_db.block = block
+        adb._writer_db.ping = lambda: "pong"
+
+        in_flight = asyncio.create_task(adb.write("block", batched=False))
+        await asyncio.to_thread(started.wait, 5)
+        queued = asyncio.create_task(adb.write("ping"))
+        await asyncio.sleep(0)
+        in_flight.cancel()
+        queued.cancel()
+        await asyncio.gather(in_flight, queued, return_exceptions=True)
+        gate.set()
+
+        result = await asyncio.wait_for(adb.write("ping"), timeout=5)
+        alive = adb._writer.is_alive()
+        await adb.close()
+        return result, alive
+
+    result, alive = asyncio.run(scenario())
+    assert result == "pong"
+    assert alive
@@ -0,0 +1,86 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import get_cb_data
+from get_cb_data import AsyncCBRService
+from service.settings import moscow_tz
+
+
+class _Response:
+    def __init__(self, status, payload=None, headers=None):
+        self.status = status
+        self.payload = payload
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        assert self.status < 400
+
+    async def json(self, content_type=None):
+        return self.payload
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class StubSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None):
+        self.requests.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    holder = {}
+    monkeypatch.setattr(get_cb_data.http_clients, "session", lambda name, headers=None: holder["session"])
+    return holder
+
+
+def _payload(next_date=None):
+    payload = {
+        "Date": (datetime.now(moscow_tz) - timedelta(hours=1)).isoformat(),
+        "Valute": {
+            code: {"Name": code, "Value": value}
+            for code, value in (("USD", 90.123), ("EUR", 99.5), ("CNY", 12.4))
+        },
+    }
+    if next_date is not None:
+        payload["NextDate"] = next_date.isoformat()
+    return payload
+
+
+def test_not_modified_reuses_cached_rates(session):
+    session["session"] = stub = StubSession(
+        _Response(200, _payload(), {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2025 11:30:00 GMT"}),
+        _Response(304),
+    )
+    service = AsyncCBRService(recheck_interval=timedelta(0))
+
+    first = asyncio.run(service.get_rates())
+    second = asyncio.run(service.get_rates())
+
+    assert {pair: rate.value for pair, rate in second.items()} == {"USD-RUB": 90.12, "EUR-RUB": 99.5, "CNY-RUB": 12.4}
+    assert second is first
+    assert stub.requests == [
+        {},
+        {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2025 11:30:00 GMT"},
+    ]
+
+
+def test_no_request_before_next_date(session):
+    next_date = datetime.now(moscow_tz) + timedelta(days=1)
+    session["session"] = stub = StubSession(_Response(200, _payload(next_date), {"ETag": '"v1"'}))
+    service = AsyncCBRService(recheck_interval=timedelta(0))
+
+    first = asyncio.run(service.get_rates())
+    assert asyncio.run(service.get_rates()) is first
+    assert len(stub.requests) == 1
+    assert service._next_check == next_date
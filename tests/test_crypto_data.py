@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+import get_crypto_data
+from spike_selector import SpikeSelector
+
+
+def test_cancelled_fetch_cancels_pending_pages(monkeypatch):
+    started, cancelled = [], []
+
+    async def slow_page(session, offset, limit):
+        started.append(offset)
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(offset)
+            raise
+
+    monkeypatch.setattr(get_crypto_data, "fetch_page", slow_page)
+    monkeypatch.setattr(get_crypto_data.http_clients, "session", lambda name, headers=None: None)
+
+    async def scenario():
+        selector = SpikeSelector(always_show=())
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(
+                get_crypto_data.fetch_coin_pages(selector, max_coins=400, page_size=100, concurrency=2),
+                timeout=0.1
+            )
+        # ни одна страница не должна остаться висеть в фоне
+        await asyncio.sleep(0)
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    leftover = asyncio.run(scenario())
+    assert leftover == []
+    assert sorted(cancelled) == sorted(started) == [0, 100]
@@ -0,0 +1,126 @@
+import sqlite3
+from datetime import timedelta
+
+import pytest
+
+from database import Database
+from db_connection import connections
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE history_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, ticker TEXT, timestamp TEXT, value REAL, type TEXT
+        )
+    """)
+    conn.executemany("INSERT INTO history_data (ticker, timestamp, value, type) VALUES (?, ?, ?, ?)", [
+        ("BTC", "2025-01-01T10:00:00", 1.0, "crypto"),
+        ("BTC", "garbage", 2.0, "crypto"),
+        ("ETH", None, 3.0, "crypto"),
+        ("ETH", "2025-01-01T11:00:00+00:00", 4.0, "crypto"),
+    ])
+    conn.commit()
+    conn.close()
+    yield path
+    connections.close_all()
+
+
+def _rows(db: Database, table: str):
+    return [tuple(row) for row in db.conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2, 3")]
+
+
+def test_malformed_timestamps_are_skipped(legacy_db):
+    db = Database(legacy_db)
+    assert _rows(db, "history_data") == [
+        ("BTC", "crypto", 1735714800000, 1.0),
+        ("ETH", "crypto", 1735729200000, 4.0),
+    ]
+
+
+def test_resumes_after_crash_between_drop_and_rename(legacy_db):
+    conn = sqlite3.connect(legacy_db)
+    conn.execute(Database._HISTORY_DATA_SCHEMA.format(table="history_data_v1"))
+    conn.execute("INSERT INTO history_data_v1 VALUES ('BTC', 'crypto', 1, 5.0)")
+    conn.commit()
+    conn.execute("DROP TABLE history_data")
+    conn.commit()
+    conn.close()
+
+    db = Database(legacy_db)
+    tables = {row["name"] for row in db.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "history_data_v1" not in tables
+    assert _rows(db, "history_data") == [("BTC", "crypto", 1, 5.0)]
+
+
+def test_daily_blobs_parse_legacy_change_strings(legacy_db):
+    conn = sqlite3.connect(legacy_db)
+    conn.execute("CREATE TABLE daily_data (id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT, data TEXT)")
+    conn.execute("INSERT INTO daily_data (date, data) VALUES (?, ?)", (
+        "2025-01-01",
+        '{"cbr_rates": {"USD-RUB": {"value": 99.5, "change_1h": "−1,23%", "change_1d": "0.5%", "change_1w": "n/a"}}}',
+    ))
+    conn.commit()
+    conn.close()
+
+    db = Database(legacy_db)
+    assert _rows(db, "daily_values") == [("2025-01-01", "cbr_rates", "USD-RUB", 99.5, -1.23, 0.5, None)]
+
+
+# полночь по Москве + 30 минут: цели 1/7/30 дней назад не попадают на границы баров
+NOW_MS = Database._iso_to_ms("2025-03-01T00:30:00")
+HOUR_MS = 60 * 60 * 1000
+DAY_MS = 24 * HOUR_MS
+RETENTION = {"raw_days": 2, "hourly_days": 10, "daily_days": 1825, "batch_size": 7}
+LOOKUPS = {"1d": timedelta(days=1), "7d": timedelta(days=7), "30d": timedelta(days=30)}
+
+
+@pytest.fixture
+def history_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(Database, "_now_ms", staticmethod(lambda: NOW_MS))
+    db = Database(str(tmp_path / "history.db"))
+    midnight = NOW_MS - 30 * 60 * 1000
+    # за последние 10 суток — точка в начале каждого часа, раньше — в начале каждых суток
+    stamps = [midnight - hours * HOUR_MS for hours in range(10 * 24)]
+    stamps += [midnight - days * DAY_MS for days in range(10, 40)]
+    for ticker in ("BTC", "ETH"):
+        db.conn.executemany(
+            "INSERT INTO history_data (ticker, type, ts, value) VALUES (?, 'crypto', ?, ?)",
+            [(ticker, ts, 100.0 + i) for i, ts in enumerate(stamps)]
+        )
+    db.conn.commit()
+    yield db
+    connections.close_all()
+
+
+def _lookups(db: Database):
+    return db.get_changes_batch({"BTC": 500.0, "ETH": 250.0}, "crypto", LOOKUPS)
+
+
+def test_retention_keeps_lookups(history_db):
+    before = _lookups(history_db)
+    assert all(change is not None for changes in before.values() for change in changes.values())
+
+    stats = history_db.apply_retention(RETENTION)
+    assert stats["raw_to_hourly"] > 0 and stats["hourly_to_daily"] > 0
+    assert _lookups(history_db) == before
+
+
+def test_retention_is_idempotent(history_db):
+    history_db.apply_retention(RETENTION)
+    raw, bars = _rows(history_db, "history_data"), _rows(history_db, "history_bars")
+
+    assert history_db.apply_retention(RETENTION) == {"raw_to_hourly": 0, "hourly_to_daily": 0, "expired_daily": 0}
+    assert _rows(history_db, "history_data") == raw
+    assert _rows(history_db, "history_bars") == bars
+
+
+def test_retention_keeps_raw_rows_inside_window(history_db):
+    cutoff = NOW_MS - RETENTION["raw_days"] * DAY_MS
+    recent = [row for row in _rows(history_db, "history_data") if row[2] >= cutoff]
+
+    history_db.apply_retention(RETENTION)
+    assert [row for row in _rows(history_db, "history_data") if row[2] >= cutoff] == recent
+    assert all(row[2] >= cutoff - HOUR_MS for row in _rows(history_db, "history_data"))
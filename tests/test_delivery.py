@@ -0,0 +1,57 @@
+import asyncio
+
+from telegr.delivery import TelegramDelivery
+
+SETTINGS = {
+    "global_per_second": 100,
+    "global_burst": 100,
+    "chat_per_minute": 600,   # токен в чат каждые 0.1 с
+    "chat_burst": 1,
+    "max_retries": 1,
+    "backoff_base_seconds": 0.01,
+    "backoff_max_seconds": 0.01,
+}
+
+
+def _recording_request(sent):
+    async def request(text):
+        sent.append(text)
+        return text
+    return request
+
+
+def test_coalesced_edit_survives_cancelled_first_caller():
+    async def scenario():
+        delivery = TelegramDelivery(SETTINGS)
+        sent = []
+        # забираем единственный токен чата — правки встанут в очередь
+        await delivery.submit("chat", lambda: asyncio.sleep(0))
+        first = asyncio.create_task(delivery.edit("chat", 1, "v1", _recording_request(sent)))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(delivery.edit("chat", 1, "v2", _recording_request(sent)))
+        await asyncio.sleep(0)
+        first.cancel()
+        result = await asyncio.wait_for(second, timeout=1)
+        return result, sent, first
+
+    result, sent, first = asyncio.run(scenario())
+    assert first.cancelled()
+    assert result == "v2"
+    assert sent == ["v2"]
+
+
+def test_failed_edit_reaches_every_waiter():
+    async def failing(text):
+        raise RuntimeError("boom")
+
+    async def scenario():
+        delivery = TelegramDelivery(SETTINGS)
+        await delivery.submit("chat", lambda: asyncio.sleep(0))
+        return await asyncio.wait_for(asyncio.gather(
+            delivery.edit("chat", 1, "v1", failing),
+            delivery.edit("chat", 1, "v2", failing),
+            return_exceptions=True,
+        ), timeout=1)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(error, RuntimeError) for error in results)
@@ -0,0 +1,52 @@
+import types
+
+import pytest
+
+import edit_guard
+from edit_guard import EditGuard
+
+DATA = {"cbr_rates": {"USD-RUB": {"value": 90.12, "change": 0.5}}}
+TEXT = "📅 01.01.2025 Upd 10:00\nUSD-RUB 90.12 ▲ 0.50%"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=10_000.0)
+    monkeypatch.setattr(edit_guard, "time", types.SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_same_hash_is_skipped(clock):
+    guard = EditGuard(force_refresh_minutes=30)
+    guard.remember(DATA, TEXT)
+    clock.now += 60
+
+    assert not guard.data_changed({"cbr_rates": {"USD-RUB": {"change": 0.5, "value": 90.12}}})
+    # другое время в строке «Upd» правкой не считается
+    assert not guard.text_changed(TEXT.replace("10:00", "10:03"))
+    assert guard.skipped == 2
+
+
+def test_changed_hash_is_edited(clock):
+    guard = EditGuard(force_refresh_minutes=30)
+    guard.remember(DATA, TEXT)
+    clock.now += 60
+
+    assert guard.data_changed({"cbr_rates": {"USD-RUB": {"value": 90.13, "change": 0.51}}})
+    assert guard.text_changed(TEXT.replace("90.12", "90.13"))
+    assert guard.skipped == 0
+
+
+def test_forced_edit_after_interval(clock):
+    guard = EditGuard(force_refresh_minutes=30)
+    guard.remember(DATA, TEXT)
+
+    clock.now += 30 * 60 - 1
+    assert not guard.data_changed(DATA)
+
+    clock.now += 1
+    assert guard.data_changed(DATA)
+    assert guard.text_changed(TEXT)
+
+    guard.remember(DATA, TEXT)
+    assert not guard.data_changed(DATA)
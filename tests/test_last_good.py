@@ -0,0 +1,70 @@
+from last_good import LastGoodCache
+
+TTL_MS = 60_000
+
+
+def _cache() -> LastGoodCache:
+    return LastGoodCache(ttl_seconds={"crypto": TTL_MS / 1000}, default_ttl_seconds=TTL_MS / 1000)
+
+
+def test_missing_value_falls_back_until_ttl():
+    cache = _cache()
+    cache.merge("crypto", {"BTC": 100.0, "ETH": 10.0}, now=1_000, fetched_ms=1_000)
+
+    merged, stale = cache.merge("crypto", {"BTC": None, "ETH": 11.0}, now=31_000, fetched_ms=31_000)
+    assert merged == {"BTC": 100.0, "ETH": 11.0}
+    assert stale == {"BTC": 30_000}
+
+    merged, stale = cache.merge("crypto", {"ETH": 11.0}, now=1_000 + TTL_MS + 1, fetched_ms=1_000 + TTL_MS + 1)
+    assert merged == {"ETH": 11.0}
+    assert stale == {}
+
+
+def test_confirmed_value_is_restamped_and_persisted_sparingly():
+    cache = _cache()
+    cache.merge("crypto", {"BTC": 100.0}, now=0, fetched_ms=0)
+    assert cache.pending_rows() == [("crypto", "BTC", 100.0, 0)]
+
+    # подтверждение раньше чем через 10% TTL в БД не пишется
+    cache.merge("crypto", {"BTC": 100.0}, now=3_000, fetched_ms=3_000)
+    assert cache.pending_rows() == []
+
+    cache.merge("crypto", {"BTC": 100.0}, now=50_000, fetched_ms=50_000)
+    assert cache.pending_rows() == [("crypto", "BTC", 100.0, 50_000)]
+
+    # TTL отсчитывается от последнего получения, а не от первого появления значения
+    merged, stale = cache.merge("crypto", {}, now=TTL_MS + 1)
+    assert merged == {"BTC": 100.0}
+    assert stale == {"BTC": TTL_MS + 1 - 50_000}
+
+
+def test_changed_value_is_restamped():
+    cache = _cache()
+    cache.merge("crypto", {"BTC": 100.0}, now=0, fetched_ms=0)
+    cache.pending_rows()
+
+    cache.merge("crypto", {"BTC": 101.0}, now=50_000, fetched_ms=45_000)
+    assert cache.pending_rows() == [("crypto", "BTC", 101.0, 45_000)]
+
+    merged, stale = cache.merge("crypto", {}, now=45_000 + TTL_MS)
+    assert merged == {"BTC": 101.0}
+    assert stale == {"BTC": TTL_MS}
+
+
+def test_retained_snapshot_is_stale_and_expires():
+    cache = _cache()
+    cache.merge("crypto", {"BTC": 100.0}, now=0, fetched_ms=0)
+
+    merged, stale = cache.merge("crypto", {"BTC": 100.0}, now=20_000, fetched_ms=0, retained=True)
+    assert merged == {"BTC": 100.0}
+    assert stale == {"BTC": 20_000}
+
+    merged, stale = cache.merge("crypto", {"BTC": 100.0}, now=TTL_MS + 1, fetched_ms=0, retained=True)
+    assert merged == {} and stale == {}
+
+
+def test_fresh_snapshot_is_not_stale():
+    cache = _cache()
+    merged, stale = cache.merge("crypto", {"BTC": 100.0}, now=80_000, fetched_ms=60_000)
+    assert merged == {"BTC": 100.0}
+    assert stale == {}
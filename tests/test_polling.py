@@ -0,0 +1,52 @@
+import asyncio
+
+from fetcher import FetchResult
+from polling import SnapshotStore, SourcePoller, TradingCalendar
+
+
+class _Orchestrator:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    async def fetch(self, name):
+        self.calls += 1
+        ok, data, *failures = self.results.pop(0)
+        return FetchResult(name, data, ok, 0.0, None if ok else "boom", failures=failures[0] if failures else {})
+
+    def breaker_states(self):
+        return {}
+
+
+def _poller(orchestrator):
+    poller = SourcePoller(orchestrator, SnapshotStore(), {"finance": {"interval_seconds": 180}})
+    # ни одной сессии — рынок всегда закрыт
+    poller.calendars["finance"] = TradingCalendar("America/New_York", [])
+    return poller
+
+
+def test_closed_calendar_retries_until_first_success():
+    orchestrator = _Orchestrator((False, {}), (False, {}), (True, {"GC=F": 2000.0}))
+    poller = _poller(orchestrator)
+
+    async def scenario():
+        await poller.poll("finance", force=True)
+        await poller.poll("finance")
+        await poller.poll("finance")
+        # после удачного опроса вне календаря источник уже не трогаем
+        await poller.poll("finance")
+
+    asyncio.run(scenario())
+    assert orchestrator.calls == 3
+    assert poller.stats["finance"] == {"polls": 3, "skipped": 1, "partial": 0}
+    assert poller.store.get("finance") == {"GC=F": 2000.0}
+
+
+def test_partial_failures_reach_stats():
+    orchestrator = _Orchestrator((True, {"GC=F": 2000.0, "BZ=F": None}, {"BZ=F": "нет данных"}))
+    poller = _poller(orchestrator)
+
+    asyncio.run(poller.poll("finance", force=True))
+    assert poller.stats["finance"]["partial"] == 1
+    assert poller.failures["finance"] == {"BZ=F": "нет данных"}
+    assert "без данных: BZ=F" in poller.summary()
@@ -0,0 +1,74 @@
+import pytest
+
+import data_processor
+from database import Database
+from price_window import price_window, now_ms
+
+HOUR_MS = 60 * 60 * 1000
+
+
+@pytest.fixture
+def db():
+    price_window._rings.clear()
+    price_window.authoritative = False
+    db = Database(":memory:")
+    db.save_history_snapshot([("X", "crypto", 100.0)], now_ms() - 2 * HOUR_MS)
+    yield db
+    price_window._rings.clear()
+    price_window.authoritative = False
+
+
+def test_cold_window_falls_back_to_db(db):
+    processed = data_processor.process_data({"X": 110.0}, {}, is_crypto=True, db=db)
+    assert processed["X"]["change_1h"] == 10.0
+
+
+def _record_db_lookups(monkeypatch, db):
+    calls = []
+    get_changes_batch = db.get_changes_batch
+
+    def recording(values, data_type, deltas):
+        calls.append((sorted(values), sorted(deltas)))
+        return get_changes_batch(values, data_type, deltas)
+
+    monkeypatch.setattr(db, "get_changes_batch", recording)
+    return calls
+
+
+def test_warm_window_short_history_asks_db_only_for_daily(db, monkeypatch):
+    price_window.warm_up([("X", "crypto", now_ms() - 2 * HOUR_MS, 100.0)])
+    calls = _record_db_lookups(monkeypatch, db)
+    with db._transaction() as cursor:
+        Database._write_daily_values(cursor, db._current_date(days_ago=1), {"crypto_data": {"X": {"value": 88.0}}})
+
+    processed = data_processor.process_data({"X": 110.0}, {}, is_crypto=True, db=db)
+
+    assert processed["X"]["change_1h"] == 10.0
+    # за неделю истории нет ни в окне, ни в БД — её не спрашиваем; сутки берутся из daily_values
+    assert processed["X"]["change_1w"] is None
+    assert processed["X"]["change_1d"] == 25.0
+    assert calls == [(["X"], ["change_1d"])]
+
+
+def test_warm_window_covering_all_intervals_skips_db(db, monkeypatch):
+    now = now_ms()
+    price_window.warm_up([("X", "crypto", now - hours * HOUR_MS, 100.0) for hours in (200, 30, 2)])
+    calls = _record_db_lookups(monkeypatch, db)
+
+    processed = data_processor.process_data({"X": 110.0}, {}, is_crypto=True, db=db)
+
+    assert processed["X"]["change_1w"] == 10.0
+    assert calls == []
+
+
+def test_truncated_ring_falls_back_to_db(db):
+    now = now_ms()
+    db.save_history_snapshot([("X", "crypto", 50.0)], now - 8 * 24 * HOUR_MS)
+    price_window.warm_up([])
+    # плотная запись вытеснила из кольца точки недельной давности
+    for i in range(price_window.capacity + 1):
+        price_window.add("X", "crypto", now - HOUR_MS // 2 + i, 100.0)
+
+    processed = data_processor.process_data({"X": 110.0}, {}, is_crypto=True, db=db)
+
+    assert processed["X"]["change_1w"] == 120.0
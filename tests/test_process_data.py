@@ -0,0 +1,76 @@
+import random
+
+import numpy as np
+import pytest
+
+import data_processor
+from database import Database
+from db_connection import connections
+from price_window import price_window, now_ms
+from rowwise_reference import process_data_rowwise
+
+
+@pytest.fixture(autouse=True)
+def isolated_state():
+    # окно цен и общее на процесс соединение :memory: — одиночки модулей: сбрасываем их,
+    # чтобы результат не зависел от порядка тестов
+    def reset():
+        price_window._rings.clear()
+        price_window.authoritative = False
+        connections.close_all()
+    reset()
+    yield
+    reset()
+
+
+def _quote(rng: random.Random, magnitude: float) -> float:
+    # котировки API приходят с конечным числом знаков — на таких и встречаются «половинки»
+    return round(rng.uniform(0.5, 2) * magnitude, 5)
+
+
+def _section(seed: int, tickers: int = 300):
+    rng = random.Random(seed)
+    names = [f"COIN{i}" for i in range(tickers)] + ["BTC", "USD-RUB", "EUR-RUB"]
+    now = now_ms()
+    new_data, old_data = {}, {}
+    for name in names:
+        # разброс порядков величин, чтобы задеть округление на 2 и 4 знака
+        magnitude = 10 ** rng.randint(-4, 5)
+        new_data[name] = _quote(rng, magnitude)
+        old_value = rng.choice([None, 0, _quote(rng, magnitude)])
+        old_data[name] = {"value": old_value}
+        # часть тикеров без окна — изменения за интервалы берутся из БД
+        if rng.random() < 0.8:
+            for minutes in range(8 * 24 * 60, 0, -60):
+                price_window.add(name, "crypto", now - minutes * 60_000, _quote(rng, magnitude))
+    # значения ровно на границе порога и около неё
+    new_data["BTC"] = float(rng.choice([60000, 60000.5, rng.uniform(1, 90000)]))
+    new_data["USD-RUB"] = rng.choice([95.0, 94.99, rng.uniform(80, 110)])
+    return new_data, old_data
+
+
+@pytest.mark.parametrize("is_crypto", [True, False])
+@pytest.mark.parametrize("seed", range(30))
+def test_columnar_matches_rowwise(seed, is_crypto):
+    db = Database(":memory:")
+    new_data, old_data = _section(seed)
+
+    assert data_processor.process_data(new_data, old_data, is_crypto=is_crypto, db=db) == \
+        process_data_rowwise(new_data, old_data, is_crypto=is_crypto, db=db)
+
+
+def test_empty_section():
+    assert data_processor.process_data({"X": None}, {}, db=Database(":memory:")) == {}
+
+
+@pytest.mark.parametrize("decimals", [2, 4])
+def test_vector_rounding_matches_builtin_round(decimals):
+    rng = random.Random(decimals)
+    # половинки в десятичной записи, точные двоичные половинки, огромные и бесконечные значения
+    values = [rng.randint(-10 ** 6, 10 ** 6) / 1000 + 0.005 for _ in range(2000)]
+    values += [rng.uniform(-1e4, 1e4) for _ in range(2000)]
+    values += [0.125, 2.675, 1.005, -0.375, 5e15 + 0.5, 1e300, -float("inf"), float("nan")]
+    rounded = data_processor._round_half(np.array(values), decimals).tolist()
+    for value, result in zip(values, rounded):
+        expected = round(value, decimals)
+        assert result == expected or (expected != expected and result != result)
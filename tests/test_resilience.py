@@ -0,0 +1,121 @@
+import asyncio
+import types
+
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, ResilientProvider, RetryPolicy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(resilience, "asyncio", types.SimpleNamespace(
+        wait_for=asyncio.wait_for, CancelledError=asyncio.CancelledError, sleep=clock.sleep
+    ))
+    # без джиттера: пауза — ровно экспоненциальная граница
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: high)
+    return clock
+
+
+def _flaky(failures: int, result="ok"):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise RuntimeError(f"сбой {len(calls)}")
+        return result
+
+    return fetch, calls
+
+
+def _provider(fetch, attempts=1, threshold=2, reset=30.0, deadline=100.0):
+    return ResilientProvider(
+        "test", fetch, deadline=deadline,
+        policy=RetryPolicy(attempts, base_delay=0.5, max_delay=4.0),
+        breaker=CircuitBreaker("test", failure_threshold=threshold, reset_timeout=reset),
+    )
+
+
+def test_breaker_closed_open_half_open_closed(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    clock.now += 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()  # пробный слот один
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+
+def test_failed_probe_reopens_breaker(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 29
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_retries_with_exponential_backoff(clock):
+    fetch, calls = _flaky(failures=2)
+    provider = _provider(fetch, attempts=3)
+
+    assert asyncio.run(provider()) == "ok"
+    assert len(calls) == 3
+    assert clock.sleeps == [0.5, 1.0]
+    assert provider.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_retries_stop_at_deadline(clock):
+    fetch, calls = _flaky(failures=10)
+    provider = _provider(fetch, attempts=10, deadline=1.0)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(provider())
+    # вторая пауза (1 с) вышла бы за дедлайн
+    assert len(calls) == 2
+    assert clock.sleeps == [0.5]
+
+
+def test_open_breaker_short_circuits_until_probe(clock):
+    fetch, calls = _flaky(failures=2)
+    provider = _provider(fetch, threshold=2, reset=30.0)
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            asyncio.run(provider())
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(provider())
+    assert len(calls) == 2
+
+    clock.now += 30
+    assert asyncio.run(provider()) == "ok"
+    assert len(calls) == 3
+    assert provider.breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,49 @@
+import random
+
+from spike_selector import SpikeSelector
+
+
+def _coin(code: str, day: float, hour: float = 0.0):
+    return {"code": code, "rate": 1.0, "delta": {"day": day, "hour": hour}}
+
+
+def test_duplicate_code_takes_one_slot():
+    selector = SpikeSelector(top_n=3, threshold_daily=1.0, threshold_hourly=1.0, always_show=())
+    selector.feed([_coin("AAA", 50), _coin("AAA", 40), _coin("BBB", 30), _coin("CCC", 20), _coin("AAA", 60)])
+
+    daily = selector.result()["daily_spikes"]
+    assert list(daily) == ["AAA", "BBB", "CCC"]
+
+
+def test_matches_full_sort_with_duplicates():
+    rng = random.Random(1)
+    coins = [_coin(f"C{rng.randrange(40)}", rng.uniform(-30, 30), rng.uniform(-10, 10)) for _ in range(500)]
+    selector = SpikeSelector(top_n=5, threshold_daily=1.0, threshold_hourly=1.0, always_show=()).feed(coins)
+
+    best = {}
+    for coin in coins:
+        magnitude = abs(coin["delta"]["day"])
+        if magnitude >= 1.0 and magnitude > best.get(coin["code"], 0):
+            best[coin["code"]] = magnitude
+    expected = sorted(best, key=lambda code: (best[code], code), reverse=True)[:5]
+    assert list(selector.result()["daily_spikes"]) == expected
+
+
+def test_from_settings_honours_top_n_and_thresholds():
+    settings = {
+        "top_n": 2,
+        "threshold_daily": 10.0,
+        "threshold_hourly": 5.0,
+        "exclude_stablecoins": True,
+        "stablecoins": ["USDT"],
+        "exclude_always_from_spikes": False,
+    }
+    coins = [_coin("AAA", 30, 1), _coin("BBB", 20, 6), _coin("CCC", 15, 2), _coin("DDD", 5, 8), _coin("USDT", 40, 9)]
+    result = SpikeSelector.from_settings(settings).feed(coins).result()
+
+    assert list(result["daily_spikes"]) == ["AAA", "BBB"]
+    assert list(result["hourly_spikes"]) == ["DDD", "BBB"]
+
+    settings["top_n"], settings["threshold_daily"] = 3, 1.0
+    result = SpikeSelector.from_settings(settings).feed(coins).result()
+    assert list(result["daily_spikes"]) == ["AAA", "BBB", "CCC"]
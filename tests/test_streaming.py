@@ -0,0 +1,100 @@
+import asyncio
+
+from feed_server import FeedServer
+from price_window import price_window, now_ms
+from streaming import SpikeTracker, StreamIngestor, TcpTickProvider, Tick
+
+
+async def _wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "тики не дошли до приёмника"
+        await asyncio.sleep(0.01)
+
+
+def test_ingestor_reads_ticks_from_feed_server():
+    async def scenario():
+        server = FeedServer("127.0.0.1", 0)
+        await server.start()
+        changes = []
+        tracker = SpikeTracker(top_n=2, threshold_daily=1.0, threshold_hourly=1.0)
+        ingestor = StreamIngestor(
+            TcpTickProvider("127.0.0.1", server.port),
+            tracker=tracker,
+            on_spikes_changed=lambda: changes.append(tracker.result()),
+            reconnect_seconds=0.05,
+        )
+        task = asyncio.create_task(ingestor.run())
+        try:
+            await _wait_for(lambda: server._clients)
+            ts = now_ms()
+            for code, price, change in (("AAA", 10.0, 0.5), ("BBB", 20.0, 7.0), ("CCC", 30.0, -3.0), ("DDD", 40.0, 2.0)):
+                await server.publish(Tick(code, price, ts, change_1h=change, change_1d=change))
+            await _wait_for(lambda: ingestor.received == 4)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await server.close()
+        return ingestor, changes
+
+    price_window._rings.clear()
+    ingestor, changes = asyncio.run(scenario())
+
+    assert ingestor.prices() == {"AAA": 10.0, "BBB": 20.0, "CCC": 30.0, "DDD": 40.0}
+    assert list(ingestor.tracker.result()["daily_spikes"]) == ["BBB", "CCC"]
+    assert changes, "смена состава рывков не была сообщена"
+    # первый тик монеты попадает в окно цен
+    assert price_window.last_ts("BBB", "crypto") is not None
+
+
+def test_tracker_expires_coins_that_stop_ticking():
+    tracker = SpikeTracker(top_n=2, threshold_daily=1.0, threshold_hourly=1.0)
+    tracker.update("OLD", {"value": 1.0, "change_1h": 9.0, "change_1d": 9.0}, ts=1_000)
+    tracker.update("NEW", {"value": 2.0, "change_1h": 3.0, "change_1d": 3.0}, ts=5_000)
+
+    assert tracker.expire(2_000)
+    assert "OLD" not in tracker.entries
+    assert list(tracker.result()["daily_spikes"]) == ["NEW"]
+    assert not tracker.expire(2_000)
+
+
+class _NoTicks:
+    async def ticks(self):
+        return
+        yield
+
+
+def test_silent_feed_is_not_live():
+    price_window._rings.clear()
+    ingestor = StreamIngestor(_NoTicks(), tracker=SpikeTracker(top_n=2, threshold_daily=1.0, threshold_hourly=1.0))
+    assert not ingestor.is_live(60_000)
+
+    now = now_ms()
+    ingestor.ingest(Tick("AAA", 10.0, now - 120_000, change_1h=5.0, change_1d=5.0))
+    ingestor.ingest(Tick("BBB", 20.0, now, change_1h=2.0, change_1d=2.0))
+    assert ingestor.is_live(60_000)
+    # тики AAA старше допустимого — из рывков она уходит
+    assert list(ingestor.spikes(60_000)["daily_spikes"]) == ["BBB"]
+
+    ingestor.last_tick_ms = now - 120_000
+    assert not ingestor.is_live(60_000)
+    price_window._rings.clear()
+
+
+def test_tracker_from_settings_honours_top_n_and_thresholds():
+    settings = {
+        "top_n": 1,
+        "threshold_daily": 10.0,
+        "threshold_hourly": 5.0,
+        "exclude_stablecoins": True,
+        "stablecoins": ["USDT"],
+        "exclude_always_from_spikes": False,
+    }
+    tracker = SpikeTracker.from_settings(settings)
+    tracker.update("AAA", {"value": 1.0, "change_1h": 6.0, "change_1d": 20.0}, ts=1_000)
+    tracker.update("BBB", {"value": 1.0, "change_1h": 7.0, "change_1d": 9.0}, ts=1_000)
+    tracker.update("USDT", {"value": 1.0, "change_1h": 50.0, "change_1d": 50.0}, ts=1_000)
+
+    spikes = tracker.result()
+    assert list(spikes["daily_spikes"]) == ["AAA"]
+    assert list(spikes["hourly_spikes"]) == ["BBB"]
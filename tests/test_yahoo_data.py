@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+import pandas as pd
+import yfinance as yf
+
+from get_yahoo_data import Asset, AssetFetcher
+from service.settings import HTTP_SETTINGS, YAHOO_SETTINGS
+
+REQUEST_SECONDS = 0.3
+
+
+def _slow_history(calls):
+    def history(self, period=None, interval=None, timeout=None, **kwargs):
+        calls.append((self.ticker, timeout))
+        time.sleep(REQUEST_SECONDS)
+        if self.ticker == "EMPTY":
+            return pd.DataFrame()
+        index = pd.DatetimeIndex([pd.Timestamp("2026-01-05 10:00", tz="America/New_York")])
+        return pd.DataFrame({"Close": [1.456]}, index=index)
+    return history
+
+
+def test_download_runs_tickers_in_parallel_within_budget(monkeypatch):
+    calls = []
+    monkeypatch.setattr(yf.Ticker, "history", _slow_history(calls))
+    assets = [Asset(f"T{i}", f"Актив {i}") for i in range(5)] + [Asset("EMPTY", "Пустой")]
+    fetcher = AssetFetcher(assets)
+
+    started = time.monotonic()
+    prices, failures = fetcher._download_batch()
+    elapsed = time.monotonic() - started
+
+    waves = -(-len(assets) // YAHOO_SETTINGS["max_threads"])
+    assert len(calls) == len(assets)
+    assert elapsed < REQUEST_SECONDS * (waves + 1)
+    # таймауты всех «волн» вместе укладываются в общий бюджет Yahoo
+    assert {timeout for _, timeout in calls} == {HTTP_SETTINGS["timeouts"]["yahoo"]["total"] / waves}
+    assert prices == {**{f"Актив {i}": 1.46 for i in range(5)}, "Пустой": None}
+    assert failures == {"Пустой": "нет данных (EMPTY)"}
+
+
+def test_failures_are_kept_for_the_caller(monkeypatch):
+    monkeypatch.setattr(yf.Ticker, "history", _slow_history([]))
+    fetcher = AssetFetcher([Asset("GC=F", "Золото"), Asset("EMPTY", "Пустой")])
+
+    prices = asyncio.run(fetcher.get_all_prices())
+    assert prices == {"Золото": 1.46, "Пустой": None}
+    assert fetcher.failures == {"Пустой": "нет данных (EMPTY)"}
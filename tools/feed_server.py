@@ -0,0 +1,96 @@
+"""
+Локальный имитатор фида тиков криптовалют для отладки streaming.py (в бот не входит).
+
+Запуск из корня репозитория:
+    python tools/feed_server.py
+"""
+import asyncio
+import os
+import random
+import sys
+from typing import Iterable, Optional, Set
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(ROOT, "src", "api")
+
+# модули проекта рассчитывают на запуск из src/api (BASE_DIR, пути логов)
+if API_DIR not in sys.path:
+    sys.path[:0] = [os.path.join(ROOT, "src"), API_DIR]
+    os.chdir(API_DIR)
+    os.makedirs(os.path.join(ROOT, "src", "service", "logs"), exist_ok=True)
+
+from price_window import now_ms  # noqa: E402
+from service.logger import logger  # noqa: E402
+from service.settings import STREAMING_SETTINGS, CRYPTO_ALWAYS_SHOW  # noqa: E402
+from streaming import Tick  # noqa: E402
+
+
+class FeedServer:
+    """
+    Локальная замена биржевого фида для тестов и отладки: раздаёт подключённым клиентам
+    тики построчным JSON — тот же формат, что читает streaming.TcpTickProvider.
+    """
+
+    def __init__(self, host: str = STREAMING_SETTINGS["host"], port: int = STREAMING_SETTINGS["port"]):
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: Set[asyncio.StreamWriter] = set()
+        self._handlers: Set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._on_connect, self.host, self.port)
+        # порт 0 — выбрать свободный; фактический нужен клиентам
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Фид тиков слушает {self.host}:{self.port}")
+
+    async def _on_connect(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._clients.add(writer)
+        self._handlers.add(asyncio.current_task())
+        try:
+            await reader.read()  # держим соединение, пока клиент не отключится
+        finally:
+            self._clients.discard(writer)
+            self._handlers.discard(asyncio.current_task())
+            writer.close()
+
+    async def publish(self, tick: Tick) -> None:
+        line = (tick.to_json() + "\n").encode()
+        for writer in list(self._clients):
+            try:
+                writer.write(line)
+                await writer.drain()
+            except (ConnectionError, RuntimeError):
+                self._clients.discard(writer)
+
+    async def random_walk(self, codes: Iterable[str], interval: float = 0.5) -> None:
+        """Бесконечно публикует случайные блуждания цен по кодам монет."""
+        prices = {code: random.uniform(1, 1000) for code in codes}
+        opens = dict(prices)
+        while True:
+            for code in prices:
+                prices[code] *= random.uniform(0.98, 1.02)
+                change = round((prices[code] - opens[code]) / opens[code] * 100, 2)
+                await self.publish(Tick(code, prices[code], now_ms(), change_1h=change, change_1d=change))
+            await asyncio.sleep(interval)
+
+    async def close(self) -> None:
+        for writer in list(self._clients):
+            writer.close()
+        # обработчики соединений завершаются, получив EOF после закрытия транспорта
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+if __name__ == "__main__":
+    async def main():
+        server = FeedServer()
+        await server.start()
+        try:
+            await server.random_walk([*CRYPTO_ALWAYS_SHOW, "XRP", "DOGE", "ADA", "PEPE", "WIF"])
+        finally:
+            await server.close()
+
+    asyncio.run(main())